@@ -0,0 +1,212 @@
+"""
+Ergebnis-Cache für die Bewertungsstufen des Betrugserkennungssystems.
+
+Wiederkehrende, nahezu identische Transaktionen (Miete, Gehalt, Abos) erzeugen
+denselben kanonischen Merkmalsschlüssel und können ihre Bewertungen
+wiederverwenden. Der Cache ist im Speicher nach LRU/TTL begrenzt und kann
+optional in einer SQLite-Datei gespiegelt werden, damit ein neu gestarteter
+Worker mit warmem Cache beginnt; abgelaufene und überzählige Zeilen werden dort
+regelmäßig gelöscht.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from rule_engine import minute_of_day
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def canonical_key(transaction: Dict[str, Any], unusual_hours: Tuple[int, int] = (23, 6)) -> Tuple:
+    """
+    Bildet den kanonischen Merkmalsschlüssel einer Transaktion.
+
+    Transaktions-ID und exakter Zeitpunkt fließen bewusst nicht ein; die Uhrzeit
+    wird nur als "ungewöhnliche Zeit ja/nein" berücksichtigt.
+
+    Args:
+        transaction: Die Transaktion
+        unusual_hours: Beginn und Ende des ungewöhnlichen Zeitfensters (volle Stunden)
+
+    Returns:
+        Ein hashbares Tupel
+    """
+    minutes = minute_of_day(transaction.get("timestamp", ""))
+    start, end = unusual_hours[0] * 60, unusual_hours[1] * 60
+    unusual_time = minutes >= 0 and (minutes >= start or minutes < end)
+    description = _WHITESPACE.sub(" ", (transaction.get("description") or "").strip().lower())
+    return (
+        transaction["sender_account"],
+        transaction["receiver_account"],
+        int(round(float(transaction["amount"]) * 100)),
+        bool(transaction.get("is_realtime", False)),
+        unusual_time,
+        description
+    )
+
+
+def assessment_digest(*assessments: str) -> str:
+    """
+    Fingerabdruck serialisierter Bewertungen, z.B. als Zusatz zum Schlüssel einer Erklärung.
+
+    Über Prozesse und Neustarts stabil (anders als hash()), damit er auch in der SQLite-Datei gilt.
+    """
+    return hashlib.blake2b("\x1f".join(assessments).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class AssessmentCache:
+    """Threadsicherer LRU/TTL-Cache mit optionaler SQLite-Persistenz."""
+
+    def __init__(
+            self,
+            max_entries: int = 10000,
+            ttl_seconds: Optional[float] = 3600.0,
+            path: Optional[str] = None,
+            max_persisted: Optional[int] = None,
+            purge_interval: int = 1000
+    ):
+        """
+        Args:
+            max_entries: Maximale Anzahl Einträge im Speicher (0 deaktiviert den Cache)
+            ttl_seconds: Lebensdauer eines Eintrags in Sekunden (None = unbegrenzt)
+            path: Optionaler Pfad zu einer SQLite-Datei für die Persistenz
+            max_persisted: Maximale Anzahl Zeilen in der SQLite-Datei (Standard: 10 x max_entries);
+                ältere Zeilen werden beim Aufräumen gelöscht
+            purge_interval: Aufräumen der SQLite-Datei nach jeweils so vielen put()-Aufrufen
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.max_persisted = max_persisted if max_persisted is not None else 10 * max_entries
+        self.purge_interval = purge_interval
+        self._puts_since_purge = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS assessment_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)"
+            )
+            self._purge()
+
+    @staticmethod
+    def _serialize_key(stage: str, key: Tuple) -> str:
+        return json.dumps([stage, *key], separators=(",", ":"), ensure_ascii=False)
+
+    def get(self, stage: str, key: Tuple) -> Optional[Any]:
+        """Liefert einen gespeicherten Wert oder None."""
+        if self.max_entries <= 0:
+            return None
+
+        cache_key = self._serialize_key(stage, key)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or expires >= now:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return value
+                del self._entries[cache_key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires FROM assessment_cache WHERE key = ?", (cache_key,)
+                ).fetchone()
+                if row is not None and (row[1] is None or row[1] >= now):
+                    value = json.loads(row[0])
+                    self._store(cache_key, row[1], value)
+                    self.hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, stage: str, key: Tuple, value: Any):
+        """Speichert einen Wert für eine Stufe und einen Merkmalsschlüssel."""
+        if self.max_entries <= 0:
+            return
+
+        cache_key = self._serialize_key(stage, key)
+        expires = time.time() + self.ttl_seconds if self.ttl_seconds is not None else None
+        with self._lock:
+            self._store(cache_key, expires, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO assessment_cache (key, value, expires) VALUES (?, ?, ?)",
+                    (cache_key, json.dumps(value, ensure_ascii=False), expires)
+                )
+                self._puts_since_purge += 1
+                if self._puts_since_purge >= self.purge_interval:
+                    self._purge()
+                else:
+                    self._db.commit()
+
+    def _purge(self):
+        """Löscht abgelaufene und die ältesten überzähligen Zeilen der SQLite-Datei (Lock muss gehalten werden)."""
+        self._db.execute("DELETE FROM assessment_cache WHERE expires IS NOT NULL AND expires < ?", (time.time(),))
+        # INSERT OR REPLACE vergibt eine neue rowid; kleine rowids sind daher die am längsten nicht geschriebenen
+        self._db.execute(
+            "DELETE FROM assessment_cache WHERE rowid <= "
+            "(SELECT rowid FROM assessment_cache ORDER BY rowid DESC LIMIT 1 OFFSET ?)",
+            (self.max_persisted,)
+        )
+        self._db.commit()
+        self._puts_since_purge = 0
+
+    def _store(self, cache_key: str, expires: Optional[float], value: Any):
+        """Legt einen Eintrag im Speicher ab und verdrängt bei Bedarf den ältesten (Lock muss gehalten werden)."""
+        self._entries[cache_key] = (expires, value)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(self, stage: str, key: Tuple, compute: Callable[[], Any]) -> Any:
+        """Liefert den gespeicherten Wert oder berechnet und speichert ihn."""
+        value = self.get(stage, key)
+        if value is None:
+            value = compute()
+            if value:
+                self.put(stage, key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Liefert Trefferzahlen und Füllstand des Caches."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "persistent": self._db is not None
+            }
+
+    def clear(self):
+        """Leert den Cache im Speicher und auf der Platte."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM assessment_cache")
+                self._db.commit()
+
+    def close(self):
+        """Schließt die SQLite-Verbindung."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
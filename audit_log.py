@@ -0,0 +1,468 @@
+"""
+Revisionssicheres, nur anhängendes Audit-Log für Bewertungen und Entscheidungen.
+
+Einträge werden im Entscheidungspfad nur in eine Warteschlange gestellt. Ein
+Hintergrund-Thread serialisiert sie als kompaktes JSONL, schreibt sie
+gruppenweise und schließt jede Gruppe mit einem einzigen fsync ab (Group
+Commit). Wer auf die Dauerhaftigkeit eines Eintrags warten muss, wartet auf
+das von record() gelieferte Future. Scheitert eine Gruppe, wird das Segment
+auf den Stand davor gekürzt und die Futures der Gruppe schlagen fehl.
+
+Ein Segment wird ab segment_max_bytes versiegelt. Ein zweiter Thread
+komprimiert es blockweise, ohne die Group Commits aufzuhalten: jeder Block ist
+ein eigenständiges gzip-Member, das Segment bleibt damit eine gültige
+gzip-Datei (zcat), und ein Eintrag lässt sich lesen, indem nur sein Block
+entpackt wird. Nur der Index transaction_id -> Fundstellen des aktiven (und
+eines noch nicht fertig versiegelten) Segments liegt im Speicher. Jedes
+versiegelte Segment hat eine nach Schlüssel sortierte .idx.npy-Datei, die
+lookup() per memmap binär durchsucht; der Speicherbedarf wächst damit nicht
+mit der Länge des Logs.
+"""
+import gzip
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+SEGMENT_PREFIX = "segment-"
+COMPRESSION_BLOCK_BYTES = 64 * 1024
+
+_STOP = object()
+
+# Fundstelle: (Segmentnummer, Offset des gzip-Blocks oder -1 im unkomprimierten Segment, Offset, Länge)
+Location = Tuple[int, int, int, int]
+
+# Eine Zeile der Indexdatei eines versiegelten Segments, sortiert nach (key, seq)
+INDEX_DTYPE = np.dtype([
+    ("key", "<u8"), ("seq", "<u8"), ("block_offset", "<i8"), ("offset", "<i8"), ("length", "<i8")
+])
+
+
+def _segment_path(directory: str, number: int, suffix: str) -> str:
+    return os.path.join(directory, f"{SEGMENT_PREFIX}{number:06d}{suffix}")
+
+
+def _index_key(transaction_id: Optional[str]) -> int:
+    """64-Bit-Schlüssel einer transaction_id; Kollisionen werden beim Lesen am Eintrag selbst erkannt."""
+    if transaction_id is None:
+        return 0
+    return int.from_bytes(hashlib.blake2b(str(transaction_id).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _load_index(path: str) -> np.ndarray:
+    """Blendet eine Indexdatei per memmap ein (leere Indizes lassen sich nicht einblenden und werden gelesen)."""
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        return np.load(path)
+
+
+def _read_member(handle, block_offset: int) -> bytes:
+    """Entpackt genau ein gzip-Member ab block_offset."""
+    handle.seek(block_offset)
+    decompressor = zlib.decompressobj(wbits=31)
+    data = []
+    while not decompressor.eof:
+        chunk = handle.read(16384)
+        if not chunk:
+            break
+        data.append(decompressor.decompress(chunk))
+    return b"".join(data)
+
+
+class AuditLog:
+    """Append-only-Log mit Hintergrund-Writer, Group Commit, Segmentrotation und Index nach transaction_id."""
+
+    def __init__(
+            self,
+            path: str,
+            segment_max_bytes: int = 64 * 1024 * 1024,
+            flush_interval_ms: float = 50.0,
+            max_batch: int = 1024,
+            compress: bool = True,
+            cached_indexes: int = 64
+    ):
+        """
+        Args:
+            path: Verzeichnis der Segmente
+            segment_max_bytes: Größe, ab der das aktive Segment versiegelt wird
+            flush_interval_ms: Maximale Wartezeit auf weitere Einträge für einen Group Commit
+            max_batch: Maximale Anzahl Einträge je Group Commit
+            compress: Versiegelte Segmente komprimieren
+            cached_indexes: Anzahl gleichzeitig eingeblendeter Indexdateien versiegelter Segmente
+        """
+        self.path = path
+        self.segment_max_bytes = segment_max_bytes
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch = max_batch
+        self.compress = compress
+        self.cached_indexes = cached_indexes
+        os.makedirs(path, exist_ok=True)
+
+        self._index: Dict[str, List[Location]] = {}  # nur das aktive Segment
+        self._pending: Dict[int, Dict[str, List[Location]]] = {}  # versiegelt, Indexdatei noch nicht geschrieben
+        self._sealed: List[int] = []  # versiegelte Segmente mit Indexdatei, aufsteigend
+        self._mapped: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"records": 0, "commits": 0, "failed_commits": 0, "segments_sealed": 0}
+        self._sequence = 0
+        self._sealer_queue: "queue.Queue" = queue.Queue()
+        self._segment = self._recover()
+        self._handle = open(_segment_path(path, self._segment, ".jsonl"), "ab")
+        self._size = self._handle.tell()
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="audit-writer", daemon=True)
+        self._writer.start()
+        self._sealer = threading.Thread(target=self._seal_loop, name="audit-sealer", daemon=True)
+        self._sealer.start()
+
+    def _recover(self) -> int:
+        """Stellt den Zustand vorhandener Segmente wieder her und liefert die Nummer des aktiven Segments."""
+        numbers = set()
+        for name in os.listdir(self.path):
+            if name.startswith(SEGMENT_PREFIX):
+                if name.endswith(".tmp"):
+                    os.remove(os.path.join(self.path, name))
+                    continue
+                numbers.add(int(name[len(SEGMENT_PREFIX):len(SEGMENT_PREFIX) + 6]))
+        if not numbers:
+            return 1
+
+        last = max(numbers)
+        for number in sorted(numbers):
+            plain = _segment_path(self.path, number, ".jsonl")
+            index_path = _segment_path(self.path, number, ".idx.npy")
+            if os.path.exists(plain):
+                if number == last:
+                    self._index = self._scan_segment(number)
+                    continue
+                if not self.compress and os.path.exists(index_path):
+                    self._note_sealed(number)
+                    continue
+                # Abgebrochene Versiegelung: Reste verwerfen und im Hintergrund wiederholen
+                for suffix in (".jsonl.gz", ".idx", ".idx.npy"):
+                    if os.path.exists(_segment_path(self.path, number, suffix)):
+                        os.remove(_segment_path(self.path, number, suffix))
+                self._pending[number] = self._scan_segment(number)
+                self._sealer_queue.put(number)
+            else:
+                if not os.path.exists(index_path):
+                    # Indexdatei fehlt (oder stammt aus dem früheren Textformat): aus dem Segment neu aufbauen
+                    self._write_index(number, self._scan_compressed_segment(number))
+                if os.path.exists(_segment_path(self.path, number, ".idx")):
+                    os.remove(_segment_path(self.path, number, ".idx"))
+                self._note_sealed(number)
+        return last
+
+    def _note_sealed(self, number: int):
+        """Übernimmt ein versiegeltes Segment samt Indexdatei (beim Start, ohne Lock)."""
+        self._sealed.append(number)
+        index = _load_index(_segment_path(self.path, number, ".idx.npy"))
+        if len(index):
+            self._sequence = max(self._sequence, int(index["seq"].max()))
+
+    def _scan_segment(self, number: int) -> Dict[str, List[Location]]:
+        """Indiziert ein unkomprimiertes Segment und kürzt eine unvollständige letzte Zeile."""
+        path = _segment_path(self.path, number, ".jsonl")
+        index: Dict[str, List[Location]] = {}
+        offset = 0
+        with open(path, "rb") as handle:
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if entry.get("transaction_id") is not None:
+                    index.setdefault(entry["transaction_id"], []).append((number, -1, offset, len(line)))
+                self._sequence = max(self._sequence, entry.get("seq", 0))
+                offset += len(line)
+        if offset != os.path.getsize(path):
+            with open(path, "r+b") as handle:
+                handle.truncate(offset)
+        return index
+
+    def _scan_compressed_segment(self, number: int) -> List[Tuple[Optional[str], int, int, int, int]]:
+        """Liest die Fundstellen eines komprimierten Segments Block für Block."""
+        with open(_segment_path(self.path, number, ".jsonl.gz"), "rb") as handle:
+            data = memoryview(handle.read())
+        rows = []
+        block_offset = 0
+        while block_offset < len(data):
+            decompressor = zlib.decompressobj(wbits=31)
+            block = decompressor.decompress(data[block_offset:])
+            inner = 0
+            for line in block.splitlines(keepends=True):
+                entry = json.loads(line)
+                rows.append((entry.get("transaction_id"), entry.get("seq", 0), block_offset, inner, len(line)))
+                inner += len(line)
+            block_offset = len(data) - len(decompressor.unused_data)
+        return rows
+
+    def _write_index(self, number: int, rows: List[Tuple[Optional[str], int, int, int, int]]):
+        """Schreibt die sortierte Indexdatei eines versiegelten Segments."""
+        index = np.array(
+            [(_index_key(transaction_id), seq, block, offset, length)
+             for transaction_id, seq, block, offset, length in rows],
+            dtype=INDEX_DTYPE
+        )
+        index = index[np.lexsort((index["seq"], index["key"]))]
+        path = _segment_path(self.path, number, ".idx.npy")
+        with open(path + ".tmp", "wb") as handle:
+            np.save(handle, index)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(path + ".tmp", path)
+
+    def record(self, kind: str, transaction_id: str, payload: Dict[str, Any]) -> Future:
+        """
+        Stellt einen Eintrag in die Warteschlange; kehrt sofort zurück.
+
+        payload wird erst im Writer-Thread serialisiert und darf danach nicht mehr verändert werden.
+
+        Returns:
+            Ein Future, das nach dem fsync des Eintrags erfüllt ist
+        """
+        future = Future()
+        self._queue.put((kind, transaction_id, payload, time.time(), future))
+        return future
+
+    def record_result(self, result: Dict[str, Any]) -> Future:
+        """Protokolliert ein Ergebnis von process_transaction."""
+        transaction = result.get("transaction") or {}
+        return self.record("assessment", transaction.get("transaction_id"), result)
+
+    def _write_loop(self):
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                return
+            batch = [entry]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch):
+        """Schreibt eine Gruppe von Einträgen mit einem einzigen fsync; scheitert sie, bleibt das Segment unverändert."""
+        locations = []
+        futures = []
+        start, sequence = self._size, self._sequence
+        try:
+            for kind, transaction_id, payload, logged_at, future in batch:
+                futures.append(future)
+                if kind is None:
+                    # Barriere von flush(): wird nicht geschrieben, nur mit der Gruppe bestätigt
+                    continue
+                self._sequence += 1
+                line = (json.dumps(
+                    {
+                        "seq": self._sequence,
+                        "logged_at": logged_at,
+                        "kind": kind,
+                        "transaction_id": transaction_id,
+                        "record": payload
+                    },
+                    separators=(",", ":"), ensure_ascii=False, default=str
+                ) + "\n").encode("utf-8")
+                self._handle.write(line)
+                locations.append((transaction_id, (self._segment, -1, self._size, len(line))))
+                self._size += len(line)
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+        except Exception as exc:
+            self._rollback(start, sequence)
+            with self._lock:
+                self._counters["failed_commits"] += 1
+            for future in futures:
+                future.set_exception(exc)
+            return
+
+        with self._lock:
+            for transaction_id, location in locations:
+                if transaction_id is not None:
+                    self._index.setdefault(transaction_id, []).append(location)
+            self._counters["records"] += len(locations)
+            self._counters["commits"] += 1
+        if self._size >= self.segment_max_bytes:
+            self._rotate()
+        for future in futures:
+            future.set_result(True)
+
+    def _rollback(self, size: int, sequence: int):
+        """Kürzt das aktive Segment auf den Stand vor einer gescheiterten Gruppe."""
+        path = _segment_path(self.path, self._segment, ".jsonl")
+        try:
+            self._handle.close()
+        except Exception:
+            pass  # Gepufferte Reste der Gruppe werden ohnehin abgeschnitten
+        # Scheitert auch das Kürzen, schneidet _recover() beim nächsten Start ab der ersten kaputten Zeile ab
+        with open(path, "r+b") as handle:
+            handle.truncate(size)
+        self._handle = open(path, "ab")
+        self._size = size
+        self._sequence = sequence
+
+    def _rotate(self):
+        """Versiegelt das aktive Segment und beginnt ein neues; Index und Komprimierung folgen im Hintergrund."""
+        self._handle.close()
+        sealed = self._segment
+        with self._lock:
+            self._pending[sealed] = self._index
+            self._index = {}
+            self._segment += 1
+            self._counters["segments_sealed"] += 1
+        self._handle = open(_segment_path(self.path, self._segment, ".jsonl"), "ab")
+        self._size = 0
+        self._sealer_queue.put(sealed)
+
+    def _seal_loop(self):
+        while True:
+            number = self._sealer_queue.get()
+            if number is _STOP:
+                return
+            self._seal_segment(number)
+
+    def _seal_segment(self, number: int):
+        """Komprimiert ein versiegeltes Segment (optional) blockweise und schreibt dessen Indexdatei."""
+        plain = _segment_path(self.path, number, ".jsonl")
+        rows = []
+        if self.compress:
+            compressed = _segment_path(self.path, number, ".jsonl.gz")
+            with open(plain, "rb") as source, open(compressed, "wb") as target:
+                block, block_lines, block_size = [], [], 0
+
+                def write_block():
+                    block_offset = target.tell()
+                    target.write(gzip.compress(b"".join(block), mtime=0))
+                    for inner_offset, length, entry in block_lines:
+                        rows.append((entry.get("transaction_id"), entry.get("seq", 0), block_offset, inner_offset, length))
+
+                for line in source:
+                    block_lines.append((block_size, len(line), json.loads(line)))
+                    block.append(line)
+                    block_size += len(line)
+                    if block_size >= COMPRESSION_BLOCK_BYTES:
+                        write_block()
+                        block, block_lines, block_size = [], [], 0
+                if block:
+                    write_block()
+                target.flush()
+                os.fsync(target.fileno())
+        else:
+            offset = 0
+            with open(plain, "rb") as source:
+                for line in source:
+                    entry = json.loads(line)
+                    rows.append((entry.get("transaction_id"), entry.get("seq", 0), -1, offset, len(line)))
+                    offset += len(line)
+        self._write_index(number, rows)
+
+        # Auf die Indexdatei umstellen und das unkomprimierte Segment entfernen
+        with self._lock:
+            self._pending.pop(number, None)
+            self._sealed.append(number)
+            self._sealed.sort()
+            if self.compress:
+                os.remove(plain)
+
+    def _segment_index(self, number: int) -> np.ndarray:
+        """Blendet die Indexdatei eines versiegelten Segments ein (LRU, Lock muss gehalten werden)."""
+        index = self._mapped.get(number)
+        if index is None:
+            index = _load_index(_segment_path(self.path, number, ".idx.npy"))
+            self._mapped[number] = index
+            while len(self._mapped) > self.cached_indexes:
+                self._mapped.popitem(last=False)
+        else:
+            self._mapped.move_to_end(number)
+        return index
+
+    def _sealed_locations(self, number: int, key: int) -> List[Location]:
+        """Fundstellen eines Schlüssels in einem versiegelten Segment (Lock muss gehalten werden)."""
+        index = self._segment_index(number)
+        start = int(np.searchsorted(index["key"], key, side="left"))
+        end = int(np.searchsorted(index["key"], key, side="right"))
+        return [
+            (number, int(row["block_offset"]), int(row["offset"]), int(row["length"])) for row in index[start:end]
+        ]
+
+    def lookup(self, transaction_id: str) -> List[Dict[str, Any]]:
+        """
+        Liefert alle geschriebenen Einträge zu einer Transaktion in Schreibreihenfolge.
+
+        Einträge, die noch in der Warteschlange stehen, sind erst nach flush() sichtbar.
+        """
+        key = _index_key(transaction_id)
+        with self._lock:
+            locations = []
+            for number in self._sealed:
+                locations.extend(self._sealed_locations(number, key))
+            for number in sorted(self._pending):
+                locations.extend(self._pending[number].get(transaction_id, ()))
+            locations.extend(self._index.get(transaction_id, ()))
+            # Nach der Recovery kann ein älteres Segment noch ausstehen; innerhalb eines Segments bleibt die Folge
+            locations.sort(key=lambda location: location[0])
+
+            records = []
+            for segment, block_offset, offset, length in locations:
+                if block_offset < 0:
+                    with open(_segment_path(self.path, segment, ".jsonl"), "rb") as handle:
+                        handle.seek(offset)
+                        data = handle.read(length)
+                else:
+                    with open(_segment_path(self.path, segment, ".jsonl.gz"), "rb") as handle:
+                        data = _read_member(handle, block_offset)[offset:offset + length]
+                record = json.loads(data)
+                if record.get("transaction_id") == transaction_id:
+                    # Schlüsselkollisionen im Index anderer Transaktionen überspringen
+                    records.append(record)
+        return records
+
+    def flush(self, timeout: Optional[float] = None):
+        """Wartet, bis alle bisher eingereihten Einträge dauerhaft geschrieben sind."""
+        self.record(None, None, None).result(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                self._counters,
+                pending=self._queue.qsize(),
+                active_segment=self._segment,
+                segments_pending=len(self._pending),
+                indexed_transactions=len(self._index) + sum(len(index) for index in self._pending.values())
+            )
+
+    def close(self):
+        """Schreibt alle eingereihten Einträge, versiegelt rotierte Segmente fertig und beendet die Threads."""
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._handle.close()
+        self._sealer_queue.put(_STOP)
+        self._sealer.join()
+        with self._lock:
+            self._mapped.clear()
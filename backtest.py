@@ -0,0 +1,445 @@
+"""
+Historischer Replay der deterministischen Pipeline-Stufen zur Kalibrierung.
+
+Eine gelabelte, chronologisch sortierte JSONL-Historie wird einmal gelesen
+und per konsistentem Hashing auf sender_account auf Worker-Prozesse verteilt,
+sodass jedes Konto mit seinem Zustand (Profilaggregate, Zeitfenster) in
+genau einem Prozess in zeitlicher Reihenfolge nachgespielt wird. Je Stapel
+werden Vorprüfung, ML-Wahrscheinlichkeit und die Regelspalten einmal
+berechnet; alle Konfigurationen des Rasters (ML-Schwellwert und
+Regelparameter) werden anschließend vektorisiert auf denselben Spalten
+ausgewertet. Ein Durchlauf über die Daten liefert so Precision, Recall,
+Alarmvolumen und die zu erwartenden LLM-Aufrufe und Tokens je Konfiguration.
+
+Nicht nachgespielt werden die LLM-Stufen selbst und die simulierten
+Stammdaten aus main.py; Profilaggregate werden unabhängig von der
+späteren Entscheidung fortgeschrieben.
+
+Aufruf:
+    python backtest.py --input history.jsonl --grid grid.json --workers 8
+"""
+import argparse
+import functools
+import itertools
+import json
+import multiprocessing
+import queue
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+import metrics
+from ml_model import FraudScoringModel
+from pipeline import iter_lines
+from profile_store import ProfileStore
+from prompts import DECISION_SCHEMA, build_prompt, compact_json
+from rule_engine import DEFAULT_RULES, ROUTING_IGNORED_RULES, RuleEngine
+from shard_pool import HashRing
+from triage import TIER_APPROVE, TIER_FLAG, TriageCascade
+from velocity import VelocityEngine
+
+
+# Raster: "threshold" für den ML-Schwellwert, sonst Name einer Regel mit "value" -> Kandidaten für den Wert
+DEFAULT_GRID: Dict[str, List[Any]] = {
+    "threshold": [0.3, 0.4, 0.5, 0.6, 0.7],
+    "large_amount": [3000.0, 5000.0, 10000.0],
+    "unusual_time": [["22:00", "06:00"], ["23:00", "06:00"], ["00:00", "05:00"]],
+    "burst_1m": [3, 5, 8]
+}
+
+REQUIRED_FIELDS = ("transaction_id", "sender_account", "receiver_account", "amount", "timestamp")
+# Felder, die im Betrieb als Transaktion in die Prompts gehen
+PROMPT_FIELDS = REQUIRED_FIELDS + ("description", "is_realtime")
+
+_SENDER = re.compile(r'"sender_account"\s*:\s*"([^"\\]*)"')
+
+# Zählerspalten je Konfiguration
+_COUNTERS = ["tp", "fp", "fn", "alerts", "decision_calls", "explanation_calls"]
+
+
+def expand_grid(grid: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """
+    Bildet das kartesische Produkt eines Rasters.
+
+    Raises:
+        ValueError: Bei Schlüsseln, die weder "threshold" noch eine einstellbare Regel sind. Regeln ohne
+            Wert (z.B. new_receiver) und die im Replay übergangenen ROUTING_IGNORED_RULES hätten keine Wirkung
+    """
+    tunable = {
+        rule["name"] for rule in DEFAULT_RULES if "value" in rule and rule["name"] not in ROUTING_IGNORED_RULES
+    }
+    unknown = [key for key in grid if key != "threshold" and key not in tunable]
+    if unknown:
+        raise ValueError(f"Unbekannte oder nicht einstellbare Rasterparameter: {', '.join(unknown)}")
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def _as_label(value: Any) -> Optional[bool]:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "fraud", "confirmed_fraud")
+    return None
+
+
+class _Replay:
+    """Zustand und Zähler eines Worker-Prozesses."""
+
+    def __init__(
+            self,
+            configs: List[Dict[str, Any]],
+            label_field: str,
+            ml_model_path: Optional[str] = None
+    ):
+        self.label_field = label_field
+        self.profiles = ProfileStore()
+        self.velocity = VelocityEngine()
+        self.model = FraudScoringModel.load(ml_model_path) if ml_model_path else FraudScoringModel()
+        self.rule_engine = RuleEngine()
+        # Die Vorprüfung sieht dasselbe Profil wie Modell und Regeln: den Stand vor der Transaktion
+        self._profile: Dict[str, Any] = {}
+        self.triage = TriageCascade(profile_loader=lambda account: self._profile)
+
+        self.thresholds = np.array(
+            [config.get("threshold", self.model.threshold) for config in configs], dtype=np.float64
+        )
+        # Jede Regelvariante (Regel, Wert) wird je Stapel nur einmal ausgewertet
+        variants: Dict[Any, int] = {}
+        self._variant_engines: List[RuleEngine] = []
+        membership = []
+        for config in configs:
+            row = set()
+            for rule in DEFAULT_RULES:
+                if rule["name"] in ROUTING_IGNORED_RULES:
+                    continue
+                value = config.get(rule["name"], rule.get("value"))
+                key = (rule["name"], json.dumps(value))
+                if key not in variants:
+                    variants[key] = len(self._variant_engines)
+                    self._variant_engines.append(RuleEngine(rules=[dict(rule, value=value)]))
+                row.add(variants[key])
+            membership.append(row)
+        self._membership = np.zeros((len(configs), len(self._variant_engines)), dtype=np.float32)
+        for i, row in enumerate(membership):
+            self._membership[i, list(row)] = 1.0
+
+        self.counts = np.zeros((len(configs), len(_COUNTERS)), dtype=np.int64)
+        self.rows = 0
+        self.positives = 0
+        self.rejected = 0
+        self.unlabelled = 0
+
+    def feed(self, lines: List[str]):
+        transactions, labels = [], []
+        for line in lines:
+            try:
+                record = json.loads(line)
+                if not all(field in record for field in REQUIRED_FIELDS):
+                    raise ValueError("Pflichtfelder fehlen")
+                float(record["amount"])
+            except (TypeError, ValueError):
+                self.rejected += 1
+                continue
+            label = _as_label(record.get(self.label_field))
+            if label is None:
+                self.unlabelled += 1
+                continue
+            transactions.append(record)
+            labels.append(label)
+        if not transactions:
+            return
+
+        # Zustandsbehafteter Teil: streng sequenziell je Konto
+        profiles, velocities, tiers = [], [], []
+        for transaction in transactions:
+            self._profile = self.profiles.get_profile(transaction["sender_account"]) or {}
+            velocity = self.velocity.observe(transaction)
+            tiers.append(self.triage.screen(transaction, velocity)["tier"])
+            profiles.append(self._profile)
+            velocities.append(velocity)
+            self.profiles.update(transaction)
+
+        # Zustandsloser Teil: Spalten einmal je Stapel
+        probabilities = self.model.predict_proba(self.model.extract_features(transactions, profiles, velocities))
+        columns = self.rule_engine.extract_columns(transactions, velocities)
+        columns["receiver_known"] = np.fromiter(
+            (t["receiver_account"] in (p.get("typical_receivers") or ()) for t, p in zip(transactions, profiles)),
+            dtype=bool, count=len(transactions)
+        )
+        hits = np.vstack([engine.evaluate_matrix(columns)[0] for engine in self._variant_engines]).astype(np.float32)
+
+        # Alle Konfigurationen auf einmal (Konfigurationen x Transaktionen)
+        rule_flagged = (self._membership @ hits) > 0
+        ml_flagged = probabilities[None, :] >= self.thresholds[:, None]
+        tiers = np.array(tiers)
+        escalated = (tiers != TIER_APPROVE) & (tiers != TIER_FLAG)
+        suspicious = escalated[None, :] & (ml_flagged | rule_flagged)
+        alerts = (tiers == TIER_FLAG)[None, :] | suspicious
+        truth = np.array(labels, dtype=bool)[None, :]
+        realtime = columns["is_realtime"][None, :]
+
+        self.counts += np.stack([
+            (alerts & truth).sum(axis=1),
+            (alerts & ~truth).sum(axis=1),
+            (~alerts & truth).sum(axis=1),
+            alerts.sum(axis=1),
+            (suspicious & realtime).sum(axis=1),
+            (suspicious & ~realtime).sum(axis=1)
+        ], axis=1)
+        self.rows += len(transactions)
+        self.positives += int(truth.sum())
+
+    def totals(self) -> Dict[str, Any]:
+        return {
+            "counts": self.counts,
+            "rows": self.rows,
+            "positives": self.positives,
+            "rejected": self.rejected,
+            "unlabelled": self.unlabelled,
+            "triage": self.triage.stats()["tiers"]
+        }
+
+
+def _replay_worker(configs, label_field, ml_model_path, inbox, outbox):
+    """Hauptschleife eines Worker-Prozesses: Stapel bis None nachspielen, dann Zähler senden."""
+    replay = _Replay(configs, label_field, ml_model_path)
+    while True:
+        lines = inbox.get()
+        if lines is None:
+            outbox.put(replay.totals())
+            return
+        replay.feed(lines)
+
+
+def _put(inbox, process, item):
+    """Reiht einen Stapel ein, ohne bei einem abgestürzten Worker endlos zu warten."""
+    while True:
+        try:
+            inbox.put(item, timeout=1.0)
+            return
+        except queue.Full:
+            if not process.is_alive():
+                raise RuntimeError(f"Worker-Prozess beendet: {process.name}")
+
+
+def _collect(outbox, processes) -> List[Dict[str, Any]]:
+    """Sammelt die Zähler aller Worker."""
+    parts = []
+    while len(parts) < len(processes):
+        try:
+            parts.append(outbox.get(timeout=1.0))
+        except queue.Empty:
+            # Ein Worker endet erst nach dem Ablegen seiner Zähler mit Code 0; jeder andere Code ist ein Absturz.
+            # Ein bereits beendeter Worker, dessen Ergebnis noch in der Queue liegt, ist also kein Fehler
+            failed = [process.name for process in processes if process.exitcode not in (None, 0)]
+            if failed:
+                raise RuntimeError(f"Worker-Prozess ohne Ergebnis beendet: {', '.join(failed)}")
+    return parts
+
+
+def estimate_prompt_tokens(transactions: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Durchschnittliche Prompt-Tokens der decision- und explanation-Stufe für eine Stichprobe.
+
+    Die Bewertungen der Stichprobe stammen aus Modell und Regel-Engine ohne Profil.
+    """
+    model, engine = FraudScoringModel(), RuleEngine()
+    totals = {"decision": 0, "explanation": 0}
+    count = 0
+    for transaction in transactions:
+        transaction_json = compact_json({field: transaction.get(field) for field in PROMPT_FIELDS})
+        ml_json = compact_json(model.score(transaction))
+        rule_json = compact_json(engine.evaluate(transaction))
+        for stage in totals:
+            totals[stage] += metrics.count_tokens(build_prompt(stage, transaction_json, ml_json, rule_json))
+        count += 1
+    return {stage: total / count if count else 0.0 for stage, total in totals.items()}
+
+
+def run_backtest(
+        source: str,
+        grid: Optional[Dict[str, Sequence[Any]]] = None,
+        workers: Optional[int] = None,
+        label_field: str = "is_fraud",
+        ml_model_path: Optional[str] = None,
+        chunk_rows: int = 8192,
+        explanation_response_tokens: int = 150,
+        price_per_1k_tokens: Optional[float] = None,
+        token_sample: int = 256
+) -> Dict[str, Any]:
+    """
+    Spielt eine gelabelte Historie nach und wertet alle Konfigurationen des Rasters aus.
+
+    Args:
+        source: JSONL-Datei oder Verzeichnis mit *.jsonl-Dateien, chronologisch sortiert
+        grid: Raster der Parameter (Standard: DEFAULT_GRID)
+        workers: Anzahl Worker-Prozesse (Standard: Anzahl CPU-Kerne)
+        label_field: Feld mit dem Label (bool, 0/1 oder "fraud"/"confirmed_fraud")
+        ml_model_path: Optionaler Pfad zu trainierten Modellgewichten
+        chunk_rows: Zeilen je Stapel an einen Worker
+        explanation_response_tokens: Angenommene Antwortlänge der explanation-Stufe in Tokens
+        price_per_1k_tokens: Optionaler Preis je 1000 Tokens für die Kostenschätzung
+        token_sample: Anzahl Zeilen für die Schätzung der Prompt-Tokens
+
+    Returns:
+        Ein Bericht mit Kennzahlen je Konfiguration, absteigend nach F1 sortiert
+    """
+    configs = expand_grid(grid if grid is not None else DEFAULT_GRID)
+    workers = workers or multiprocessing.cpu_count()
+    context = multiprocessing.get_context("spawn")
+    outbox = context.Queue()
+    inboxes = [context.Queue(maxsize=4) for _ in range(workers)]
+    processes = [
+        context.Process(
+            target=_replay_worker, args=(configs, label_field, ml_model_path, inbox, outbox),
+            name=f"backtest-{index}", daemon=True
+        )
+        for index, inbox in enumerate(inboxes)
+    ]
+    for process in processes:
+        process.start()
+
+    ring = HashRing(range(workers))
+    partition = functools.lru_cache(maxsize=1 << 20)(ring.node_for)
+    buffers: List[List[str]] = [[] for _ in range(workers)]
+    sample: List[Dict[str, Any]] = []
+    started = time.perf_counter()
+    try:
+        for _, _, line in iter_lines(source):
+            match = _SENDER.search(line)
+            if match is None:
+                if not line.strip():
+                    continue
+                # Ungewöhnlich formatierte Zeile: der Worker zählt sie als ungültig oder wertet sie aus
+                try:
+                    sender = str(json.loads(line).get("sender_account", ""))
+                except (AttributeError, ValueError):
+                    sender = ""
+            else:
+                sender = match.group(1)
+            if len(sample) < token_sample and match is not None:
+                try:
+                    sample.append(json.loads(line))
+                except ValueError:
+                    pass
+            index = partition(sender)
+            buffers[index].append(line)
+            if len(buffers[index]) >= chunk_rows:
+                _put(inboxes[index], processes[index], buffers[index])
+                buffers[index] = []
+        for index, lines in enumerate(buffers):
+            if lines:
+                _put(inboxes[index], processes[index], lines)
+        for inbox, process in zip(inboxes, processes):
+            _put(inbox, process, None)
+        parts = _collect(outbox, processes)
+    finally:
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+    seconds = time.perf_counter() - started
+
+    counts = sum(part["counts"] for part in parts)
+    rows = sum(part["rows"] for part in parts)
+    positives = sum(part["positives"] for part in parts)
+    triage_counts = {
+        tier: sum(part["triage"][tier]["count"] for part in parts) for tier in parts[0]["triage"]
+    } if parts else {}
+
+    prompt_tokens = estimate_prompt_tokens(sample)
+    tokens_per_call = {
+        "decision": prompt_tokens["decision"] + metrics.count_tokens(compact_json(DECISION_SCHEMA)),
+        "explanation": prompt_tokens["explanation"] + explanation_response_tokens
+    }
+
+    results = []
+    for config, row in zip(configs, counts):
+        values = dict(zip(_COUNTERS, (int(value) for value in row)))
+        precision = values["tp"] / values["alerts"] if values["alerts"] else 0.0
+        recall = values["tp"] / (values["tp"] + values["fn"]) if values["tp"] + values["fn"] else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        tokens = (
+            values["decision_calls"] * tokens_per_call["decision"]
+            + values["explanation_calls"] * tokens_per_call["explanation"]
+        )
+        results.append({
+            "config": config,
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(f1, 4),
+            "alerts": values["alerts"],
+            "alert_rate": round(values["alerts"] / rows, 6) if rows else 0.0,
+            "true_positives": values["tp"],
+            "false_positives": values["fp"],
+            "false_negatives": values["fn"],
+            "llm_calls": {"decision": values["decision_calls"], "explanation": values["explanation_calls"]},
+            "projected_tokens": int(round(tokens)),
+            "projected_cost": round(tokens / 1000 * price_per_1k_tokens, 2) if price_per_1k_tokens is not None else None
+        })
+    results.sort(key=lambda result: (-result["f1"], result["alerts"]))
+
+    return {
+        "rows": rows,
+        "positives": positives,
+        "rejected": sum(part["rejected"] for part in parts),
+        "unlabelled": sum(part["unlabelled"] for part in parts),
+        "workers": workers,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds else 0.0,
+        "triage": triage_counts,
+        "tokens_per_llm_call": {stage: round(value, 1) for stage, value in tokens_per_call.items()},
+        "configurations": results
+    }
+
+
+def _print_report(report: Dict[str, Any], top: int):
+    print(f"\n=== Backtest: {report['rows']} Zeilen ({report['positives']} Betrugsfälle) in {report['seconds']} s "
+          f"({report['rows_per_second']} Zeilen/s, {report['workers']} Worker) ===")
+    print(f"Ungültig: {report['rejected']}, ohne Label: {report['unlabelled']}, Vorprüfung: {report['triage']}")
+    print(f"Tokens je LLM-Aufruf: {report['tokens_per_llm_call']}")
+    print(f"{'Precision':>10}{'Recall':>8}{'F1':>8}{'Alarme':>10}{'LLM':>9}{'Tokens':>12}  Konfiguration")
+    for result in report["configurations"][:top]:
+        calls = result["llm_calls"]["decision"] + result["llm_calls"]["explanation"]
+        print(f"{result['precision']:>10}{result['recall']:>8}{result['f1']:>8}{result['alerts']:>10}"
+              f"{calls:>9}{result['projected_tokens']:>12}  {compact_json(result['config'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Historischer Replay zur Kalibrierung von Schwellwerten und Regeln")
+    parser.add_argument("--input", required=True, help="Gelabelte JSONL-Datei oder Verzeichnis, chronologisch sortiert")
+    parser.add_argument("--grid", help="JSON-Datei mit dem Raster (Standard: DEFAULT_GRID)")
+    parser.add_argument("--workers", type=int, help="Worker-Prozesse (Standard: Anzahl CPU-Kerne)")
+    parser.add_argument("--label-field", default="is_fraud")
+    parser.add_argument("--ml-model", help="Pfad zu trainierten Modellgewichten (.npz)")
+    parser.add_argument("--chunk-rows", type=int, default=8192)
+    parser.add_argument("--explanation-tokens", type=int, default=150,
+                        help="Angenommene Antwortlänge der explanation-Stufe in Tokens")
+    parser.add_argument("--price-per-1k-tokens", type=float, help="Preis je 1000 Tokens für die Kostenschätzung")
+    parser.add_argument("--top", type=int, default=20, help="Anzahl angezeigter Konfigurationen")
+    parser.add_argument("--json", action="store_true", help="Bericht als JSON ausgeben")
+    args = parser.parse_args()
+
+    grid_definition = None
+    if args.grid:
+        with open(args.grid, encoding="utf-8") as handle:
+            grid_definition = json.load(handle)
+    backtest_report = run_backtest(
+        args.input,
+        grid=grid_definition,
+        workers=args.workers,
+        label_field=args.label_field,
+        ml_model_path=args.ml_model,
+        chunk_rows=args.chunk_rows,
+        explanation_response_tokens=args.explanation_tokens,
+        price_per_1k_tokens=args.price_per_1k_tokens
+    )
+    if args.json:
+        print(json.dumps(backtest_report, indent=2))
+    else:
+        _print_report(backtest_report, args.top)
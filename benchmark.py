@@ -0,0 +1,417 @@
+"""
+Offline-Benchmark für das Betrugserkennungssystem.
+
+Ein deterministisches Stub-LLM ersetzt die Crew-Ausführung (konfigurierbare
+Latenz, Antwortvorlagen im erwarteten JSON-Format je Task), ein
+Transaktionsgenerator erzeugt realistische Beträge, Uhrzeiten und Empfänger.
+Gemessen werden Durchsatz sowie p50/p95/p99 je Stufe für process_transaction
+und process_transactions.
+
+Aufruf:
+    python benchmark.py --transactions 2000 --latency-ms 40 --mode both
+"""
+import argparse
+import calendar
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from prompts import BATCH_MARKER
+
+
+# Antwortvorlagen je Stufe; die Auswahl erfolgt deterministisch anhand des Prompts
+DEFAULT_TEMPLATES: Dict[str, List[str]] = {
+    "ml": [
+        '{"probability": 0.12, "threshold": 0.5, "is_fraud": false, "features": {"amount_unusually_high": false, '
+        '"new_receiver": false, "is_realtime": false, "unusual_time": false}, "model_version": "fraud-detection-v3.2"}',
+        '{"probability": 0.81, "threshold": 0.5, "is_fraud": true, "features": {"amount_unusually_high": true, '
+        '"new_receiver": true, "is_realtime": true, "unusual_time": false}, "model_version": "fraud-detection-v3.2"}'
+    ],
+    "rule": [
+        '{"is_flagged": false, "rules_triggered": [], "version": "rule-engine-v2.1"}',
+        '{"is_flagged": true, "rules_triggered": ["large_amount", "new_receiver"], "version": "rule-engine-v2.1"}'
+    ],
+    "coordinator": ["approve_transaction", "generate_explanation", "decision_agent"],
+    "explanation": [
+        "Die Transaktion weicht deutlich vom üblichen Betrag ab und geht an einen neuen Empfänger. "
+        "Zusammen mit der ML-Wahrscheinlichkeit ergibt sich ein erhöhtes Risiko."
+    ],
+    "decision": [
+        '{"decision": "approved", "confidence": 0.82, "reasoning": "Geringes Risiko trotz Echtzeit-Überweisung."}',
+        '{"decision": "declined", "confidence": 0.91, "reasoning": "Hoher Betrag an neuen Empfänger zur Nachtzeit."}'
+    ],
+    "query": ["Keine Auffälligkeiten in der Historie gefunden."]
+}
+
+
+class StubLLM:
+    """Deterministischer Ersatz für die LLM-Ausführung, nutzbar als task_runner."""
+
+    def __init__(
+            self,
+            latency_ms: float = 50.0,
+            jitter_ms: float = 10.0,
+            stage_latency_ms: Optional[Dict[str, float]] = None,
+            templates: Optional[Dict[str, List[str]]] = None,
+            malformed_share: float = 0.0
+    ):
+        """
+        Args:
+            latency_ms: Mittlere Antwortzeit je Aufruf
+            jitter_ms: Maximale Abweichung von der mittleren Antwortzeit
+            stage_latency_ms: Abweichende mittlere Antwortzeit je Stufe
+            templates: Antwortvorlagen je Stufe (Standard: DEFAULT_TEMPLATES)
+            malformed_share: Anteil der Aufrufe, die eine unbrauchbare Antwort liefern
+        """
+        self.malformed_share = malformed_share
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stage_latency_ms = stage_latency_ms or {}
+        self.templates = templates or DEFAULT_TEMPLATES
+        self.stages: Dict[int, str] = {}
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def bind(self, system) -> "StubLLM":
+        """Übernimmt die Agent-Stufen-Zuordnung eines FraudDetectionSystem."""
+        self.stages = system.agent_stages
+        return self
+
+    def __call__(self, agent, task) -> str:
+        stage = self.stages.get(id(agent), "query")
+        digest = zlib.crc32(task.description.encode("utf-8"))
+        with self._lock:
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+        # Latenz und Vorlage hängen nur vom Prompt ab und sind damit reproduzierbar
+        jitter = ((digest % 2001) / 1000.0 - 1.0) * self.jitter_ms
+        time.sleep(max(0.0, self.stage_latency_ms.get(stage, self.latency_ms) + jitter) / 1000.0)
+        if BATCH_MARKER in task.description:
+            return self._batch_answer(stage, task.description)
+        if (digest >> 3) % 1000 < self.malformed_share * 1000:
+            return "Ich kann diese Anfrage leider nicht im gewünschten Format beantworten."
+        options = self.templates.get(stage) or [""]
+        return options[(digest >> 11) % len(options)]
+
+    def _batch_answer(self, stage: str, prompt: str) -> str:
+        """Antwort auf einen gebündelten Prompt; fehlerhafte Anteile fehlen im Array."""
+        options = self.templates.get(stage) or ["{}"]
+        items = []
+        for line in prompt.split(BATCH_MARKER, 1)[1].splitlines():
+            if not line.strip():
+                continue
+            digest = zlib.crc32(line.encode("utf-8"))
+            if (digest >> 3) % 1000 < self.malformed_share * 1000:
+                continue
+            item = json.loads(options[(digest >> 11) % len(options)])
+            item["transaction_id"] = json.loads(line)["transaction_id"]
+            items.append(item)
+        return json.dumps(items, ensure_ascii=False)
+
+
+# Beschreibungen für wiederkehrende und einmalige Zahlungen
+_RECURRING = ["Monatsmiete", "Gehalt", "Stromabschlag", "Versicherung", "Streaming-Abo", "Fitnessstudio"]
+_ONE_OFF = ["Online-Einkauf", "Restaurant", "Überweisung an Freund", "Reisebuchung", "Handwerker", "Geschenk"]
+_SUSPICIOUS = ["Dringende Zahlung", "Gewinn Lotterie", "Bitcoin Kauf", "Gutschein", "Erbschaft Gebühren"]
+_COUNTRIES = ["DE"] * 8 + ["FR", "ES", "NL", "IT", "PL", "LT", "CY"]
+
+
+def _iban(rng: random.Random, country: str = "DE") -> str:
+    return country + "".join(str(rng.randrange(10)) for _ in range(20))
+
+
+def generate_transactions(
+        count: int,
+        seed: int = 42,
+        accounts: int = 1000,
+        realtime_share: float = 0.2,
+        anomaly_share: float = 0.03,
+        start: str = "2024-01-01T00:00:00+00:00"
+) -> Iterator[Dict[str, Any]]:
+    """
+    Erzeugt synthetische Transaktionen mit realistischen Verteilungen.
+
+    Beträge sind log-normalverteilt mit kontospezifischem Niveau, Uhrzeiten
+    folgen einem Tagesprofil mit Spitzen am Mittag und Abend, Empfänger werden
+    überwiegend aus einem festen, Zipf-gewichteten Kreis je Konto gewählt.
+    Ein kleiner Anteil Anomalien (hohe Beträge, Nachtzeit, neue Auslandsempfänger,
+    verdächtige Beschreibungen) ist beigemischt.
+
+    Args:
+        count: Anzahl zu erzeugender Transaktionen
+        seed: Startwert für reproduzierbare Ergebnisse
+        accounts: Anzahl Absenderkonten
+        realtime_share: Anteil Echtzeit-Überweisungen
+        anomaly_share: Anteil auffälliger Transaktionen
+
+    Yields:
+        Transaktionen im Format von main.Transaction
+    """
+    rng = random.Random(seed)
+    senders = [_iban(rng) for _ in range(accounts)]
+    receivers = [[_iban(rng, rng.choice(_COUNTRIES)) for _ in range(rng.randint(3, 10))] for _ in range(accounts)]
+    levels = [rng.lognormvariate(4.0, 0.8) for _ in range(accounts)]
+    # Stunden-Gewichte: wenig nachts, Spitzen mittags und abends
+    hour_weights = [0.2, 0.1, 0.1, 0.1, 0.1, 0.3, 1, 2, 3, 4, 4, 5, 6, 5, 4, 4, 4, 5, 6, 6, 5, 3, 1.5, 0.6]
+    current = calendar.timegm(time.strptime(start[:19], "%Y-%m-%dT%H:%M:%S"))
+
+    for index in range(count):
+        account = min(int(rng.paretovariate(1.2)) - 1, accounts - 1) if rng.random() < 0.5 else rng.randrange(accounts)
+        anomaly = rng.random() < anomaly_share
+        current += rng.expovariate(1 / 30.0)
+        day = int(current // 86400) * 86400
+        hour = rng.choices(range(24), weights=hour_weights)[0]
+
+        if anomaly:
+            hour = rng.choice([0, 1, 2, 3, 4, 23])
+            amount = levels[account] * rng.uniform(10, 60)
+            receiver = _iban(rng, rng.choice(_COUNTRIES[8:]))
+            description = rng.choice(_SUSPICIOUS + _ONE_OFF)
+        else:
+            circle = receivers[account]
+            rank = min(int(rng.paretovariate(1.5)) - 1, len(circle) - 1)
+            receiver = circle[rank] if rng.random() < 0.9 else _iban(rng, rng.choice(_COUNTRIES))
+            recurring = rank == 0 and rng.random() < 0.6
+            amount = levels[account] * (4 if recurring else rng.lognormvariate(0.0, 0.7))
+            description = rng.choice(_RECURRING if recurring else _ONE_OFF)
+
+        timestamp = day + hour * 3600 + rng.randrange(3600)
+        yield {
+            "transaction_id": f"bench{seed}-{index}",
+            "sender_account": senders[account],
+            "receiver_account": receiver,
+            "amount": round(amount, 2),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp)),
+            "description": description if rng.random() > 0.05 else None,
+            "is_realtime": rng.random() < realtime_share
+        }
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return math.nan
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class StageTimer:
+    """Sammelt Laufzeiten je Stufe (threadsicher)."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds * 1000.0)
+
+    def wrap(self, stage: Any, function: Callable) -> Callable:
+        """Umhüllt eine Funktion mit einer Zeitmessung; stage darf eine Funktion der Argumente sein."""
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(stage(*args) if callable(stage) else stage, time.perf_counter() - start)
+        return timed
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            result = {}
+            for stage, values in sorted(self.samples.items()):
+                ordered = sorted(values)
+                result[stage] = {
+                    "count": len(ordered),
+                    "p50_ms": round(_percentile(ordered, 0.50), 3),
+                    "p95_ms": round(_percentile(ordered, 0.95), 3),
+                    "p99_ms": round(_percentile(ordered, 0.99), 3),
+                    "mean_ms": round(sum(ordered) / len(ordered), 3)
+                }
+            return result
+
+
+def _instrument(system, stub: StubLLM, timer: StageTimer):
+    """Hängt Zeitmessungen an die Stufen eines FraudDetectionSystem."""
+    stages = system.agent_stages
+    system._assess_ml = timer.wrap("ml", system._assess_ml)
+    system._assess_rules = timer.wrap("rule", system._assess_rules)
+    system._assess_native_batch = timer.wrap("ml+rule (batch)", system._assess_native_batch)
+    # LLM-Stufen inklusive Wartezeit auf einen freien LLM-Slot; ML/Regeln per LLM getrennt ausweisen
+    def llm_stage(agent, task):
+        stage = stages.get(id(agent), "query")
+        return f"{stage}.llm" if stage in ("ml", "rule") else stage
+    system.task_runner = timer.wrap(llm_stage, stub)
+
+
+def run_benchmark(
+        transactions: int = 1000,
+        mode: str = "both",
+        latency_ms: float = 50.0,
+        jitter_ms: float = 10.0,
+        malformed_share: float = 0.0,
+        max_concurrency: int = 16,
+        max_llm_calls: int = 16,
+        seed: int = 42,
+        **system_options
+) -> Dict[str, Any]:
+    """
+    Führt den Benchmark aus.
+
+    Args:
+        transactions: Anzahl synthetischer Transaktionen je Durchlauf
+        mode: "single" (process_transaction), "batch" (process_transactions) oder "both"
+        latency_ms: Mittlere Stub-LLM-Latenz
+        jitter_ms: Maximale Abweichung der Stub-LLM-Latenz
+        malformed_share: Anteil unbrauchbarer Stub-LLM-Antworten
+        max_concurrency: Parallelität des Batch-Pfads
+        max_llm_calls: Gleichzeitige LLM-Aufrufe des Systems
+        seed: Startwert des Generators
+        **system_options: Weitere Argumente für FraudDetectionSystem (z.B. routing, ml_backend)
+
+    Returns:
+        Ein Bericht je Durchlauf mit Durchsatz und Stufen-Perzentilen
+    """
+    import main
+    import metrics
+    from history_store import TransactionHistoryStore
+    from profile_store import ProfileStore
+    from velocity import VelocityEngine
+
+    report = {}
+    runs = ["single", "batch"] if mode == "both" else [mode]
+    for run in runs:
+        # Jeder Durchlauf beginnt mit leeren Profilen, leerer Historie und leeren Zeitfenstern
+        main.profile_store = ProfileStore()
+        main.history_store = TransactionHistoryStore()
+        main.velocity_engine = VelocityEngine()
+        metrics.registry.reset()
+        metrics.registry.enable()
+
+        timer = StageTimer()
+        stub = StubLLM(latency_ms=latency_ms, jitter_ms=jitter_ms, malformed_share=malformed_share)
+        system = main.FraudDetectionSystem(verbose=False, max_llm_calls=max_llm_calls, **system_options)
+        stub.bind(system)
+        _instrument(system, stub, timer)
+
+        data = list(generate_transactions(transactions, seed=seed))
+        start = time.perf_counter()
+        if run == "single":
+            process = timer.wrap("end_to_end", system.process_transaction)
+            results = [process(transaction) for transaction in data]
+        else:
+            results = list(system.process_transactions(data, max_concurrency=max_concurrency))
+        elapsed = time.perf_counter() - start
+        system.close()
+
+        if run == "batch":
+            # Im Batch-Pfad liefert jedes Ergebnis seine eigene Laufzeit
+            for result in results:
+                if "latency" in result:
+                    timer.record("end_to_end", result["latency"]["elapsed_ms"] / 1000.0)
+
+        decisions: Dict[str, int] = {}
+        for result in results:
+            key = result.get("decision_path", "error") if "error" not in result else "error"
+            decisions[key] = decisions.get(key, 0) + 1
+
+        report[run] = {
+            "transactions": len(results),
+            "seconds": round(elapsed, 3),
+            "throughput_tps": round(len(results) / elapsed, 2) if elapsed else None,
+            "llm_calls": dict(stub.calls),
+            "decision_paths": decisions,
+            "stages": timer.summary(),
+            "tokens": _token_summary(metrics.registry.snapshot()),
+            "triage": system.triage.stats()["tiers"] if system.triage is not None else None,
+            "micro_batching": {
+                f"{sample['labels']['stage']}.{sample['labels']['outcome']}": sample["value"]
+                for sample in metrics.registry.snapshot()["fraud_batch_items_total"]["samples"]
+            }
+        }
+    return report
+
+
+def _token_summary(snapshot: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Fasst Prompt-/Antwort-Tokens, Parse-Fehler und Wiederholungen je Stufe aus einem Metrik-Snapshot zusammen."""
+    fields = {
+        "fraud_prompt_tokens_total": "prompt_tokens",
+        "fraud_response_tokens_total": "response_tokens",
+        "fraud_parse_failures_total": "parse_failures",
+        "fraud_task_retries_total": "retries"
+    }
+    summary: Dict[str, Dict[str, float]] = {}
+    for name, field in fields.items():
+        for sample in snapshot[name]["samples"]:
+            summary.setdefault(sample["labels"]["stage"], {})[field] = sample["value"]
+    return summary
+
+
+def _print_report(report: Dict[str, Any]):
+    for run, data in report.items():
+        print(f"\n=== {run}: {data['transactions']} Transaktionen in {data['seconds']} s "
+              f"({data['throughput_tps']} TPS) ===")
+        print(f"LLM-Aufrufe: {data['llm_calls']}")
+        print(f"Entscheidungspfade: {data['decision_paths']}")
+        print(f"{'Stufe':<20}{'Anzahl':>8}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}")
+        for stage, stats in data["stages"].items():
+            print(f"{stage:<20}{stats['count']:>8}{stats['p50_ms']:>12}{stats['p95_ms']:>12}{stats['p99_ms']:>12}")
+        print(f"Tokens je Stufe: {data['tokens']}")
+        if data["triage"] is not None:
+            print(f"Vorprüfung: {data['triage']}")
+        if data["micro_batching"]:
+            print(f"Micro-Batching: {data['micro_batching']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline-Benchmark mit Stub-LLM")
+    parser.add_argument("--transactions", type=int, default=1000)
+    parser.add_argument("--mode", choices=["single", "batch", "both"], default="both")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--malformed-share", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--max-llm-calls", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--routing", choices=["deterministic", "llm"], default="deterministic")
+    parser.add_argument("--ml-backend", choices=["native", "llm"], default="native")
+    parser.add_argument("--rule-backend", choices=["native", "llm"], default="native")
+    parser.add_argument("--triage", action="store_true", help="Vorprüfung einschalten")
+    parser.add_argument("--micro-batch-size", type=int, default=0)
+    parser.add_argument("--micro-batch-wait-ms", type=float, default=20.0)
+    parser.add_argument("--json", action="store_true", help="Bericht als JSON ausgeben")
+    parser.add_argument("--prompt-report", action="store_true",
+                        help="Nur Tokenzahlen der Prompts vorher/nachher für eine synthetische Transaktion ausgeben")
+    args = parser.parse_args()
+
+    if args.prompt_report:
+        from ml_model import FraudScoringModel
+        from prompts import token_report
+        from rule_engine import RuleEngine
+        sample = next(generate_transactions(1, seed=args.seed))
+        print(json.dumps(token_report(sample, FraudScoringModel().score(sample), RuleEngine().evaluate(sample)), indent=2))
+        raise SystemExit(0)
+
+    benchmark_report = run_benchmark(
+        transactions=args.transactions,
+        mode=args.mode,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        malformed_share=args.malformed_share,
+        max_concurrency=args.max_concurrency,
+        max_llm_calls=args.max_llm_calls,
+        seed=args.seed,
+        routing=args.routing,
+        ml_backend=args.ml_backend,
+        rule_backend=args.rule_backend,
+        triage=args.triage,
+        micro_batch_size=args.micro_batch_size,
+        micro_batch_wait_ms=args.micro_batch_wait_ms
+    )
+    if args.json:
+        print(json.dumps(benchmark_report, indent=2))
+    else:
+        _print_report(benchmark_report)
@@ -0,0 +1,339 @@
+"""
+Vektorindex für historische Betrugs- und Fehlalarmfälle.
+
+Jeder Fall wird als Merkmalsvektor fester Breite (Einheitsvektor, float32)
+abgelegt; die Ähnlichkeit ist die Kosinus-Ähnlichkeit. Kleine Bestände werden
+exakt und vektorisiert durchsucht, große über einen IVF-Index (k-Means-Zentren
+mit invertierten Listen). Mit Pfad liegen Vektoren und Metadaten in
+Binärdateien, die per np.memmap eingeblendet werden; neue Fälle werden
+angehängt und ohne Neuaufbau sofort gefunden. Der IVF-Index wird in einem
+Hintergrund-Thread (neu) aufgebaut und erst danach eingewechselt; bis dahin
+beantworten exakte Suche bzw. alter Index plus nicht indizierte Neuzugänge die
+Anfragen.
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+CASE_FEATURES = [
+    "amount_unusually_high",
+    "new_receiver",
+    "unusual_time",
+    "is_realtime",
+    "large_amount",
+    "suspicious_description",
+    "probability"
+]
+
+OUTCOMES = ["confirmed_fraud", "false_positive"]
+
+CASE_ID_DTYPE = np.dtype("S32")
+
+
+def stored_case_id(case_id: str) -> str:
+    """
+    Liefert die Fall-ID, wie der Index sie speichert und in Treffern zurückgibt.
+
+    IDs bis 32 Byte (UTF-8) bleiben unverändert; längere würden abgeschnitten
+    und könnten kollidieren. Sie werden stattdessen durch "~" plus einen stabilen
+    Hash ersetzt.
+    """
+    encoded = case_id.encode("utf-8")
+    if len(encoded) <= CASE_ID_DTYPE.itemsize:
+        return case_id
+    return "~" + hashlib.blake2b(encoded, digest_size=(CASE_ID_DTYPE.itemsize - 1) // 2).hexdigest()
+
+
+def encode_case(features: Dict[str, Any]) -> np.ndarray:
+    """Kodiert ein Merkmals-Dictionary als Vektor in der Reihenfolge von CASE_FEATURES."""
+    return np.array([float(features.get(name) or 0.0) for name in CASE_FEATURES], dtype=np.float32)
+
+
+def decode_case(vector: np.ndarray) -> Dict[str, bool]:
+    """
+    Übersetzt einen gespeicherten Vektor zurück in lesbare Merkmale.
+
+    Gespeichert werden Einheitsvektoren; die booleschen Merkmale bleiben daher
+    erhalten, die Wahrscheinlichkeit aber nicht und wird weggelassen.
+    """
+    return {
+        name: bool(value > 0)
+        for name, value in zip(CASE_FEATURES, vector)
+        if name != "probability"
+    }
+
+
+def case_features_from_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Leitet die Fallmerkmale aus einem Ergebnis von process_transaction ab."""
+    ml_assessment = result.get("ml_assessment") or {}
+    rule_assessment = result.get("rule_assessment") or {}
+    features = dict(ml_assessment.get("features") or {})
+    for rule in rule_assessment.get("rules_triggered") or []:
+        features[rule] = True
+    features["probability"] = ml_assessment.get("probability", 0.0)
+    return features
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indizes der k größten Werte, absteigend sortiert."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    candidates = np.argpartition(-scores, k)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class CaseIndex:
+    """Ähnlichkeitsindex über historische Fälle mit exakter und IVF-Suche."""
+
+    def __init__(
+            self,
+            path: Optional[str] = None,
+            exact_threshold: int = 50000,
+            nprobe: int = 8,
+            rebuild_fraction: float = 0.1
+    ):
+        """
+        Args:
+            path: Optionales Verzeichnis für die Binärdateien (None = nur im Speicher)
+            exact_threshold: Bis zu dieser Größe wird exakt gesucht
+            nprobe: Anzahl durchsuchter IVF-Listen je Anfrage
+            rebuild_fraction: Anteil nicht indizierter Neuzugänge, ab dem der IVF-Index neu aufgebaut wird
+        """
+        self.path = path
+        self.dimension = len(CASE_FEATURES)
+        self.exact_threshold = exact_threshold
+        self.nprobe = nprobe
+        self.rebuild_fraction = rebuild_fraction
+        self._lock = threading.RLock()
+        self._size = 0
+
+        # IVF-Zustand: Zentren, nach Liste sortierte Zeilen und Listengrenzen
+        self._centroids: Optional[np.ndarray] = None
+        self._list_rows: Optional[np.ndarray] = None
+        self._list_offsets: Optional[np.ndarray] = None
+        self._indexed = 0
+        self._rebuild_thread: Optional[threading.Thread] = None
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._files = {
+                "vectors": os.path.join(path, "vectors.f32"),
+                "case_ids": os.path.join(path, "case_ids.bin"),
+                "outcomes": os.path.join(path, "outcomes.u8")
+            }
+            for file_path in self._files.values():
+                open(file_path, "ab").close()
+            self._size = os.path.getsize(self._files["outcomes"])
+            self._map()
+        else:
+            self._vectors = np.zeros((1024, self.dimension), dtype=np.float32)
+            self._case_ids = np.zeros(1024, dtype=CASE_ID_DTYPE)
+            self._outcomes = np.zeros(1024, dtype=np.uint8)
+
+        with self._lock:
+            self._schedule_rebuild()
+
+    def __len__(self):
+        return self._size
+
+    def _map(self):
+        """Blendet die Binärdateien (erneut) per memmap ein."""
+        if self._size == 0:
+            self._vectors = np.zeros((0, self.dimension), dtype=np.float32)
+            self._case_ids = np.zeros(0, dtype=CASE_ID_DTYPE)
+            self._outcomes = np.zeros(0, dtype=np.uint8)
+            return
+        self._vectors = np.memmap(
+            self._files["vectors"], dtype=np.float32, mode="r", shape=(self._size, self.dimension)
+        )
+        self._case_ids = np.memmap(self._files["case_ids"], dtype=CASE_ID_DTYPE, mode="r", shape=(self._size,))
+        self._outcomes = np.memmap(self._files["outcomes"], dtype=np.uint8, mode="r", shape=(self._size,))
+
+    def add_many(self, cases: Iterable[Dict[str, Any]]):
+        """
+        Fügt Fälle inkrementell hinzu.
+
+        Args:
+            cases: Dictionaries mit "case_id", "features" und "outcome"
+        """
+        cases = list(cases)
+        if not cases:
+            return
+        vectors = _normalize(np.stack([encode_case(case["features"]) for case in cases]))
+        case_ids = np.array([stored_case_id(case["case_id"]).encode("utf-8") for case in cases], dtype=CASE_ID_DTYPE)
+        outcomes = np.array([OUTCOMES.index(case["outcome"]) for case in cases], dtype=np.uint8)
+
+        with self._lock:
+            start, end = self._size, self._size + len(cases)
+            if self.path:
+                with open(self._files["vectors"], "ab") as handle:
+                    handle.write(vectors.tobytes())
+                with open(self._files["case_ids"], "ab") as handle:
+                    handle.write(case_ids.tobytes())
+                with open(self._files["outcomes"], "ab") as handle:
+                    handle.write(outcomes.tobytes())
+                self._size = end
+                self._map()
+            else:
+                if end > len(self._vectors):
+                    capacity = max(end, len(self._vectors) * 2)
+                    self._vectors = np.resize(self._vectors, (capacity, self.dimension))
+                    self._case_ids = np.resize(self._case_ids, capacity)
+                    self._outcomes = np.resize(self._outcomes, capacity)
+                self._vectors[start:end] = vectors
+                self._case_ids[start:end] = case_ids
+                self._outcomes[start:end] = outcomes
+                self._size = end
+            self._schedule_rebuild()
+
+    def add(self, case_id: str, features: Dict[str, Any], outcome: str):
+        """Fügt einen einzelnen Fall hinzu."""
+        self.add_many([{"case_id": case_id, "features": features, "outcome": outcome}])
+
+    def _needs_rebuild(self) -> bool:
+        """Ob der IVF-Index fehlt oder zu viele Neuzugänge nicht enthält (Lock muss gehalten werden)."""
+        return self._size > self.exact_threshold and (
+                self._centroids is None or self._size - self._indexed > self.rebuild_fraction * self._indexed
+        )
+
+    def _schedule_rebuild(self):
+        """Startet bei Bedarf den Neuaufbau im Hintergrund, höchstens einen gleichzeitig (Lock muss gehalten werden)."""
+        if self._rebuild_thread is None and self._needs_rebuild():
+            self._rebuild_thread = threading.Thread(target=self._rebuild, name="case-index-ivf", daemon=True)
+            self._rebuild_thread.start()
+
+    def _rebuild(self):
+        """Baut den IVF-Index so lange neu auf, bis er den Bestand ausreichend abdeckt."""
+        try:
+            while True:
+                self.build_ivf()
+                with self._lock:
+                    if not self._needs_rebuild():
+                        return
+        finally:
+            with self._lock:
+                self._rebuild_thread = None
+
+    def wait_for_index(self, timeout: Optional[float] = None):
+        """Wartet, bis ein laufender Neuaufbau des IVF-Index abgeschlossen ist."""
+        with self._lock:
+            thread = self._rebuild_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def build_ivf(self, nlist: Optional[int] = None, iterations: int = 10, sample_size: int = 100000, seed: int = 0):
+        """
+        Baut den IVF-Index über alle aktuell gespeicherten Fälle auf.
+
+        Args:
+            nlist: Anzahl Listen/Zentren (Standard: ca. Wurzel der Fallzahl)
+            iterations: Anzahl k-Means-Iterationen
+            sample_size: Anzahl Stichprobenvektoren für das Training
+            seed: Startwert des Zufallsgenerators
+        """
+        with self._lock:
+            size = self._size
+            vectors = self._vectors[:size]
+        if size == 0:
+            return
+
+        nlist = nlist or int(min(4096, max(1, np.sqrt(size))))
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(size, size=min(size, sample_size), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=min(nlist, len(sample)), replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            occupied = np.bincount(assignment, minlength=len(centroids)) > 0
+            centroids[occupied] = _normalize(sums[occupied])
+
+        # Zuordnung aller Vektoren blockweise, damit der Speicherbedarf begrenzt bleibt
+        assignment = np.empty(size, dtype=np.int32)
+        for start in range(0, size, 65536):
+            assignment[start:start + 65536] = np.argmax(vectors[start:start + 65536] @ centroids.T, axis=1)
+
+        list_rows = np.argsort(assignment, kind="stable").astype(np.int64)
+        list_offsets = np.searchsorted(assignment[list_rows], np.arange(len(centroids) + 1))
+
+        with self._lock:
+            self._centroids = centroids
+            self._list_rows = list_rows
+            self._list_offsets = list_offsets
+            self._indexed = size
+
+    def search(self, features: Dict[str, Any], k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Sucht die k ähnlichsten Fälle.
+
+        Args:
+            features: Merkmale des Anfragefalls
+            k: Anzahl gewünschter Treffer
+
+        Returns:
+            Treffer absteigend nach Ähnlichkeit
+        """
+        query = _normalize(encode_case(features))
+
+        # Alles, was add_many() oder ein Neuaufbau ersetzen kann, unter dem Lock festhalten
+        with self._lock:
+            size = self._size
+            if size == 0:
+                return []
+            vectors = self._vectors
+            case_ids = self._case_ids
+            outcomes = self._outcomes
+            centroids = self._centroids
+            list_rows = self._list_rows
+            list_offsets = self._list_offsets
+            indexed = self._indexed
+
+        if size > self.exact_threshold and centroids is not None:
+            # Nur die nprobe nächsten Listen plus die noch nicht indizierten Neuzugänge durchsuchen
+            probes = _top_k(centroids @ query, self.nprobe)
+            candidates = np.concatenate(
+                [list_rows[list_offsets[p]:list_offsets[p + 1]] for p in probes]
+                + [np.arange(indexed, size)]
+            )
+            scores = vectors[candidates] @ query
+            best = candidates[_top_k(scores, k)]
+            best_scores = vectors[best] @ query
+        else:
+            # Exakt, solange (noch) kein IVF-Index vorliegt
+            scores = vectors[:size] @ query
+            best = _top_k(scores, k)
+            best_scores = scores[best]
+
+        return [
+            {
+                "case_id": case_ids[row].decode("utf-8"),
+                "similarity_score": round(float(score), 4),
+                "features": decode_case(vectors[row]),
+                "outcome": OUTCOMES[outcomes[row]]
+            }
+            for row, score in zip(best, best_scores)
+        ]
+
+
+def parse_case_features(case_features: Any) -> Dict[str, Any]:
+    """Akzeptiert Merkmale als Dictionary, JSON-Text oder Liste von Merkmalsnamen."""
+    if isinstance(case_features, str):
+        try:
+            case_features = json.loads(case_features)
+        except ValueError:
+            case_features = [name.strip() for name in case_features.split(",")]
+    if isinstance(case_features, dict):
+        return case_features
+    if isinstance(case_features, Sequence):
+        return {name: True for name in case_features if isinstance(name, str)}
+    return {}
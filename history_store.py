@@ -0,0 +1,347 @@
+"""
+Spaltenorientierter, nur anhängender Speicher der Transaktionshistorie.
+
+Jedes Feld einer Transaktion liegt in einer eigenen Spalte fester Breite;
+Kontonummern werden auf Ganzzahlen abgebildet, Beschreibungen und
+Transaktions-IDs liegen als Offsets in einem gemeinsamen UTF-8-Heap. Mit Pfad
+sind alle Spalten Binärdateien, die per np.memmap ohne Kopie gelesen werden.
+
+Der Index je Konto ist eine Verkettung: jede Zeile kennt die nächstältere Zeile
+desselben Absenders, pro Konto wird nur die jüngste Zeile gehalten. Die
+Verkettung ist nach Zeitstempel sortiert; verspätet angehängte Transaktionen
+(nebenläufige Verarbeitung, ungeordnete Eingabe) werden beim Anhängen
+einsortiert, was meist nur wenige Schritte kostet. Abfragen laufen von neu nach
+alt und kosten O(Seitengröße plus übersprungene Zeilen nach end) statt
+O(Historie).
+
+remove_accounts() schreibt einen Grabstein (Konto, Zeilenzahl beim Entfernen);
+alle älteren Zeilen des Kontos bleiben liegen, gelten aber auch nach erneutem
+Öffnen als entfernt.
+"""
+import math
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from profile_store import epoch_seconds
+
+
+class _Column:
+    """Anhängbare Spalte, wahlweise im Speicher oder als memmap-Datei."""
+
+    def __init__(self, dtype, path: Optional[str] = None):
+        self.dtype = np.dtype(dtype)
+        self.path = path
+        self._mapped = None
+        if path:
+            open(path, "ab").close()
+            self.size = os.path.getsize(path) // self.dtype.itemsize
+        else:
+            self.size = 0
+            self._data = np.zeros(1024, dtype=self.dtype)
+
+    def append(self, values: np.ndarray):
+        values = np.asarray(values, dtype=self.dtype)
+        if self.path:
+            with open(self.path, "ab") as handle:
+                handle.write(values.tobytes())
+            self._mapped = None
+        else:
+            end = self.size + len(values)
+            if end > len(self._data):
+                self._data = np.resize(self._data, max(end, len(self._data) * 2))
+            self._data[self.size:end] = values
+        self.size += len(values)
+
+    def set(self, index: int, value):
+        """Überschreibt einen einzelnen Wert, z.B. eine Verkettung beim Einsortieren."""
+        if self.path:
+            with open(self.path, "r+b") as handle:
+                handle.seek(index * self.dtype.itemsize)
+                handle.write(np.asarray(value, dtype=self.dtype).tobytes())
+            self._mapped = None
+        else:
+            self._data[index] = value
+
+    def view(self) -> np.ndarray:
+        """Liefert die Spalte ohne Kopie."""
+        if not self.path:
+            return self._data[:self.size]
+        if self.size == 0:
+            return np.zeros(0, dtype=self.dtype)
+        if self._mapped is None or len(self._mapped) != self.size:
+            self._mapped = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(self.size,))
+        return self._mapped
+
+
+COLUMNS = {
+    "amount": np.float64,
+    "timestamp": np.int64,
+    "sender": np.int32,
+    "receiver": np.int32,
+    "is_realtime": np.uint8,
+    "prev_row": np.int64,
+    "transaction_id_offset": np.int64,
+    "transaction_id_length": np.int32,
+    "description_offset": np.int64,
+    "description_length": np.int32
+}
+
+# Grabstein je remove_accounts(): alle Zeilen des Absenders vor rows_before sind entfernt
+TOMBSTONE_DTYPE = np.dtype([("sender", np.int32), ("rows_before", np.int64)])
+
+
+class TransactionHistoryStore:
+    """Spaltenspeicher der Transaktionshistorie mit Verkettung je Absenderkonto."""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: Optionales Verzeichnis für die Spaltendateien (None = nur im Speicher)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(path, exist_ok=True)
+        self._columns = {
+            name: _Column(dtype, os.path.join(path, f"{name}.bin") if path else None)
+            for name, dtype in COLUMNS.items()
+        }
+        self._heap = _Column(np.uint8, os.path.join(path, "strings.bin") if path else None)
+        self._tombstones = _Column(TOMBSTONE_DTYPE, os.path.join(path, "tombstones.bin") if path else None)
+        self._removed_before: Dict[int, int] = {}
+        for tombstone in self._tombstones.view():
+            sender = int(tombstone["sender"])
+            self._removed_before[sender] = max(self._removed_before.get(sender, 0), int(tombstone["rows_before"]))
+
+        # Kontonummern <-> Ganzzahlen; die Datei enthält eine Kontonummer je Zeile
+        self._account_values: List[str] = []
+        self._account_ids: Dict[str, int] = {}
+        self._accounts_file = None
+        if path:
+            accounts_path = os.path.join(path, "accounts.txt")
+            if os.path.exists(accounts_path):
+                with open(accounts_path, encoding="utf-8") as handle:
+                    for line in handle:
+                        self._intern(line.rstrip("\n"), persist=False)
+            self._accounts_file = open(accounts_path, "a", encoding="utf-8")
+
+        # Jüngste Zeile je Absenderkonto wiederherstellen: die Zeile, auf die keine andere verweist.
+        # Ketten vor dem letzten Grabstein eines Kontos (remove_accounts()) bleiben ausgeblendet.
+        self._heads: Dict[int, int] = {}
+        senders = self._columns["sender"].view()
+        if len(senders):
+            prev_rows = self._columns["prev_row"].view()
+            referenced = np.zeros(len(senders), dtype=bool)
+            referenced[prev_rows[prev_rows >= 0]] = True
+            for row in np.flatnonzero(~referenced):
+                sender = int(senders[row])
+                if row >= self._removed_before.get(sender, 0):
+                    self._heads[sender] = int(row)
+
+    def __len__(self):
+        return self._columns["amount"].size
+
+    def _intern(self, account: str, persist: bool = True) -> int:
+        index = self._account_ids.get(account)
+        if index is None:
+            index = len(self._account_values)
+            self._account_ids[account] = index
+            self._account_values.append(account)
+            if persist and self._accounts_file is not None:
+                self._accounts_file.write(account + "\n")
+        return index
+
+    def append_many(self, transactions: Iterable[Dict[str, Any]]):
+        """Hängt Transaktionen an die Historie an."""
+        transactions = list(transactions)
+        if not transactions:
+            return
+
+        with self._lock:
+            start_row = len(self)
+            heap_offset = self._heap.size
+            heap_parts = []
+            values = {name: np.zeros(len(transactions), dtype=dtype) for name, dtype in COLUMNS.items()}
+            stored_timestamps = self._columns["timestamp"].view()
+            stored_prev_rows = self._columns["prev_row"].view()
+            # Neue Verkettungen bereits gespeicherter Zeilen; geschrieben erst, wenn die neuen Zeilen existieren
+            relinked: Dict[int, int] = {}
+
+            def timestamp_of(row):
+                return values["timestamp"][row - start_row] if row >= start_row else stored_timestamps[row]
+
+            def prev_of(row):
+                if row >= start_row:
+                    return int(values["prev_row"][row - start_row])
+                return relinked.get(row, int(stored_prev_rows[row]))
+
+            for i, transaction in enumerate(transactions):
+                sender = self._intern(transaction["sender_account"])
+                timestamp = epoch_seconds(transaction.get("timestamp", ""))
+                values["amount"][i] = float(transaction["amount"])
+                values["timestamp"][i] = 0 if math.isnan(timestamp) else int(timestamp)
+                values["sender"][i] = sender
+                values["receiver"][i] = self._intern(transaction["receiver_account"])
+                values["is_realtime"][i] = bool(transaction.get("is_realtime", False))
+
+                # Nach Zeitstempel einsortieren; bei gleichem Zeitstempel gilt die später angehängte als jünger
+                newer, older = -1, self._heads.get(sender, -1)
+                while older >= 0 and timestamp_of(older) > values["timestamp"][i]:
+                    newer, older = older, prev_of(older)
+                values["prev_row"][i] = older
+                if newer < 0:
+                    self._heads[sender] = start_row + i
+                elif newer >= start_row:
+                    values["prev_row"][newer - start_row] = start_row + i
+                else:
+                    relinked[newer] = start_row + i
+
+                for field in ("transaction_id", "description"):
+                    encoded = (transaction.get(field) or "").encode("utf-8")
+                    values[f"{field}_offset"][i] = heap_offset
+                    values[f"{field}_length"][i] = len(encoded)
+                    heap_offset += len(encoded)
+                    heap_parts.append(encoded)
+
+            self._heap.append(np.frombuffer(b"".join(heap_parts), dtype=np.uint8))
+            for name, column in self._columns.items():
+                column.append(values[name])
+            for row, prev_row in relinked.items():
+                self._columns["prev_row"].set(row, prev_row)
+            if self._accounts_file is not None:
+                self._accounts_file.flush()
+
+    def append(self, transaction: Dict[str, Any]):
+        """Hängt eine einzelne Transaktion an."""
+        self.append_many([transaction])
+
+    def query(
+            self,
+            account_id: str,
+            start: Optional[str] = None,
+            end: Optional[str] = None,
+            limit: int = 20,
+            cursor: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Liefert eine Seite der Historie eines Absenderkontos, neueste zuerst.
+
+        Args:
+            account_id: Das Absenderkonto
+            start: Optionaler frühester Zeitstempel (ISO, inklusive)
+            end: Optionaler spätester Zeitstempel (ISO, inklusive)
+            limit: Maximale Anzahl Transaktionen dieser Seite
+            cursor: Fortsetzungsmarke aus "next_cursor" der vorherigen Seite
+
+        Returns:
+            Ein Dictionary mit "transactions" und "next_cursor" (None auf der letzten Seite)
+
+        Raises:
+            ValueError: Wenn cursor keine Zeile der aktuellen Historie dieses Kontos bezeichnet
+        """
+        start_ts = epoch_seconds(start) if start else -math.inf
+        end_ts = epoch_seconds(end) if end else math.inf
+
+        with self._lock:
+            sender = self._account_ids.get(account_id)
+            row = -1 if sender is None else self._heads.get(sender, -1)
+            columns = {name: column.view() for name, column in self._columns.items()}
+            if cursor is not None:
+                # Der Cursor kommt vom Aufrufer (z.B. aus einem Tool-Aufruf des LLM) und darf nur in die
+                # eigene, nicht entfernte Kette zeigen
+                row = int(cursor)
+                if (
+                        row < 0 or row >= len(self) or sender not in self._heads
+                        or int(columns["sender"][row]) != sender or row < self._removed_before.get(sender, 0)
+                ):
+                    raise ValueError(f"Ungültiger Cursor für Konto {account_id}: {cursor}")
+            heap = self._heap.view()
+
+            # Unter dem Lock, da append_many() Verkettungen älterer Zeilen auf neue Zeilen umsetzen kann.
+            # Die Verkettung ist nach Zeitstempel sortiert: Zeilen nach end werden übersprungen, die Suche
+            # endet beim ersten Treffer vor start.
+            timestamps = columns["timestamp"]
+            prev_rows = columns["prev_row"]
+            rows = []
+            while row >= 0 and len(rows) < limit:
+                timestamp = timestamps[row]
+                if timestamp < start_ts:
+                    row = -1
+                    break
+                if timestamp <= end_ts:
+                    rows.append(row)
+                row = int(prev_rows[row])
+
+        return {
+            "transactions": [self._read_row(columns, heap, r) for r in rows],
+            "next_cursor": row if row >= 0 else None
+        }
+
+    def senders(self) -> List[str]:
+        """Alle Absenderkonten mit mindestens einer Transaktion."""
+        with self._lock:
+            return [self._account_values[sender] for sender in self._heads]
+
+    def export_accounts(self, accounts: Iterable[str]) -> List[Dict[str, Any]]:
+        """
+        Liefert die vollständige Historie einzelner Absenderkonten, je Konto in zeitlicher Reihenfolge.
+
+        Das Ergebnis kann unverändert an append_many() eines anderen Speichers übergeben werden.
+        """
+        with self._lock:
+            rows = []
+            prev_rows = self._columns["prev_row"].view()
+            for account in accounts:
+                sender = self._account_ids.get(account)
+                row = -1 if sender is None else self._heads.get(sender, -1)
+                chain = []
+                while row >= 0:
+                    chain.append((row, account))
+                    row = int(prev_rows[row])
+                rows.extend(reversed(chain))
+            columns = {name: column.view() for name, column in self._columns.items()}
+            heap = self._heap.view()
+
+        return [dict(self._read_row(columns, heap, row), sender_account=account) for row, account in rows]
+
+    def remove_accounts(self, accounts: Iterable[str]):
+        """
+        Blendet die Historie einzelner Absenderkonten aus, z.B. nach der Übergabe an einen anderen Shard.
+
+        Der Speicher ist nur anhängend: die Zeilen bleiben liegen, sind über query() und export_accounts()
+        aber nicht mehr erreichbar. Ein Grabstein hält das auch über ein erneutes Öffnen fest; später
+        angehängte Transaktionen des Kontos beginnen eine neue Kette.
+        """
+        with self._lock:
+            tombstones = []
+            for account in accounts:
+                sender = self._account_ids.get(account)
+                if sender is not None and self._heads.pop(sender, None) is not None:
+                    self._removed_before[sender] = len(self)
+                    tombstones.append((sender, len(self)))
+            if tombstones:
+                self._tombstones.append(np.array(tombstones, dtype=TOMBSTONE_DTYPE))
+
+    def _read_row(self, columns: Dict[str, np.ndarray], heap: np.ndarray, row: int) -> Dict[str, Any]:
+        def text(field):
+            offset = int(columns[f"{field}_offset"][row])
+            return bytes(heap[offset:offset + int(columns[f"{field}_length"][row])]).decode("utf-8")
+
+        timestamp = int(columns["timestamp"][row])
+        return {
+            "transaction_id": text("transaction_id"),
+            "amount": float(columns["amount"][row]),
+            "timestamp": np.datetime64(timestamp, "s").astype(str) + "Z",
+            "receiver_account": self._account_values[int(columns["receiver"][row])],
+            "description": text("description"),
+            "is_realtime": bool(columns["is_realtime"][row])
+        }
+
+    def close(self):
+        """Schließt die Kontodatei."""
+        if self._accounts_file is not None:
+            self._accounts_file.close()
+            self._accounts_file = None
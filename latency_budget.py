@@ -0,0 +1,128 @@
+"""
+Latenzbudget und Fallback-Entscheidung für Echtzeit-Überweisungen.
+
+Instant Payments müssen innerhalb weniger hundert Millisekunden beantwortet
+werden. Ein LatencyBudget misst die verbleibende Zeit einer Transaktion; ist
+sie aufgebraucht oder läuft eine Stufe in ein Timeout, entscheidet die
+FallbackPolicy deterministisch anhand der bis dahin vorliegenden Bewertungen.
+"""
+import time
+from typing import Any, Dict, Optional, Sequence
+
+
+class LatencyBudget:
+    """Zeitbudget einer einzelnen Transaktion."""
+
+    def __init__(self, budget_ms: Optional[float] = None):
+        """
+        Args:
+            budget_ms: Verfügbare Zeit in Millisekunden ab Erstellung (None = unbegrenzt, nur Zeitmessung;
+                0 = sofort abgelaufen)
+        """
+        self.budget_ms = float(budget_ms) if budget_ms is not None else None
+        self._start = time.perf_counter()
+
+    def elapsed_ms(self) -> float:
+        """Bisher verbrauchte Zeit in Millisekunden."""
+        return (time.perf_counter() - self._start) * 1000.0
+
+    def remaining(self) -> Optional[float]:
+        """Verbleibende Zeit in Sekunden (nie negativ, None = unbegrenzt), passend für Timeout-Parameter."""
+        if self.budget_ms is None:
+            return None
+        return max(0.0, (self.budget_ms - self.elapsed_ms()) / 1000.0)
+
+    def expired(self) -> bool:
+        return self.budget_ms is not None and self.remaining() <= 0.0
+
+    def report(self, timed_out_stages: Sequence[str] = ()) -> Dict[str, Any]:
+        """Fasst den Budgetverbrauch für das Ergebnis einer Transaktion zusammen."""
+        elapsed = self.elapsed_ms()
+        return {
+            "elapsed_ms": round(elapsed, 2),
+            "budget_ms": self.budget_ms,
+            "budget_used": round(elapsed / self.budget_ms, 3) if self.budget_ms else None,
+            "timed_out_stages": list(timed_out_stages)
+        }
+
+
+class FallbackPolicy:
+    """Deterministische Entscheidung, wenn der decision_agent nicht rechtzeitig oder nicht gültig antwortet."""
+
+    def __init__(
+            self,
+            mode: str = "risk",
+            decline_probability: float = 0.7,
+            decline_rules: Sequence[str] = (
+                "large_amount", "suspicious_description", "burst_1m", "receiver_fanout_1h", "high_volume_24h"
+            ),
+            decline_without_assessment: bool = False
+    ):
+        """
+        Args:
+            mode: "approve" oder "decline" für eine feste Entscheidung, "risk" für eine risikobasierte
+            decline_probability: Ab dieser ML-Wahrscheinlichkeit wird im Modus "risk" abgelehnt
+            decline_rules: Regeln, deren Auslösung im Modus "risk" zur Ablehnung führt
+            decline_without_assessment: Entscheidung im Modus "risk", wenn keine Bewertung vorliegt
+        """
+        if mode not in ("approve", "decline", "risk"):
+            raise ValueError(f"Unbekannter Fallback-Modus: {mode}")
+        self.mode = mode
+        self.decline_probability = decline_probability
+        self.decline_rules = set(decline_rules)
+        self.decline_without_assessment = decline_without_assessment
+
+    def decide(
+            self,
+            ml_assessment: Optional[Dict[str, Any]],
+            rule_assessment: Optional[Dict[str, Any]],
+            reason: str = "Latenzbudget erschöpft"
+    ) -> Dict[str, Any]:
+        """
+        Trifft die Fallback-Entscheidung.
+
+        Args:
+            ml_assessment: Die ML-Bewertung (leer oder None, falls nicht verfügbar)
+            rule_assessment: Die Regelbewertung (leer oder None, falls nicht verfügbar)
+            reason: Anlass der Fallback-Entscheidung, wird der Begründung vorangestellt
+
+        Returns:
+            Ein Dictionary im Format des decision_agent (decision, confidence, reasoning)
+        """
+        if self.mode != "risk":
+            decision = "approved" if self.mode == "approve" else "declined"
+            return {
+                "decision": decision,
+                "confidence": 0.5,
+                "reasoning": f"{reason}, feste Fallback-Entscheidung: {decision}"
+            }
+
+        ml_assessment = ml_assessment or {}
+        rule_assessment = rule_assessment or {}
+        if not ml_assessment and not rule_assessment:
+            decision = "declined" if self.decline_without_assessment else "approved"
+            return {
+                "decision": decision,
+                "confidence": 0.3,
+                "reasoning": f"{reason}, keine Bewertung verfügbar"
+            }
+
+        probability = ml_assessment.get("probability")
+        decline_rules = sorted(self.decline_rules.intersection(rule_assessment.get("rules_triggered") or []))
+        reasons = []
+        if probability is not None and probability >= self.decline_probability:
+            reasons.append(f"ML-Wahrscheinlichkeit {probability:.2f} >= {self.decline_probability:.2f}")
+        if decline_rules:
+            reasons.append(f"Regeln ausgelöst: {', '.join(decline_rules)}")
+
+        if reasons:
+            return {
+                "decision": "declined",
+                "confidence": max(float(probability or 0.0), 0.6),
+                "reasoning": f"{reason}, Fallback-Ablehnung: " + "; ".join(reasons)
+            }
+        return {
+            "decision": "approved",
+            "confidence": 1.0 - float(probability or 0.0),
+            "reasoning": f"{reason}, Fallback-Freigabe: keine harten Risikoindikatoren"
+        }
@@ -1,8 +1,37 @@
 from crewai import Agent, Task, Crew, Process
 from crewai.tools import tool
-from typing import Dict, List, Any, Optional, TypedDict
+from typing import Dict, List, Iterable, Optional, TypedDict
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+from itertools import islice
+import argparse
+import asyncio
+import contextvars
 import json
-import datetime
+import functools
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from assessment_cache import AssessmentCache, assessment_digest, canonical_key
+from audit_log import AuditLog
+from case_index import CaseIndex, case_features_from_result, encode_case, parse_case_features
+from history_store import TransactionHistoryStore
+from latency_budget import FallbackPolicy, LatencyBudget
+import metrics
+from micro_batcher import MicroBatcher
+from ml_model import FraudScoringModel
+from pipeline import run_pipeline
+from prompts import QUERY_TEMPLATE, build_batch_prompt, build_prompt, build_retry_prompt, compact_json, render_inputs
+from profile_store import ProfileStore
+from rule_engine import ROUTING_IGNORED_RULES, RuleEngine
+from shard_pool import ShardedWorkerPool
+from structured_output import StructuredOutputError, parse_batch, parse_structured
+from tool_session import ToolSession
+from triage import TIER_APPROVE, TIER_ESCALATE, TriageCascade
+from velocity import VelocityEngine
 
 
 # Typdefinitionen
@@ -16,40 +45,89 @@ class Transaction(TypedDict):
     is_realtime: bool
 
 
-@tool
-def get_user_transaction_history(account_id):
-    """Ruft die letzten Transaktionen eines Nutzers aus der Datenbank ab."""
-    # Simulierte Daten
-    transactions = [
-        {
-            "transaction_id": "t123456",
-            "amount": 1250.00,
-            "timestamp": "2023-12-01T15:30:00Z",
-            "receiver_account": "DE89370400440532013000",
-            "description": "Monatsmiete Dezember"
-        },
-        {
-            "transaction_id": "t123457",
-            "amount": 89.99,
-            "timestamp": "2023-12-03T10:15:00Z",
-            "receiver_account": "DE12500105170648489890",
-            "description": "Online-Einkauf Elektronik"
-        },
-        {
-            "transaction_id": "t123458",
-            "amount": 50.00,
-            "timestamp": "2023-12-05T09:20:00Z",
-            "receiver_account": "DE13600501017832594242",
-            "description": "Überweisung an Freund"
-        }
-    ]
-    return json.dumps(transactions)
+# Spaltenspeicher der Transaktionshistorie (kann durch einen persistenten TransactionHistoryStore(path=...) ersetzt werden)
+history_store = TransactionHistoryStore()
+# Simulierte Daten
+history_store.append_many([
+    {
+        "sender_account": "DE55500105173984217489",
+        "transaction_id": "t123456",
+        "amount": 1250.00,
+        "timestamp": "2023-12-01T15:30:00Z",
+        "receiver_account": "DE89370400440532013000",
+        "description": "Monatsmiete Dezember"
+    },
+    {
+        "sender_account": "DE55500105173984217489",
+        "transaction_id": "t123457",
+        "amount": 89.99,
+        "timestamp": "2023-12-03T10:15:00Z",
+        "receiver_account": "DE12500105170648489890",
+        "description": "Online-Einkauf Elektronik"
+    },
+    {
+        "sender_account": "DE55500105173984217489",
+        "transaction_id": "t123458",
+        "amount": 50.00,
+        "timestamp": "2023-12-05T09:20:00Z",
+        "receiver_account": "DE13600501017832594242",
+        "description": "Überweisung an Freund"
+    }
+])
+
+
+# Tool-Cache der laufenden interaktiven Sitzung (None = Tools greifen direkt auf die Datenbank zu). Eine
+# ContextVar, damit nur die Sitzung selbst (und die Stufen, die sie startet) den Cache sieht, nicht nebenläufige
+# Batch- oder Pipeline-Aufrufe in anderen Threads
+_tool_session: "contextvars.ContextVar[Optional[ToolSession]]" = contextvars.ContextVar("tool_session", default=None)
+
+
+# Gesetzt, solange mehrere Transaktionen gleichzeitig laufen und ihre LLM-Bewertungen bündeln können. Ein
+# Einzelaufruf (process_transaction oder max_concurrency=1) umgeht die Micro-Batcher, weil jede Stufe sonst
+# max_wait_ms auf Partner warten würde, die nie kommen
+_micro_batching: "contextvars.ContextVar[bool]" = contextvars.ContextVar("micro_batching", default=False)
+
+
+def _session_call(key, compute):
+    """Beantwortet einen Tool-Aufruf aus dem Sitzungs-Cache, sofern eine Sitzung aktiv ist."""
+    session = _tool_session.get()
+    if session is None:
+        return compute()
+    return session.get_or_call(key, compute)
+
+
+def _history_key(account_id, start=None, end=None, limit=20, cursor=None):
+    return "history", account_id, start, end, int(limit), None if cursor is None else int(cursor)
 
 
 @tool
-def get_user_profile(account_id):
-    """Ruft das Profil eines Nutzers aus der Datenbank ab."""
-    # Simulierte Daten
+@metrics.instrument_tool
+def get_user_transaction_history(account_id, start=None, end=None, limit=20, cursor=None):
+    """
+    Ruft die letzten Transaktionen eines Nutzers aus der Datenbank ab (neueste zuerst, seitenweise).
+    Optional: start/end als ISO-Zeitstempel, limit als Seitengröße und cursor aus "next_cursor" für die nächste Seite.
+    """
+    return _session_call(
+        _history_key(account_id, start, end, limit, cursor),
+        lambda: _fetch_history(account_id, start, end, limit, cursor)
+    )
+
+
+def _fetch_history(account_id, start=None, end=None, limit=20, cursor=None):
+    return json.dumps(history_store.query(account_id, start=start, end=end, limit=int(limit), cursor=cursor))
+
+
+# Inkrementell gepflegte Profilaggregate aller Konten (kann per ProfileStore.restore() ersetzt werden)
+profile_store = ProfileStore()
+
+
+# Zeitfenster-Zähler je Absenderkonto für die Erkennung von Transaktionsserien
+velocity_engine = VelocityEngine()
+
+
+def _load_user_profile(account_id):
+    """Lädt das Profil eines Nutzers aus der Datenbank."""
+    # Simulierte Stammdaten
     user_profile = {
         "account_id": account_id,
         "account_age_days": 730,
@@ -61,40 +139,222 @@ def get_user_profile(account_id):
         "typical_countries": ["DE", "FR", "ES"],
         "typical_receivers": ["DE89370400440532013000", "DE12500105170648489890"]
     }
-    return json.dumps(user_profile)
+
+    # Aggregate aus dem Profilspeicher haben Vorrang, sobald Transaktionen des Kontos verarbeitet wurden
+    aggregates = profile_store.get_profile(account_id)
+    if aggregates is not None:
+        user_profile.update(aggregates)
+    return user_profile
 
 
 @tool
+@metrics.instrument_tool
+def get_user_profile(account_id):
+    """Ruft das Profil eines Nutzers aus der Datenbank ab."""
+    return _session_call(("profile", account_id), lambda: _fetch_profile(account_id))
+
+
+def _fetch_profile(account_id):
+    return json.dumps(_load_user_profile(account_id))
+
+
+# Index historischer Betrugs- und Fehlalarmfälle (kann durch einen persistenten CaseIndex(path=...) ersetzt werden)
+case_index = CaseIndex()
+# Simulierte Daten
+case_index.add_many([
+    {
+        "case_id": "f987654",
+        "features": {
+            "amount_unusually_high": True,
+            "new_receiver": True,
+            "unusual_time": True
+        },
+        "outcome": "confirmed_fraud"
+    },
+    {
+        "case_id": "f987655",
+        "features": {
+            "amount_unusually_high": True,
+            "new_receiver": False,
+            "unusual_time": True
+        },
+        "outcome": "false_positive"
+    }
+])
+
+
+@tool
+@metrics.instrument_tool
 def get_similar_fraud_cases(case_features):
     """Findet ähnliche Betrugsfälle basierend auf den gegebenen Merkmalen."""
-    # Simulierte Daten
-    similar_cases = [
-        {
-            "case_id": "f987654",
-            "similarity_score": 0.85,
-            "features": {
-                "amount_unusually_high": True,
-                "new_receiver": True,
-                "unusual_time": True
-            },
-            "outcome": "confirmed_fraud"
-        },
-        {
-            "case_id": "f987655",
-            "similarity_score": 0.78,
-            "features": {
-                "amount_unusually_high": True,
-                "new_receiver": False,
-                "unusual_time": True
-            },
-            "outcome": "false_positive"
-        }
-    ]
-    return json.dumps(similar_cases)
+    features = parse_case_features(case_features)
+    return _session_call(_similar_cases_key(features), lambda: _fetch_similar_cases(features))
+
+
+def _similar_cases_key(features):
+    # Gleiche Merkmalsvektoren liefern dieselben Fälle, unabhängig von der Schreibweise der Merkmale
+    return ("similar_cases",) + tuple(encode_case(features).tolist())
+
+
+def _fetch_similar_cases(features):
+    return json.dumps(case_index.search(features, k=5))
+
+
+def _chunked(iterable, size):
+    """Zerlegt ein Iterable in Listen mit höchstens size Elementen."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+async def _achunked(iterable, size):
+    """Wie _chunked, akzeptiert aber zusätzlich Async-Iterables."""
+    if not hasattr(iterable, "__aiter__"):
+        for chunk in _chunked(iterable, size):
+            yield chunk
+        return
+
+    chunk = []
+    async for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _AccountScheduler:
+    """
+    Reihenfolge der Verarbeitung im Batch-Pfad.
+
+    Eine Transaktion wird erst bewertet, wenn die vorherige Transaktion desselben Absenderkontos
+    abgeschlossen ist und Historie, Profil und Zeitfenster fortgeschrieben hat. Jede Transaktion sieht
+    so denselben Kontozustand wie bei process_transaction() in Eingabereihenfolge; verschiedene Konten
+    laufen weiterhin parallel. Alle gerade freien Transaktionen werden gemeinsam vektorisiert bewertet.
+    """
+
+    def __init__(self, assess_batch, batch_size):
+        """
+        Args:
+            assess_batch: Bewertet einen Stapel; liefert Listen (ML-Bewertungen, Regelbewertungen, Fensterwerte)
+            batch_size: Maximale Anzahl zurückgehaltener Transaktionen, bevor keine weitere Eingabe gelesen wird
+        """
+        self.assess_batch = assess_batch
+        self.batch_size = batch_size
+        # Konten mit einer Transaktion in Arbeit -> ihre zurückgehaltenen Nachfolger
+        self._waiting: Dict[str, deque] = {}
+        self._held = 0
+        self._ready: List[tuple] = []  # freie Paare (Markierung, Transaktion)
+        self._scored: deque = deque()
+
+    def wants_input(self, max_concurrency) -> bool:
+        """True, wenn weitere Eingabe gelesen werden soll (wenige freie, nicht zu viele zurückgehaltene Transaktionen)."""
+        return len(self._scored) + len(self._ready) < max_concurrency and self._held < self.batch_size
+
+    def add(self, items: Iterable[tuple]):
+        """Übernimmt Paare (Markierung, Transaktion); die Markierung wird unverändert durchgereicht."""
+        for item in items:
+            followers = self._waiting.get(item[1]["sender_account"])
+            if followers is None:
+                self._waiting[item[1]["sender_account"]] = deque()
+                self._ready.append(item)
+            else:
+                followers.append(item)
+                self._held += 1
+
+    def next_ready(self):
+        """Liefert ((Markierung, Transaktion), (ML-Bewertung, Regelbewertung, Fensterwerte)) oder None."""
+        if not self._scored and self._ready:
+            ready, self._ready = self._ready, []
+            self._scored.extend(zip(ready, zip(*self.assess_batch([transaction for _, transaction in ready]))))
+        return self._scored.popleft() if self._scored else None
+
+    def done(self, item: tuple):
+        """Gibt den nächsten zurückgehaltenen Nachfolger des Kontos frei."""
+        followers = self._waiting[item[1]["sender_account"]]
+        if followers:
+            self._ready.append(followers.popleft())
+            self._held -= 1
+        else:
+            del self._waiting[item[1]["sender_account"]]
+
+
+# Platzhalter für eine Stufe, die ihr Latenzbudget überschritten hat
+STAGE_TIMED_OUT = object()
+# Platzhalter für eine Stufe, die auch nach allen Wiederholungen keine gültige Antwort geliefert hat
+STAGE_FAILED = object()
 
 
 class FraudDetectionSystem:
-    def __init__(self):
+    def __init__(
+            self,
+            rule_backend="native",
+            ml_backend="native",
+            ml_model_path=None,
+            max_llm_calls=4,
+            routing="deterministic",
+            cache=None,
+            verbose=False,
+            realtime_budget_ms=None,
+            fallback_policy=None,
+            task_runner=None,
+            max_retries=1,
+            triage=None,
+            micro_batch_size=0,
+            micro_batch_wait_ms=20.0,
+            audit_log=None,
+            velocity=None
+    ):
+        """
+        Args:
+            rule_backend: "native" für die lokale Regel-Engine, "llm" für den rule_assessment_agent
+            ml_backend: "native" für das lokale Scoring-Modell, "llm" für den ml_assessment_agent
+            ml_model_path: Optionaler Pfad zu einer .npz-Datei mit trainierten Modellgewichten
+            max_llm_calls: Maximale Anzahl gleichzeitig laufender LLM-Aufrufe
+            routing: "deterministic" berechnet den nächsten Schritt direkt, "llm" fragt den coordinator_agent
+            cache: AssessmentCache für ML-, Regel- und Erklärungsstufe (Standard: im Speicher)
+            verbose: Ausführliche Ausgaben der Agenten und Crews (nur zur Fehlersuche, kostet Latenz)
+            realtime_budget_ms: Latenzbudget je Echtzeit-Überweisung in Millisekunden (None = ohne Deadline)
+            fallback_policy: FallbackPolicy für Echtzeit-Überweisungen bei erschöpftem Budget
+            task_runner: Optionaler Ersatz für die Crew-Ausführung, aufgerufen als task_runner(agent, task) -> str
+                (z.B. ein Stub-LLM für Benchmarks)
+            max_retries: Wiederholungen einer ML-, Regel- oder Entscheidungs-Task bei ungültiger Antwort
+            triage: TriageCascade für die Vorprüfung, True für eine mit Standard-Schwellwerten
+                (Standard: ohne Vorprüfung, damit sich Entscheidungen nur auf ausdrücklichen Wunsch ändern)
+            micro_batch_size: Maximale Anzahl Transaktionen je gebündeltem ML-/Regel-Prompt (0 oder 1 = kein Bündeln);
+                Stapel füllen sich nur bis zur Anzahl gleichzeitig verarbeiteter Transaktionen; Einzelaufrufe und
+                max_concurrency=1 umgehen die Batcher
+            micro_batch_wait_ms: Maximale Wartezeit auf weitere Transaktionen für einen Stapel
+            audit_log: Optionales AuditLog für alle Ergebnisse und Entscheidungen des Fraud-Managers
+            velocity: VelocityEngine für die Zeitfenster-Signale (Standard: velocity_engine, False = abgeschaltet)
+        """
+        self.audit_log = audit_log
+        self.velocity = velocity_engine if velocity is None else velocity or None
+        if triage is True:
+            triage = TriageCascade(profile_loader=_load_user_profile)
+        self.triage = triage or None
+        self.max_retries = max_retries
+        self.task_runner = task_runner
+        self.realtime_budget_ms = realtime_budget_ms
+        self.fallback_policy = fallback_policy or FallbackPolicy()
+        self.verbose = verbose
+        self.cache = cache if cache is not None else AssessmentCache()
+        self.routing = routing
+        self._llm_slots = threading.BoundedSemaphore(max_llm_calls)
+        self._stage_pool = ThreadPoolExecutor(max_workers=max_llm_calls, thread_name_prefix="fraud-stage")
+        self.rule_backend = rule_backend
+        self.ml_backend = ml_backend
+        if ml_model_path:
+            self.ml_model = FraudScoringModel.load(ml_model_path, profile_loader=_load_user_profile)
+        else:
+            self.ml_model = FraudScoringModel(profile_loader=_load_user_profile)
+        self.rule_engine = RuleEngine(
+            known_receivers=lambda account_id: _load_user_profile(account_id)["typical_receivers"]
+        )
 
         # Agenten erstellen
         self.ml_assessment_agent = self._create_ml_assessment_agent()
@@ -104,6 +364,32 @@ class FraudDetectionSystem:
         self.coordinator_agent = self._create_coordinator_agent()
         self.react_agent = self._create_react_agent()
 
+        # Stufenname je Agent (Schlüssel: id des Agenten) für Metriken und Benchmarks
+        self.agent_stages = {
+            id(self.ml_assessment_agent): "ml",
+            id(self.rule_assessment_agent): "rule",
+            id(self.coordinator_agent): "coordinator",
+            id(self.explanation_agent): "explanation",
+            id(self.decision_agent): "decision",
+            id(self.react_agent): "query"
+        }
+
+        # Micro-Batcher je LLM-Bewertungsstufe
+        self._batchers = {}
+        if micro_batch_size > 1:
+            for stage, backend, agent in (
+                    ("ml", ml_backend, self.ml_assessment_agent),
+                    ("rule", rule_backend, self.rule_assessment_agent)
+            ):
+                if backend == "llm":
+                    self._batchers[stage] = MicroBatcher(
+                        lambda items, stage=stage, agent=agent: self._run_batch(stage, agent, items),
+                        max_items=micro_batch_size,
+                        max_wait_ms=micro_batch_wait_ms,
+                        max_inflight=max_llm_calls,
+                        name=stage
+                    )
+
     def _create_ml_assessment_agent(self):
         """ML-Bewertungsagent erstellen."""
         return Agent(
@@ -112,7 +398,7 @@ class FraudDetectionSystem:
             backstory="""Du bist ein fortschrittliches ML-Modell zur Betrugserkennung in Banktransaktionen.
             Du analysierst Transaktionen und bewertest ihre Betrugswahrscheinlichkeit.
             Deine Analyse basiert auf Transaktionsbetrag, Empfänger, Echtzeit-Status und Zeitpunkt.""",
-            verbose=True,
+            verbose=self.verbose,
             tools=[],
             allow_delegation=False
         )
@@ -125,7 +411,7 @@ class FraudDetectionSystem:
             backstory="""Du bist ein regelbasiertes System zur Betrugserkennung in Banktransaktionen.
             Du wendest feste Regeln an, um potenzielle Betrugsfälle zu identifizieren.
             Deine Regeln umfassen Betragsgrößen, Echtzeit-Status, ungewöhnliche Zeiten und neue Empfänger.""",
-            verbose=True,
+            verbose=self.verbose,
             tools=[],
             allow_delegation=False
         )
@@ -138,7 +424,7 @@ class FraudDetectionSystem:
             backstory="""Du bist ein erklärender Agent für ein Betrugsbewertungssystem in einer Bank.
             Deine Aufgabe ist es, die Entscheidungen des Systems in natürlicher Sprache zu erklären.
             Du formulierst klare und präzise Erklärungen, warum eine Transaktion verdächtig erscheint.""",
-            verbose=True,
+            verbose=self.verbose,
             tools=[],
             allow_delegation=False
         )
@@ -151,7 +437,7 @@ class FraudDetectionSystem:
             backstory="""Du bist ein Entscheidungs-Agent für Echtzeitüberweisungen in einem Bankensystem.
             Du musst autonome Entscheidungen treffen, ob eine Transaktion genehmigt oder abgelehnt werden soll.
             Du wägst das Betrugsrisiko gegen die Kundenfreundlichkeit ab.""",
-            verbose=True,
+            verbose=self.verbose,
             tools=[],
             allow_delegation=False
         )
@@ -164,7 +450,7 @@ class FraudDetectionSystem:
             backstory="""Du bist ein Koordinator für das Betrugsbewertungssystem einer Bank.
             Du orchestrierst den Workflow zur Betrugserkennung und steuerst den Prozess zwischen verschiedenen Agenten.
             Du entscheidest, wie mit potenziellen Betrugsfällen weiter verfahren wird.""",
-            verbose=True,
+            verbose=self.verbose,
             tools=[],
             allow_delegation=True
         )
@@ -177,7 +463,7 @@ class FraudDetectionSystem:
             backstory="""Du bist ein spezialisierter Agent für Datenbankabfragen in einem Betrugsbewertungssystem.
             Du hilfst dem Fraud-Manager, indem du relevante Informationen aus der Datenbank abrufst.
             Du kannst Transaktionshistorie, Nutzerprofile und ähnliche Betrugsfälle finden.""",
-            verbose=True,
+            verbose=self.verbose,
 
             tools=[
                 get_user_transaction_history,
@@ -187,6 +473,299 @@ class FraudDetectionSystem:
             allow_delegation=False
         )
 
+    def _build_ml_assessment_task(self, transaction_data: Transaction, transaction_json=None):
+        """Task für die ML-Bewertung durch den ml_assessment_agent erstellen."""
+        return Task(
+            description=build_prompt("ml", transaction_json or compact_json(transaction_data)),
+            agent=self.ml_assessment_agent,
+            expected_output="Eine JSON-Struktur mit der ML-Bewertung der Transaktion."
+        )
+
+    def _build_rule_assessment_task(self, transaction_data: Transaction, transaction_json=None):
+        """Task für die regelbasierte Bewertung durch den rule_assessment_agent erstellen."""
+        return Task(
+            description=build_prompt("rule", transaction_json or compact_json(transaction_data)),
+            agent=self.rule_assessment_agent,
+            expected_output="Eine JSON-Struktur mit den ausgelösten Regeln."
+        )
+
+    def _build_coordination_task(self, ml_assessment_result, rule_assessment_result):
+        """Task für den Koordinator erstellen."""
+        return Task(
+            description=build_prompt(
+                "coordinator", ml_assessment_result=ml_assessment_result, rule_assessment_result=rule_assessment_result
+            ),
+            agent=self.coordinator_agent,
+            expected_output="Ein Befehl zur Weiterverarbeitung: 'generate_explanation', 'decision_agent' oder 'approve_transaction'."
+        )
+
+    def _build_explanation_task(
+            self, transaction_data: Transaction, ml_assessment_result, rule_assessment_result, transaction_json=None
+    ):
+        """Task für die Erklärung erstellen."""
+        return Task(
+            description=build_prompt(
+                "explanation", transaction_json or compact_json(transaction_data),
+                ml_assessment_result, rule_assessment_result
+            ),
+            agent=self.explanation_agent,
+            expected_output="Eine Erklärung, warum die Transaktion verdächtig erscheint."
+        )
+
+    def _build_decision_task(
+            self, transaction_data: Transaction, ml_assessment_result, rule_assessment_result, transaction_json=None
+    ):
+        """Task für die automatische Entscheidung erstellen."""
+        return Task(
+            description=build_prompt(
+                "decision", transaction_json or compact_json(transaction_data),
+                ml_assessment_result, rule_assessment_result
+            ),
+            agent=self.decision_agent,
+            expected_output="Eine Entscheidung mit Begründung im JSON-Format."
+        )
+
+    def _route(self, transaction_data: Transaction, ml_assessment, rule_assessment):
+        """
+        Bestimmt den nächsten Schritt deterministisch aus ML- und Regelbewertung.
+
+        Returns:
+            'generate_explanation', 'decision_agent' oder 'approve_transaction'
+        """
+        # Die Echtzeit-Regel allein begründet keinen Verdacht, sie bestimmt nur den Zweig
+        triggered = [
+            rule for rule in rule_assessment.get("rules_triggered", [])
+            if rule not in ROUTING_IGNORED_RULES
+        ]
+        # Eine fehlende Bewertung (Zeitüberschreitung, ungültige Antwort) wird nicht als unverdächtig gewertet
+        missing = not ml_assessment or not rule_assessment
+        suspicious = missing or bool(ml_assessment.get("is_fraud")) or bool(triggered)
+        if not suspicious:
+            return "approve_transaction"
+        return "decision_agent" if transaction_data["is_realtime"] else "generate_explanation"
+
+    def _run_task(self, agent, task, inputs=None, crew=None):
+        """
+        Führt eine einzelne Task in einer eigenen oder der übergebenen Crew aus.
+
+        Die Anzahl gleichzeitig laufender LLM-Aufrufe wird über self._llm_slots begrenzt.
+        Bei aktivierter Metrik-Registry werden Laufzeit, Prompt- und Antwortgröße je Stufe erfasst.
+
+        Args:
+            agent: Der ausführende Agent
+            task: Die Task (mit inputs als Template mit Platzhaltern)
+            inputs: Optionale Werte für die Platzhalter der Task
+            crew: Optionale wiederverwendbare Crew, die task enthält
+
+        Returns:
+            Die Rohausgabe der Task
+        """
+        if not metrics.registry.enabled:
+            return self._execute_task(agent, task, inputs, crew)
+
+        stage = self.agent_stages.get(id(agent), "query")
+        prompt = render_inputs(task.description, inputs) if inputs else task.description
+        metrics.TASK_CALLS.inc(stage=stage)
+        metrics.PROMPT_CHARS.inc(len(prompt), stage=stage)
+        metrics.PROMPT_TOKENS.inc(metrics.count_tokens(prompt), stage=stage)
+        start = time.perf_counter()
+        try:
+            output = self._execute_task(agent, task, inputs, crew)
+        except Exception:
+            metrics.TASK_ERRORS.inc(stage=stage)
+            raise
+        finally:
+            metrics.TASK_DURATION.observe(time.perf_counter() - start, stage=stage)
+        response = str(output)
+        metrics.RESPONSE_CHARS.inc(len(response), stage=stage)
+        metrics.RESPONSE_TOKENS.inc(metrics.count_tokens(response), stage=stage)
+        return output
+
+    def _execute_task(self, agent, task, inputs=None, crew=None):
+        """Führt die Task über task_runner oder eine Crew aus (inklusive Wartezeit auf einen LLM-Slot)."""
+        with self._llm_slots:
+            if self.task_runner is not None:
+                if inputs:
+                    task = Task(
+                        description=render_inputs(task.description, inputs),
+                        agent=agent,
+                        expected_output=task.expected_output
+                    )
+                return self.task_runner(agent, task)
+
+            if crew is None:
+                crew = Crew(
+                    agents=[agent],
+                    tasks=[task],
+                    verbose=self.verbose,
+                    process=Process.sequential
+                )
+            result = crew.kickoff(inputs=inputs) if inputs else crew.kickoff()
+        return result[task.id]
+
+    def _run_structured(self, stage, agent, task):
+        """
+        Führt eine Task mit strukturierter Antwort aus und wiederholt nur diese Task, falls die Antwort ungültig ist.
+
+        Args:
+            stage: Schema der Antwort ("ml", "rule" oder "decision")
+            agent: Der ausführende Agent
+            task: Die Task
+
+        Returns:
+            Die geprüfte und normalisierte Antwort
+
+        Raises:
+            StructuredOutputError: Wenn auch nach max_retries Wiederholungen keine gültige Antwort vorliegt
+        """
+        attempt_task = task
+        for attempt in range(self.max_retries + 1):
+            output = self._run_task(agent, attempt_task)
+            try:
+                return parse_structured(output, stage)
+            except StructuredOutputError as exc:
+                metrics.PARSE_FAILURES.inc(stage=stage)
+                if attempt == self.max_retries:
+                    raise
+                metrics.TASK_RETRIES.inc(stage=stage)
+                attempt_task = Task(
+                    description=build_retry_prompt(task.description, str(exc)),
+                    agent=agent,
+                    expected_output=task.expected_output
+                )
+
+    def _run_branch(self, transaction_data: Transaction, step, build_task, assessments=()):
+        """
+        Führt einen Folgeschritt aus; Erklärungen werden über den Cache wiederverwendet.
+
+        Args:
+            transaction_data: Die Transaktion
+            step: Der Folgeschritt
+            build_task: Liefert (Agent, Task) des Folgeschritts
+            assessments: Die serialisierten ML- und Regelbewertungen, auf denen der Prompt beruht
+
+        Returns:
+            Die Erklärung als Text, die geprüfte Entscheidung als Dictionary oder STAGE_FAILED
+        """
+        if step == "generate_explanation":
+            # Die Bewertungen hängen von Profil und Zeitfenstern ab; eine Erklärung gilt nur für dieselben
+            key = canonical_key(transaction_data) + (assessment_digest(*assessments),)
+            return self.cache.get_or_compute("explanation", key, lambda: self._run_task(*build_task()))
+        if step == "decision_agent":
+            try:
+                return self._run_structured("decision", *build_task())
+            except StructuredOutputError:
+                return STAGE_FAILED
+        return self._run_task(*build_task())
+
+    def _submit_stage(self, stage):
+        """Startet eine Stufe im Stufen-Pool, im Kontext des Aufrufers (z.B. mit dessen Tool-Sitzung)."""
+        return self._stage_pool.submit(contextvars.copy_context().run, stage)
+
+    def _run_parallel(self, *stages, budget=None):
+        """
+        Führt voneinander unabhängige Stufen parallel aus und liefert ihre Ergebnisse in Aufrufreihenfolge.
+
+        Mit einem LatencyBudget liefert jede Stufe, die bis zu dessen Ablauf nicht fertig ist, STAGE_TIMED_OUT.
+        """
+        if budget is None or budget.budget_ms is None:
+            futures = [self._submit_stage(stage) for stage in stages[1:]]
+            first = stages[0]()
+            return [first] + [future.result() for future in futures]
+
+        futures = [self._submit_stage(stage) for stage in stages]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout=budget.remaining()))
+            except FutureTimeoutError:
+                # Laufende LLM-Aufrufe lassen sich nicht abbrechen; ihr Ergebnis wird verworfen
+                future.cancel()
+                results.append(STAGE_TIMED_OUT)
+        return results
+
+    def _assess_ml(self, transaction_data: Transaction, transaction_json=None, velocity=None):
+        """ML-Bewertung: lokal über das Scoring-Modell oder per LLM-Agent."""
+        with metrics.STAGE_DURATION.time(stage="ml", backend=self.ml_backend):
+            if self.ml_backend == "llm":
+                # Nur die LLM-Stufe wird gecacht; das lokale Modell ist schneller als ein Lookup
+                return self.cache.get_or_compute(
+                    "ml", canonical_key(transaction_data),
+                    lambda: self._assess_llm(
+                        "ml", self.ml_assessment_agent, self._build_ml_assessment_task, transaction_data, transaction_json
+                    )
+                )
+            return self.ml_model.score(transaction_data, velocity=velocity)
+
+    def _assess_rules(self, transaction_data: Transaction, transaction_json=None, velocity=None):
+        """Regelbasierte Bewertung: lokal über die Regel-Engine oder per LLM-Agent."""
+        with metrics.STAGE_DURATION.time(stage="rule", backend=self.rule_backend):
+            if self.rule_backend == "llm":
+                return self.cache.get_or_compute(
+                    "rule", canonical_key(transaction_data),
+                    lambda: self._assess_llm(
+                        "rule", self.rule_assessment_agent, self._build_rule_assessment_task,
+                        transaction_data, transaction_json
+                    )
+                )
+            return self.rule_engine.evaluate(transaction_data, velocity=velocity)
+
+    def _assess_llm(self, stage, agent, build_task, transaction_data: Transaction, transaction_json=None):
+        """
+        LLM-Bewertung einer Stufe; mit Micro-Batching zuerst im Stapel, bei fehlendem Ergebnis einzeln.
+
+        Raises:
+            StructuredOutputError: Wenn auch der Einzelaufruf keine gültige Antwort liefert
+        """
+        transaction_json = transaction_json or compact_json(transaction_data)
+        batcher = self._batchers.get(stage) if _micro_batching.get() else None
+        if batcher is not None:
+            try:
+                assessment = batcher.submit(transaction_data["transaction_id"], transaction_json).result()
+            except Exception:
+                # Der ganze Stapel ist gescheitert (im Batcher gezählt); diese Transaktion einzeln bewerten
+                metrics.BATCH_ITEMS.inc(stage=stage, outcome="error")
+            else:
+                metrics.BATCH_ITEMS.inc(stage=stage, outcome="fallback" if assessment is None else "batched")
+                if assessment is not None:
+                    return assessment
+        return self._run_structured(stage, agent, build_task(transaction_data, transaction_json))
+
+    def _run_batch(self, stage, agent, transaction_jsons):
+        """Bewertet mehrere Transaktionen mit einem Prompt; liefert transaction_id -> Bewertung."""
+        task = Task(
+            description=build_batch_prompt(stage, transaction_jsons),
+            agent=agent,
+            expected_output="Ein JSON-Array mit einer Bewertung je Transaktion."
+        )
+        return parse_batch(self._run_task(agent, task), stage)
+
+    def _assess_native_batch(self, transactions):
+        """
+        Bewertet einen Stapel vektorisiert mit den lokalen Backends.
+
+        Jede Transaktion wird dabei in Eingabereihenfolge in den Zeitfenstern gezählt. Alle Transaktionen
+        eines Stapels werden gegen den aktuellen Kontozustand bewertet; process_transactions() übergibt
+        daher je Absenderkonto höchstens eine Transaktion.
+
+        Returns:
+            Drei Listen (ML-Bewertungen, Regelbewertungen, Fensterwerte); None für Stufen, die per LLM
+            laufen, und für Fensterwerte ohne VelocityEngine
+        """
+        with metrics.STAGE_DURATION.time(stage="native_batch", backend="native"):
+            velocities = (
+                self.velocity.observe_batch(transactions) if self.velocity is not None else None
+            )
+            ml_assessments = (
+                self.ml_model.score_batch(transactions, velocities=velocities) if self.ml_backend != "llm"
+                else [None] * len(transactions)
+            )
+            rule_assessments = (
+                self.rule_engine.evaluate_batch(transactions, velocities=velocities) if self.rule_backend != "llm"
+                else [None] * len(transactions)
+            )
+        return ml_assessments, rule_assessments, velocities or [None] * len(transactions)
+
     def process_transaction(self, transaction_data: Transaction):
         """
         Verarbeitet eine Transaktion durch das Betrugserkennungssystem.
@@ -197,181 +776,135 @@ class FraudDetectionSystem:
         Returns:
             Ein Dictionary mit dem Ergebnis des Prozesses
         """
-        # Task für ML-Bewertung erstellen
-        ml_assessment_task = Task(
-            description=f"""
-            Bewerte die folgende Transaktion mit ML-Methoden:
-            {json.dumps(transaction_data, indent=2)}
-
-            Gib deine Antwort im folgenden Format zurück:
-            {{
-                "probability": 0.75,
-                "threshold": 0.5,
-                "is_fraud": true,
-                "features": {{
-                    "amount_unusually_high": true,
-                    "new_receiver": true,
-                    "is_realtime": true,
-                    "unusual_time": false
-                }},
-                "model_version": "fraud-detection-v3.2"
-            }}
-            """,
-            agent=self.ml_assessment_agent,
-            expected_output="Eine JSON-Struktur mit der ML-Bewertung der Transaktion."
-        )
+        return self._process(transaction_data)
 
-        # Task für regelbasierte Bewertung erstellen
-        rule_assessment_task = Task(
-            description=f"""
-            Prüfe die folgende Transaktion gegen das Regelwerk:
-            {json.dumps(transaction_data, indent=2)}
-
-            Prüfe folgende Regeln:
-            1. Betrag > 5000 EUR -> "large_amount"
-            2. Echtzeit-Überweisung -> "realtime_transfer"
-            3. Transaktion zwischen 23:00 und 6:00 Uhr -> "unusual_time"
-            4. Neue Empfänger-Kontonummer -> "new_receiver"
-            5. Ungewöhnliche Beschreibung -> "suspicious_description"
-
-            Gib deine Antwort im folgenden Format zurück:
-            {{
-                "is_flagged": true,
-                "rules_triggered": ["large_amount", "realtime_transfer"],
-                "version": "rule-engine-v2.1"
-            }}
-            """,
-            agent=self.rule_assessment_agent,
-            expected_output="Eine JSON-Struktur mit den ausgelösten Regeln."
-        )
+    def _process(self, transaction_data: Transaction, ml_assessment=None, rule_assessment=None, velocity=None):
+        """
+        Führt die Bewertungs- und Entscheidungsstufen für eine Transaktion aus.
 
-        # Task für Koordinator erstellen
-        coordination_task = Task(
-            description=f"""
-            Koordiniere den weiteren Prozessverlauf basierend auf den Bewertungen.
-            Verwende die Ergebnisse der ML-Bewertung und regelbasierten Bewertung, um zu entscheiden,
-            welcher der folgenden Schritte als nächstes durchgeführt werden soll:
+        Eindeutige Fälle entscheidet die Vorprüfung (sofern eingeschaltet) ohne weitere Stufen. Vorliegende
+        Bewertungen und Fensterwerte (z.B. aus einem vektorisierten Stapel) werden übernommen; sonst
+        wird die Transaktion hier in den Zeitfenstern gezählt.
+        Echtzeit-Überweisungen laufen unter dem Latenzbudget realtime_budget_ms.
+        """
+        budget = LatencyBudget(self.realtime_budget_ms if transaction_data["is_realtime"] else None)
+        timed_out_stages = []
+        failed_stages = []
+        if velocity is None and self.velocity is not None:
+            velocity = self.velocity.observe(transaction_data)
 
-            1. "generate_explanation" - Bei Verdacht, aber nicht bei Echtzeit-Überweisungen
-            2. "decision_agent" - Bei Echtzeit-Überweisungen und Verdacht
-            3. "approve_transaction" - Bei keinem Verdacht
+        screening = self.triage.screen(transaction_data, velocity) if self.triage is not None else None
+        if screening is not None:
+            metrics.TRIAGE_DECISIONS.inc(tier=screening["tier"])
+            if screening["tier"] != TIER_ESCALATE:
+                result = self._triage_result(transaction_data, screening)
+                result["velocity"] = velocity
+                return self._finish(transaction_data, result, "triage", budget, timed_out_stages, failed_stages)
 
-            Antworte nur mit einem der drei Befehle ohne weitere Erklärung.
+        # Einmal kompakt serialisiert und von allen Prompts dieser Transaktion verwendet
+        transaction_json = compact_json(transaction_data)
 
-            Dazu solltest du auf die Ergebnisse der vorherigen Bewertungen zugreifen:
-            - ml_assessment_result: Das Ergebnis der ML-Bewertung
-            - rule_assessment_result: Das Ergebnis der regelbasierten Bewertung
-            """,
-            agent=self.coordinator_agent,
-            expected_output="Ein Befehl zur Weiterverarbeitung: 'generate_explanation', 'decision_agent' oder 'approve_transaction'.",
-            context=[
-                {
-                    "ml_assessment_result": "{ml_assessment_task.output}",
-                    "rule_assessment_result": "{rule_assessment_task.output}"
-                }
-            ]
-        )
+        def guarded(assess):
+            """Liefert STAGE_FAILED statt einer Exception, wenn eine LLM-Bewertung ungültig bleibt."""
+            def run():
+                try:
+                    return assess(transaction_data, transaction_json, velocity)
+                except StructuredOutputError:
+                    return STAGE_FAILED
+            return run
 
-        # Task für Erklärung erstellen
-        explanation_task = Task(
-            description=f"""
-            Erkläre, warum die folgende Transaktion verdächtig erscheint:
-            {json.dumps(transaction_data, indent=2)}
+        # ML- und Regelbewertung sind unabhängig voneinander und laufen parallel
+        stages = []
+        if ml_assessment is None:
+            stages.append(("ml_assessment", guarded(self._assess_ml)))
+        if rule_assessment is None:
+            stages.append(("rule_assessment", guarded(self._assess_rules)))
+        if stages:
+            if self.ml_backend == "llm" or self.rule_backend == "llm":
+                results = self._run_parallel(*[stage for _, stage in stages], budget=budget)
+            else:
+                results = [stage() for _, stage in stages]
+            for (name, _), value in zip(stages, results):
+                if value is STAGE_TIMED_OUT:
+                    # Mit Teilergebnissen weiterarbeiten
+                    timed_out_stages.append(name)
+                    value = {}
+                elif value is STAGE_FAILED:
+                    failed_stages.append(name)
+                    value = {}
+                if name == "ml_assessment":
+                    ml_assessment = value
+                else:
+                    rule_assessment = value
 
-            Nutze dazu die Ergebnisse der ML-Bewertung und regelbasierten Bewertung:
-            - ml_assessment_result: Das Ergebnis der ML-Bewertung
-            - rule_assessment_result: Das Ergebnis der regelbasierten Bewertung
+        ml_assessment_result = compact_json(ml_assessment)
+        rule_assessment_result = compact_json(rule_assessment)
+        assessments = (ml_assessment_result, rule_assessment_result)
 
-            Formuliere eine klare, präzise und verständliche Erklärung für den Fraud-Manager.
-            Beziehe dich dabei konkret auf die Bewertungsergebnisse und stelle Zusammenhänge her.
-            """,
-            agent=self.explanation_agent,
-            expected_output="Eine Erklärung, warum die Transaktion verdächtig erscheint.",
-            context=[
-                {
-                    "ml_assessment_result": "{ml_assessment_task.output}",
-                    "rule_assessment_result": "{rule_assessment_task.output}"
-                }
-            ]
-        )
+        # Folgeschritte werden erst erstellt, wenn feststeht, dass sie ausgeführt werden
+        branch_tasks = {
+            "decision_agent": lambda: (
+                self.decision_agent,
+                self._build_decision_task(
+                    transaction_data, ml_assessment_result, rule_assessment_result, transaction_json
+                )
+            ),
+            "generate_explanation": lambda: (
+                self.explanation_agent,
+                self._build_explanation_task(
+                    transaction_data, ml_assessment_result, rule_assessment_result, transaction_json
+                )
+            )
+        }
 
-        # Task für automatische Entscheidung erstellen
-        decision_task = Task(
-            description=f"""
-            Treffe eine automatische Entscheidung für diese Echtzeit-Überweisung:
-            {json.dumps(transaction_data, indent=2)}
-
-            Nutze dazu die Ergebnisse der ML-Bewertung und regelbasierten Bewertung:
-            - ml_assessment_result: Das Ergebnis der ML-Bewertung
-            - rule_assessment_result: Das Ergebnis der regelbasierten Bewertung
-
-            Gib deine Antwort im folgenden Format zurück:
-            {{
-                "decision": "approved",
-                "confidence": 0.85,
-                "reasoning": "Kurze Begründung deiner Entscheidung"
-            }}
-
-            Für decision darfst du nur "approved" oder "declined" verwenden.
-            """,
-            agent=self.decision_agent,
-            expected_output="Eine Entscheidung mit Begründung im JSON-Format.",
-            context=[
-                {
-                    "ml_assessment_result": "{ml_assessment_task.output}",
-                    "rule_assessment_result": "{rule_assessment_task.output}"
-                }
-            ]
-        )
+        def run_branch(step):
+            """Führt einen Folgeschritt im verbleibenden Budget aus (None bei Zeitüberschreitung)."""
+            if budget.expired():
+                timed_out_stages.append(step)
+                return None
+            output = self._run_parallel(
+                lambda: self._run_branch(transaction_data, step, branch_tasks[step], assessments), budget=budget
+            )[0]
+            if output is STAGE_TIMED_OUT:
+                timed_out_stages.append(step)
+                return None
+            return output
 
-        # Crew erstellen
-        if transaction_data["is_realtime"]:
-            # Bei Echtzeit-Transaktionen
-            crew = Crew(
-                agents=[
-                    self.ml_assessment_agent,
-                    self.rule_assessment_agent,
-                    self.coordinator_agent,
-                    self.decision_agent
-                ],
-                tasks=[
-                    ml_assessment_task,
-                    rule_assessment_task,
-                    coordination_task,
-                    decision_task
-                ],
-                verbose=True,
-                process=Process.sequential  # Sequentieller Prozess für bessere Kontrolle
-            )
+        if self.routing == "deterministic":
+            next_step = self._route(transaction_data, ml_assessment, rule_assessment)
+            decided_by = "routing"
+            branch_outputs = {}
+            if next_step in branch_tasks:
+                branch_outputs[next_step] = run_branch(next_step)
         else:
-            # Bei normalen Transaktionen
-            crew = Crew(
-                agents=[
-                    self.ml_assessment_agent,
-                    self.rule_assessment_agent,
-                    self.coordinator_agent,
-                    self.explanation_agent
-                ],
-                tasks=[
-                    ml_assessment_task,
-                    rule_assessment_task,
-                    coordination_task,
-                    explanation_task
-                ],
-                verbose=True,
-                process=Process.sequential
+            # Koordinator und den erwarteten Folgeschritt parallel ausführen
+            expected_step = "decision_agent" if transaction_data["is_realtime"] else "generate_explanation"
+            coordination_task = self._build_coordination_task(ml_assessment_result, rule_assessment_result)
+            coordinator_output, branch_output = self._run_parallel(
+                lambda: self._run_task(self.coordinator_agent, coordination_task),
+                lambda: self._run_branch(transaction_data, expected_step, branch_tasks[expected_step], assessments),
+                budget=budget
             )
+            if branch_output is STAGE_TIMED_OUT:
+                timed_out_stages.append(expected_step)
+                branch_output = None
+            branch_outputs = {expected_step: branch_output}
 
-        # Crew ausführen
-        result = crew.kickoff()
+            if coordinator_output is STAGE_TIMED_OUT:
+                # Ohne Koordinator-Antwort deterministisch weiterleiten
+                timed_out_stages.append("coordinator")
+                next_step = self._route(transaction_data, ml_assessment, rule_assessment)
+                decided_by = "routing"
+            else:
+                next_step = coordinator_output.strip()
+                decided_by = "coordinator"
+            if next_step in branch_tasks and next_step not in branch_outputs:
+                # Der Koordinator hat den anderen Zweig gewählt
+                branch_outputs[next_step] = run_branch(next_step)
 
         # Ergebnisse auswerten und zurückgeben
-        ml_assessment = self._extract_json(result[ml_assessment_task.id])
-        rule_assessment = self._extract_json(result[rule_assessment_task.id])
-        next_step = result[coordination_task.id].strip()
-
         if next_step == "approve_transaction":
-            return {
+            result = {
                 "transaction": transaction_data,
                 "ml_assessment": ml_assessment,
                 "rule_assessment": rule_assessment,
@@ -379,8 +912,20 @@ class FraudDetectionSystem:
                 "explanation": None
             }
         elif next_step == "decision_agent":
-            decision = self._extract_json(result[decision_task.id])
-            return {
+            decision = branch_outputs[next_step]
+            if decision is None:
+                # Budget erschöpft: deterministische Fallback-Entscheidung
+                decision = self.fallback_policy.decide(ml_assessment, rule_assessment)
+                decided_by = "fallback"
+            elif decision is STAGE_FAILED:
+                failed_stages.append(next_step)
+                decision = self.fallback_policy.decide(
+                    ml_assessment, rule_assessment, reason="Keine gültige Antwort des decision_agent"
+                )
+                decided_by = "fallback"
+            else:
+                decided_by = "decision_agent"
+            result = {
                 "transaction": transaction_data,
                 "ml_assessment": ml_assessment,
                 "rule_assessment": rule_assessment,
@@ -388,8 +933,9 @@ class FraudDetectionSystem:
                 "explanation": decision["reasoning"]
             }
         elif next_step == "generate_explanation":
-            explanation = result[explanation_task.id]
-            return {
+            explanation = branch_outputs[next_step]
+            decided_by = "explanation_agent"
+            result = {
                 "transaction": transaction_data,
                 "ml_assessment": ml_assessment,
                 "rule_assessment": rule_assessment,
@@ -397,40 +943,302 @@ class FraudDetectionSystem:
                 "final_decision": None  # Hier würde in einer realen Anwendung auf den Fraud-Manager gewartet
             }
         else:
-            return {
+            result = {
                 "transaction": transaction_data,
                 "ml_assessment": ml_assessment,
                 "rule_assessment": rule_assessment,
                 "error": f"Unerwartete Koordinator-Antwort: {next_step}"
             }
 
-    def _extract_json(self, text):
-        """Extrahiert JSON aus einem Text."""
+        result["triage"] = screening
+        result["velocity"] = velocity
+        return self._finish(transaction_data, result, decided_by, budget, timed_out_stages, failed_stages)
+
+    def _triage_result(self, transaction_data: Transaction, screening):
+        """
+        Ergebnis für eine von der Vorprüfung entschiedene Transaktion.
+
+        Freigaben sind endgültig. Markierte Echtzeit-Überweisungen werden abgelehnt, alle anderen
+        markierten Transaktionen mit den Gründen der Vorprüfung dem Fraud-Manager vorgelegt.
+        Bewertungen enthält das Ergebnis nie, auch wenn sie im Batch-Pfad schon berechnet wurden;
+        beide Pfade liefern so dasselbe Ergebnis.
+        """
+        reasons = "; ".join(screening["reasons"])
+        if screening["tier"] == TIER_APPROVE:
+            final_decision, explanation = "approved", None
+        elif transaction_data["is_realtime"]:
+            final_decision, explanation = "declined", f"Vorprüfung: {reasons}"
+        else:
+            final_decision, explanation = None, f"Vorprüfung: {reasons}"
+        return {
+            "transaction": transaction_data,
+            "ml_assessment": {},
+            "rule_assessment": {},
+            "final_decision": final_decision,
+            "explanation": explanation,
+            "triage": screening
+        }
+
+    def _finish(self, transaction_data: Transaction, result, decided_by, budget, timed_out_stages, failed_stages):
+        """Vermerkt Entscheidungsweg und Budgetverbrauch und schreibt Historie und Profil fort."""
+        # Herkunft der Entscheidung und Budgetverbrauch vermerken
+        result["decision_path"] = decided_by
+        result["latency"] = budget.report(timed_out_stages)
+        result["failed_stages"] = failed_stages
+        metrics.TRANSACTION_DURATION.observe(result["latency"]["elapsed_ms"] / 1000.0, path=decided_by)
+        metrics.DECISIONS.inc(path=decided_by, decision=result.get("final_decision") or "pending")
+
+        if self.audit_log is not None:
+            # Nur einreihen; geschrieben wird im Hintergrund
+            self.audit_log.record_result(result)
+
+        # Historie und Profilaggregate mit der verarbeiteten Transaktion fortschreiben
+        history_store.append(transaction_data)
+        if "error" not in result and result["final_decision"] != "declined":
+            # Abgelehnte Transaktionen sollen das Normalverhalten des Kontos nicht prägen
+            profile_store.update(transaction_data)
+        return result
+
+    def _process_safely(self, transaction_data: Transaction, ml_assessment=None, rule_assessment=None, velocity=None):
+        """Wie _process, liefert bei Fehlern aber ein Ergebnis mit "error" statt einer Exception."""
+        try:
+            return self._process(transaction_data, ml_assessment, rule_assessment, velocity)
+        except Exception as exc:
+            result = {
+                "transaction": transaction_data,
+                "error": f"Verarbeitung fehlgeschlagen: {exc}"
+            }
+            if self.audit_log is not None:
+                self.audit_log.record_result(result)
+            return result
+
+    def _process_batched(self, transaction_data: Transaction, ml_assessment=None, rule_assessment=None, velocity=None):
+        """Wie _process_safely, mit Micro-Batching der LLM-Stufen (nur bei nebenläufiger Verarbeitung)."""
+        token = _micro_batching.set(True)
         try:
-            # Suche nach JSON-Strukturen im Text
-            start = text.find('{')
-            end = text.rfind('}') + 1
-            if start >= 0 and end > start:
-                json_str = text[start:end]
-                return json.loads(json_str)
-            return {}
-        except:
-            # Fallback bei ungültigem JSON
-            return {}
+            return self._process_safely(transaction_data, ml_assessment, rule_assessment, velocity)
+        finally:
+            _micro_batching.reset(token)
+
+    def process_transactions(self, transactions: Iterable[Transaction], max_concurrency=8, batch_size=256):
+        """
+        Verarbeitet viele Transaktionen nebenläufig.
+
+        Transaktionen verschiedener Konten laufen parallel, Transaktionen desselben Absenderkontos
+        nacheinander in Eingabereihenfolge; die Entscheidungen entsprechen damit denen von
+        process_transaction() für dieselbe Eingabe. Die lokalen Bewertungen werden für alle jeweils
+        freien Transaktionen gemeinsam vektorisiert berechnet, die LLM-Stufen laufen in einem
+        begrenzten Thread-Pool. Ergebnisse werden in Fertigstellungsreihenfolge geliefert.
+
+        Args:
+            transactions: Beliebiges Iterable von Transaktionen
+            max_concurrency: Maximale Anzahl gleichzeitig verarbeiteter Transaktionen
+            batch_size: Anzahl Transaktionen, die je Lesevorgang aus der Eingabe übernommen werden
+
+        Yields:
+            Ein Ergebnis-Dictionary je Transaktion (wie process_transaction)
+        """
+        items = ((None, transaction_data) for transaction_data in transactions)
+        for _, result in self.process_tagged(items, max_concurrency, batch_size):
+            yield result
+
+    def process_tagged(self, items: Iterable[tuple], max_concurrency=8, batch_size=256, admit=None):
+        """
+        Wie process_transactions, mit einer Markierung je Transaktion (z.B. Sequenznummer).
+
+        Ergebnisse lassen sich so eindeutig ihrer Eingabe zuordnen, auch wenn dieselbe Transaktion
+        mehrfach vorkommt oder das Ergebnis eine Kopie der Transaktion enthält.
+
+        Args:
+            items: Paare (Markierung, Transaktion)
+            max_concurrency: Maximale Anzahl gleichzeitig verarbeiteter Transaktionen
+            batch_size: Anzahl Transaktionen, die je Lesevorgang aus der Eingabe übernommen werden
+            admit: Optional; liefert False, solange keine weitere Eingabe gelesen werden soll
+                (z.B. volles Umordnungsfenster des Aufrufers)
+
+        Yields:
+            Paare (Markierung, Ergebnis-Dictionary) in Fertigstellungsreihenfolge
+        """
+        scheduler = _AccountScheduler(self._assess_native_batch, batch_size)
+        chunks = _chunked(items, batch_size)
+        process = self._process_batched if max_concurrency > 1 else self._process_safely
+        exhausted = False
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            pending = {}
+            while True:
+                if not exhausted and scheduler.wants_input(max_concurrency) and (admit is None or admit()):
+                    chunk = next(chunks, None)
+                    exhausted = chunk is None
+                    scheduler.add(chunk or [])
+                # Begrenzte Anzahl offener Transaktionen (Backpressure)
+                while len(pending) < max_concurrency:
+                    ready = scheduler.next_ready()
+                    if ready is None:
+                        break
+                    item, assessments = ready
+                    pending[pool.submit(process, item[1], *assessments)] = item
+                if not pending:
+                    if exhausted:
+                        return
+                    if admit is not None and not admit():
+                        raise RuntimeError("admit() hält die Eingabe an, obwohl keine Transaktion mehr offen ist")
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    scheduler.done(item)
+                    yield item[0], future.result()
+
+    async def aprocess_transactions(self, transactions, max_concurrency=8, batch_size=256):
+        """
+        Asyncio-Variante von process_transactions.
+
+        Args:
+            transactions: Iterable oder Async-Iterable von Transaktionen
+            max_concurrency: Maximale Anzahl gleichzeitig verarbeiteter Transaktionen
+            batch_size: Anzahl Transaktionen, die je Lesevorgang aus der Eingabe übernommen werden
+
+        Yields:
+            Ein Ergebnis-Dictionary je Transaktion in Fertigstellungsreihenfolge
+        """
+        scheduler = _AccountScheduler(self._assess_native_batch, batch_size)
+        chunks = _achunked(transactions, batch_size)
+        process = self._process_batched if max_concurrency > 1 else self._process_safely
+        exhausted = False
+        pending = {}
+        while True:
+            if not exhausted and scheduler.wants_input(max_concurrency):
+                try:
+                    scheduler.add([(None, transaction_data) for transaction_data in await chunks.__anext__()])
+                except StopAsyncIteration:
+                    exhausted = True
+            while len(pending) < max_concurrency:
+                ready = scheduler.next_ready()
+                if ready is None:
+                    break
+                item, assessments = ready
+                pending[asyncio.ensure_future(asyncio.to_thread(process, item[1], *assessments))] = item
+            if not pending:
+                if exhausted:
+                    return
+                continue
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                scheduler.done(pending.pop(task))
+                yield task.result()
+
+    def close(self):
+        """Beendet Micro-Batcher und Stufen-Pool; noch eingereihte Bewertungen werden abgeschlossen."""
+        for batcher in self._batchers.values():
+            batcher.close()
+        self._stage_pool.shutdown(wait=True)
+
+    def export_accounts(self, predicate):
+        """
+        Exportiert Historie, Profilaggregate und Zeitfenster aller Absenderkonten, für die predicate zutrifft.
+
+        Wird vom ShardedWorkerPool genutzt, um Konten beim Hinzufügen eines Workers umzuziehen.
+
+        Args:
+            predicate: Liefert für eine Kontonummer True, wenn das Konto exportiert werden soll
+
+        Returns:
+            Ein Dictionary mit "accounts", "history", "profiles" und "velocity" für import_accounts()
+        """
+        known = set(history_store.senders()) | set(profile_store.accounts())
+        if self.velocity is not None:
+            known.update(self.velocity.accounts())
+        accounts = [account for account in known if predicate(account)]
+        return {
+            "accounts": accounts,
+            "history": history_store.export_accounts(accounts),
+            "profiles": profile_store.export_accounts(accounts),
+            "velocity": self.velocity.export_accounts(accounts) if self.velocity is not None else []
+        }
+
+    def import_accounts(self, state):
+        """
+        Übernimmt mit export_accounts() exportierte Konten.
+
+        Historie wird nur für Konten angehängt, die hier noch keine haben; das sind bei einem
+        neuen Shard alle außer denen aus den beim Start geladenen Stammdaten.
+        """
+        known = set(history_store.senders())
+        history_store.append_many(
+            transaction for transaction in state["history"] if transaction["sender_account"] not in known
+        )
+        profile_store.import_accounts(state["profiles"])
+        if self.velocity is not None:
+            self.velocity.import_accounts(state["velocity"])
+
+    def remove_accounts(self, accounts):
+        """Verwirft Historie, Profilaggregate und Zeitfenster von Konten, die ein anderer Shard übernommen hat."""
+        accounts = list(accounts)
+        history_store.remove_accounts(accounts)
+        profile_store.remove_accounts(accounts)
+        if self.velocity is not None:
+            self.velocity.remove_accounts(accounts)
+
+    def _record_case(self, analysis_result, outcome):
+        """Übernimmt eine Manager-Entscheidung zu einer verdächtigen Transaktion in den Fallindex."""
+        if analysis_result.get("final_decision") is not None or "error" in analysis_result:
+            # Nur Fälle, die dem Fraud-Manager vorgelegt wurden, sind aussagekräftig
+            return
+        case_index.add(
+            analysis_result["transaction"]["transaction_id"],
+            case_features_from_result(analysis_result),
+            outcome
+        )
+
+    def _record_manager_decision(self, transaction_data: Transaction, decision):
+        """Protokolliert die Entscheidung des Fraud-Managers und wartet, bis sie dauerhaft gespeichert ist."""
+        if self.audit_log is not None:
+            self.audit_log.record(
+                "manager_decision", transaction_data["transaction_id"], {"decision": decision}
+            ).result()
+        return decision
+
+    def _prefetch_session_tools(self, session: ToolSession, transaction_data: Transaction):
+        """Lädt Historie und Profil von Absender und Empfänger im Hintergrund in den Sitzungs-Cache."""
+        for account_id in (transaction_data["sender_account"], transaction_data["receiver_account"]):
+            session.prefetch(_history_key(account_id), lambda a=account_id: _fetch_history(a))
+            session.prefetch(("profile", account_id), lambda a=account_id: _fetch_profile(a))
 
     def interactive_fraud_manager_session(self, transaction_data: Transaction):
         """
         Startet eine interaktive Sitzung für einen Fraud-Manager.
 
+        Die Tool-Abfragen zu Absender und Empfänger werden schon während der ersten Analyse
+        vorab geladen und danach, mit der geprüften Transaktion, erneut; die Tools beantworten
+        Rückfragen aus dem Sitzungs-Cache.
+
         Args:
             transaction_data: Die zu überprüfende Transaktion
 
         Returns:
             Die finale Entscheidung
         """
-        # Erste Analyse durchführen
-        analysis_result = self.process_transaction(transaction_data)
+        session = ToolSession()
+        token = _tool_session.set(session)
+        try:
+            self._prefetch_session_tools(session, transaction_data)
+
+            # Erste Analyse durchführen
+            analysis_result = self.process_transaction(transaction_data)
+            # Die Analyse hat Historie und Profil um die geprüfte Transaktion fortgeschrieben
+            accounts = {transaction_data["sender_account"], transaction_data["receiver_account"]}
+            session.invalidate(lambda key: key[0] in ("history", "profile") and key[1] in accounts)
+            self._prefetch_session_tools(session, transaction_data)
+            if "error" not in analysis_result:
+                features = case_features_from_result(analysis_result)
+                session.prefetch(_similar_cases_key(features), lambda: _fetch_similar_cases(features))
+            return self._dialog(transaction_data, analysis_result)
+        finally:
+            _tool_session.reset(token)
+            session.close()
 
+    def _dialog(self, transaction_data: Transaction, analysis_result):
+        """Zeigt das Analyseergebnis an und beantwortet Fragen, bis der Fraud-Manager entscheidet."""
         # Ergebnisse anzeigen
         print("\n===== FRAUD DETECTION SYSTEM =====")
         print(f"Transaktion ID: {transaction_data['transaction_id']}")
@@ -446,16 +1254,36 @@ class FraudDetectionSystem:
         print("Befehle: GENEHMIGEN, ABLEHNEN, HILFE, BEENDEN")
         print("-----------------------------------")
 
+        # Eine Crew für alle Fragen der Sitzung; die Frage wird beim kickoff eingesetzt
+        query_task = Task(
+            description=QUERY_TEMPLATE,
+            agent=self.react_agent,
+            expected_output="Eine ausführliche Antwort auf die Frage des Fraud-Managers."
+        )
+        query_crew = Crew(
+            agents=[self.react_agent],
+            tasks=[query_task],
+            verbose=self.verbose,
+            process=Process.sequential
+        )
+        query_inputs = {
+            "transaction_id": transaction_data["transaction_id"],
+            "sender_account": transaction_data["sender_account"],
+            "receiver_account": transaction_data["receiver_account"]
+        }
+
         # Interaktiver Dialog mit dem ReAct-Agenten
         while True:
             user_input = input("\nFraud-Manager > ")
 
             if user_input.upper() == "BEENDEN":
-                return "aborted"
+                return self._record_manager_decision(transaction_data, "aborted")
             elif user_input.upper() == "GENEHMIGEN":
-                return "approved"
+                self._record_case(analysis_result, "false_positive")
+                return self._record_manager_decision(transaction_data, "approved")
             elif user_input.upper() == "ABLEHNEN":
-                return "declined"
+                self._record_case(analysis_result, "confirmed_fraud")
+                return self._record_manager_decision(transaction_data, "declined")
             elif user_input.upper() == "HILFE":
                 print("\nVerfügbare Befehle:")
                 print("- Stellen Sie Fragen zur Transaktion")
@@ -464,40 +1292,140 @@ class FraudDetectionSystem:
                 print("- BEENDEN: Prozess abbrechen")
                 continue
 
-            # Frage an den ReAct-Agenten stellen
-            query_task = Task(
-                description=f"""
-                Beantworte die folgende Frage des Fraud-Managers zur Transaktion {transaction_data['transaction_id']}:
+            # Frage an den ReAct-Agenten stellen, Antwort abrufen und anzeigen
+            answer = self._run_task(
+                self.react_agent, query_task, inputs=dict(query_inputs, question=user_input), crew=query_crew
+            )
+            print(f"\n{answer}")
 
-                "{user_input}"
+        return "undecided"
 
-                Verwende deine Tools, um relevante Informationen aus der Datenbank abzurufen.
-                Die Kontonummer des Absenders ist: {transaction_data['sender_account']}
-                Die Kontonummer des Empfängers ist: {transaction_data['receiver_account']}
-                """,
-                agent=self.react_agent,
-                expected_output="Eine ausführliche Antwort auf die Frage des Fraud-Managers."
-            )
 
-            # Eine temporäre Crew für diese einzelne Aufgabe erstellen
-            temp_crew = Crew(
-                agents=[self.react_agent],
-                tasks=[query_task],
-                verbose=False,
-                process=Process.sequential
-            )
+def use_streaming_state(state_dir, max_velocity_accounts=None):
+    """
+    Legt die Transaktionshistorie in state_dir auf der Platte ab und begrenzt die Zeitfenster-Zähler.
 
-            # Antwort abrufen und anzeigen
-            query_result = temp_crew.kickoff()
-            print(f"\n{query_result[query_task.id]}")
+    Für den Streaming-Betrieb: im Speicher bleibt je Konto nur ein fester Anteil (Kontonummer, Kopf der
+    Historie, Profilaggregate, Zeitfenster), die Transaktionen selbst liegen in memmap-Spalten. Muss vor dem
+    Erzeugen des FraudDetectionSystem aufgerufen werden. Ein leeres Verzeichnis übernimmt die simulierte Historie.
 
-        return "undecided"
+    Args:
+        state_dir: Verzeichnis für die Spaltendateien der Historie (wird bei Bedarf angelegt)
+        max_velocity_accounts: Obergrenze der Konten in den Zeitfenstern (None = unbegrenzt)
+    """
+    global history_store, velocity_engine
+    store = TransactionHistoryStore(os.path.join(state_dir, "history"))
+    if len(store) == 0:
+        store.append_many(history_store.export_accounts(history_store.senders()))
+    history_store.close()
+    history_store = store
+    velocity_engine = VelocityEngine(max_accounts=max_velocity_accounts)
+
+
+def _build_shard_system(shard, audit_dir=None, state_dir=None, max_velocity_accounts=None, **options):
+    """Erzeugt das System eines Worker-Prozesses; jeder Shard schreibt ein eigenes Audit-Log und eine eigene Historie."""
+    if state_dir:
+        use_streaming_state(os.path.join(state_dir, f"shard-{shard:03d}"), max_velocity_accounts)
+    audit_log = AuditLog(os.path.join(audit_dir, f"shard-{shard:03d}")) if audit_dir else None
+    return FraudDetectionSystem(audit_log=audit_log, **options)
 
 
 # Beispielnutzung
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Betrugserkennung für Banktransaktionen")
+    parser.add_argument("--input", default="-", help="JSONL-Datei, Verzeichnis mit *.jsonl-Dateien oder - für stdin")
+    parser.add_argument("--output", default="-", help="Zieldatei für die Entscheidungen (JSONL) oder - für stdout")
+    parser.add_argument("--rejects", help="Zieldatei für ungültige Eingabezeilen (JSONL)")
+    parser.add_argument("--unordered", action="store_true", help="Ergebnisse in Fertigstellungsreihenfolge schreiben")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="Gleichzeitig verarbeitete Transaktionen")
+    parser.add_argument("--window", type=int, default=1024, help="Umordnungsfenster bei geordneter Ausgabe")
+    parser.add_argument("--triage", action="store_true",
+                        help="Vorprüfung: eindeutige Fälle ohne Bewertungs- und Agentenstufen entscheiden")
+    parser.add_argument("--realtime-budget-ms", type=float,
+                        help="Latenzbudget je Echtzeit-Überweisung in Millisekunden")
+    parser.add_argument("--fallback", choices=["risk", "approve", "decline"], default="risk",
+                        help="Fallback-Entscheidung bei erschöpftem Latenzbudget")
+    parser.add_argument("--micro-batch-size", type=int, default=0,
+                        help="Transaktionen je gebündeltem ML-/Regel-Prompt (nur mit LLM-Backends, 0 = aus)")
+    parser.add_argument("--micro-batch-wait-ms", type=float, default=20.0,
+                        help="Maximale Wartezeit auf weitere Transaktionen für einen Stapel")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker-Prozesse, partitioniert nach Absenderkonto (1 = im Hauptprozess)")
+    parser.add_argument("--audit-dir", help="Verzeichnis des Audit-Logs für alle Ergebnisse und Entscheidungen")
+    parser.add_argument("--state-dir",
+                        help="Verzeichnis der Transaktionshistorie (Standard: temporäres Verzeichnis je Lauf); "
+                             "bei Wiederverwendung dieselbe Worker-Anzahl angeben")
+    parser.add_argument("--max-velocity-accounts", type=int, default=100000,
+                        help="Konten in den Zeitfenster-Zählern, darüber wird das am längsten inaktive verdrängt")
+    parser.add_argument("--metrics-file",
+                        help="Metriken nach Abschluss schreiben (.json als Snapshot, sonst Prometheus-Textformat)")
+    parser.add_argument("--interactive", action="store_true",
+                        help="Interaktive Sitzung für die Beispieltransaktion statt Streaming-Betrieb")
+    args = parser.parse_args()
+    if args.metrics_file:
+        metrics.registry.enable()
+    if not args.interactive:
+        # Headless-Streaming: Eingabe lesen, prüfen, bewerten und als JSONL schreiben.
+        # Die Historie liegt auf der Platte, damit der Speicher nicht mit der Zahl der Transaktionen wächst.
+        temporary_state = None if args.state_dir else tempfile.TemporaryDirectory(prefix="fraud-state-")
+        state_dir = args.state_dir or temporary_state.name
+        options = dict(
+            verbose=False,
+            realtime_budget_ms=args.realtime_budget_ms,
+            triage=args.triage,
+            fallback_policy=FallbackPolicy(mode=args.fallback),
+            micro_batch_size=args.micro_batch_size,
+            micro_batch_wait_ms=args.micro_batch_wait_ms
+        )
+        if args.workers > 1:
+            # Historie, Profile und Caches liegen je Shard im Worker-Prozess
+            audit_log = None
+            fraud_system = ShardedWorkerPool(
+                functools.partial(
+                    _build_shard_system,
+                    audit_dir=args.audit_dir,
+                    state_dir=state_dir,
+                    max_velocity_accounts=args.max_velocity_accounts,
+                    **options
+                ),
+                workers=args.workers
+            )
+        else:
+            use_streaming_state(state_dir, args.max_velocity_accounts)
+            audit_log = AuditLog(args.audit_dir) if args.audit_dir else None
+            fraud_system = FraudDetectionSystem(audit_log=audit_log, **options)
+        output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        rejects = open(args.rejects, "w", encoding="utf-8") if args.rejects else None
+        try:
+            counts = run_pipeline(
+                fraud_system,
+                Transaction,
+                source=args.input,
+                output=output,
+                rejects=rejects,
+                ordered=not args.unordered,
+                max_concurrency=args.max_concurrency,
+                window=args.window
+            )
+        finally:
+            fraud_system.close()
+            if audit_log is not None:
+                audit_log.close()
+            if output is not sys.stdout:
+                output.close()
+            if rejects is not None:
+                rejects.close()
+            if args.metrics_file:
+                metrics.registry.write(args.metrics_file)
+            history_store.close()
+            if temporary_state is not None:
+                temporary_state.cleanup()
+        print(f"{counts['processed']} Transaktionen verarbeitet, {counts['errors']} Fehler", file=sys.stderr)
+        sys.exit(0)
+
     # System initialisieren
-    fraud_system = FraudDetectionSystem()
+    audit_log = AuditLog(args.audit_dir) if args.audit_dir else None
+    fraud_system = FraudDetectionSystem(audit_log=audit_log)
 
     # Beispieltransaktion für Überprüfung
     example_transaction = {
@@ -510,31 +1438,13 @@ if __name__ == "__main__":
         "is_realtime": False
     }
 
-    # Option zur automatischen oder interaktiven Verarbeitung
-    mode = input("Modus wählen (1=Automatisch, 2=Interaktiv): ")
-
-    if mode == "1":
-        # Automatische Verarbeitung
-        print("\n=== Automatische Betrugsanalyse wird durchgeführt ===")
-        result = fraud_system.process_transaction(example_transaction)
-
-        print("\n=== Ergebnis der Betrugsanalyse ===")
-        print(f"Transaktion ID: {example_transaction['transaction_id']}")
-        print(f"ML-Bewertung: {result['ml_assessment'].get('probability', 0) * 100:.1f}% Betrugswahrscheinlichkeit")
-        print(
-            f"Regelbasierte Bewertung: {'Verdächtig' if result['rule_assessment'].get('is_flagged', False) else 'Unverdächtig'}")
-
-        if result.get('final_decision'):
-            print(f"Finale Entscheidung: {result['final_decision'].upper()}")
-        else:
-            print("Empfehlung: Überprüfung durch Fraud-Manager erforderlich")
-
-        if result.get('explanation'):
-            print("\nErklärung:")
-            print(result['explanation'])
-    else:
-        # Interaktive Sitzung
-        print("\n=== Fraud Detection System gestartet ===")
-        print("Starte interaktive Überprüfung für verdächtige Transaktion...")
-        decision = fraud_system.interactive_fraud_manager_session(example_transaction)
-        print(f"\nFinale Entscheidung: {decision.upper()}")
+    # Interaktive Sitzung
+    print("\n=== Fraud Detection System gestartet ===")
+    print("Starte interaktive Überprüfung für verdächtige Transaktion...")
+    decision = fraud_system.interactive_fraud_manager_session(example_transaction)
+    print(f"\nFinale Entscheidung: {decision.upper()}")
+    fraud_system.close()
+    if audit_log is not None:
+        audit_log.close()
+    if args.metrics_file:
+        metrics.registry.write(args.metrics_file)
@@ -0,0 +1,248 @@
+"""
+Prozessinterne Metriken für Tasks, Tools und Stufen des Betrugserkennungssystems.
+
+Zähler und Histogramme werden in einer Registry gesammelt und lassen sich im
+Prometheus-Textformat oder als JSON-Snapshot exportieren. Solange die Registry
+deaktiviert ist, kehrt jede Messung nach einer einzigen Attributabfrage zurück.
+"""
+import functools
+import json
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken ist optional
+    _ENCODING = None
+
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Zählt Tokens mit tiktoken, falls installiert, sonst per Näherung (4 Zeichen je Token)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Monoton steigender Zähler mit Labels."""
+
+    type = "counter"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, value: float = 1.0, **labels):
+        if not self.registry.enabled:
+            return
+        key = _label_key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0.0) + value
+
+    def _samples(self):
+        for key, value in self.values.items():
+            yield self.name, key, (), value
+
+    def _snapshot(self):
+        return [{"labels": dict(key), "value": value} for key, value in self.values.items()]
+
+
+class Histogram:
+    """Histogramm mit festen Bucket-Grenzen, Summe und Anzahl je Labelkombination."""
+
+    type = "histogram"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, buckets: Sequence[float]):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        key = _label_key(labels)
+        with self.registry.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                # [Bucket-Zähler..., Summe, Anzahl]
+                entry = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def time(self, **labels):
+        """Kontextmanager, der die Laufzeit des Blocks in Sekunden beobachtet."""
+        return _Timer(self, labels)
+
+    def _samples(self):
+        for key, entry in self.values.items():
+            for bound, count in zip(self.buckets, entry):
+                yield f"{self.name}_bucket", key, (("le", repr(float(bound))),), count
+            yield f"{self.name}_bucket", key, (("le", "+Inf"),), entry[-1]
+            yield f"{self.name}_sum", key, (), entry[-2]
+            yield f"{self.name}_count", key, (), entry[-1]
+
+    def _snapshot(self):
+        return [
+            {
+                "labels": dict(key),
+                "buckets": dict(zip((str(bound) for bound in self.buckets), entry[:len(self.buckets)])),
+                "sum": entry[-2],
+                "count": entry[-1]
+            }
+            for key, entry in self.values.items()
+        ]
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Sammlung aller Metriken eines Prozesses."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, Any] = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self.metrics.setdefault(name, Counter(self, name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(self, name, help_text, buckets))
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            for metric in self.metrics.values():
+                metric.values.clear()
+
+    def to_prometheus(self) -> str:
+        """Exportiert alle Metriken im Prometheus-Textformat."""
+        lines = []
+        with self.lock:
+            for metric in self.metrics.values():
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.type}")
+                for sample_name, key, extra, value in metric._samples():
+                    lines.append(f"{sample_name}{_format_labels(key, extra)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Liefert alle Metriken als JSON-serialisierbares Dictionary."""
+        with self.lock:
+            return {
+                name: {"type": metric.type, "help": metric.help, "samples": metric._snapshot()}
+                for name, metric in self.metrics.items()
+            }
+
+    def write(self, path: str):
+        """Schreibt die Metriken nach path (.json als Snapshot, sonst Prometheus-Textformat)."""
+        with open(path, "w", encoding="utf-8") as handle:
+            if path.endswith(".json"):
+                json.dump(self.snapshot(), handle, indent=2)
+            else:
+                handle.write(self.to_prometheus())
+
+
+# Prozessweite Registry, standardmäßig deaktiviert
+registry = MetricsRegistry()
+
+TASK_DURATION = registry.histogram("fraud_task_duration_seconds", "Laufzeit einer LLM-Task je Stufe")
+TASK_CALLS = registry.counter("fraud_task_calls_total", "Ausgeführte LLM-Tasks je Stufe")
+TASK_ERRORS = registry.counter("fraud_task_errors_total", "Fehlgeschlagene LLM-Tasks je Stufe")
+TASK_RETRIES = registry.counter("fraud_task_retries_total", "Wiederholte LLM-Tasks je Stufe")
+PROMPT_CHARS = registry.counter("fraud_prompt_chars_total", "Zeichen in Prompts je Stufe")
+PROMPT_TOKENS = registry.counter("fraud_prompt_tokens_total", "Tokens in Prompts je Stufe")
+RESPONSE_CHARS = registry.counter("fraud_response_chars_total", "Zeichen in Antworten je Stufe")
+RESPONSE_TOKENS = registry.counter("fraud_response_tokens_total", "Tokens in Antworten je Stufe")
+PARSE_FAILURES = registry.counter("fraud_parse_failures_total", "Nicht auswertbare JSON-Antworten je Stufe")
+STAGE_DURATION = registry.histogram("fraud_stage_duration_seconds", "Laufzeit der Bewertungsstufen")
+TRANSACTION_DURATION = registry.histogram(
+    "fraud_transaction_duration_seconds", "Gesamtlaufzeit einer Transaktion je Entscheidungspfad"
+)
+DECISIONS = registry.counter("fraud_decisions_total", "Ergebnisse je Entscheidungspfad und Entscheidung")
+TRIAGE_DECISIONS = registry.counter("fraud_triage_total", "Transaktionen je Stufe der Vorprüfung")
+BATCH_SIZE = registry.histogram(
+    "fraud_batch_size", "Transaktionen je gebündeltem Prompt", buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+BATCH_ITEMS = registry.counter(
+    "fraud_batch_items_total",
+    "Gebündelt bewertete Transaktionen je Stufe und Ergebnis (batched, fallback oder error)"
+)
+BATCH_FAILURES = registry.counter("fraud_batch_failures_total", "Fehlgeschlagene Stapelaufrufe je Stufe")
+TOOL_DURATION = registry.histogram("fraud_tool_duration_seconds", "Laufzeit der Tool-Aufrufe")
+TOOL_CALLS = registry.counter("fraud_tool_calls_total", "Tool-Aufrufe je Tool")
+TOOL_ERRORS = registry.counter("fraud_tool_errors_total", "Fehlgeschlagene Tool-Aufrufe je Tool")
+TOOL_RESPONSE_CHARS = registry.counter("fraud_tool_response_chars_total", "Zeichen in Tool-Antworten je Tool")
+TOOL_RESPONSE_TOKENS = registry.counter("fraud_tool_response_tokens_total", "Tokens in Tool-Antworten je Tool")
+
+
+def instrument_tool(function: Callable) -> Callable:
+    """Dekorator für Tool-Funktionen: misst Laufzeit, Aufrufe, Fehler und Antwortgröße."""
+    name = function.__name__
+
+    @functools.wraps(function)
+    def instrumented(*args, **kwargs):
+        if not registry.enabled:
+            return function(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            response = function(*args, **kwargs)
+        except Exception:
+            TOOL_ERRORS.inc(tool=name)
+            raise
+        finally:
+            TOOL_DURATION.observe(time.perf_counter() - start, tool=name)
+            TOOL_CALLS.inc(tool=name)
+        TOOL_RESPONSE_CHARS.inc(len(response), tool=name)
+        TOOL_RESPONSE_TOKENS.inc(count_tokens(response), tool=name)
+        return response
+    return instrumented
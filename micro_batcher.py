@@ -0,0 +1,120 @@
+"""
+Micro-Batching für LLM-Bewertungen.
+
+Der MicroBatcher sammelt einzelne Anfragen, bis max_items erreicht oder
+max_wait_ms seit der ersten Anfrage vergangen sind, und übergibt sie
+gemeinsam an eine Stapelfunktion. Die Stapelfunktion liefert ein Dictionary
+Schlüssel -> Ergebnis; Anfragen ohne Ergebnis erhalten None, damit der
+Aufrufer auf einen Einzelaufruf ausweichen kann. Scheitert der ganze Stapel,
+wird das gezählt (failed_batches, fraud_batch_failures_total) und jede Anfrage
+erhält die Exception.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List
+
+import metrics
+
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Bündelt Einzelanfragen zu Stapeln nach Anzahl oder Wartezeit."""
+
+    def __init__(
+            self,
+            run_batch: Callable[[List[Any]], Dict[Hashable, Any]],
+            max_items: int = 16,
+            max_wait_ms: float = 20.0,
+            max_inflight: int = 2,
+            name: str = "batch"
+    ):
+        """
+        Args:
+            run_batch: Bewertet eine Liste von Elementen und liefert ein Dictionary Schlüssel -> Ergebnis
+            max_items: Maximale Stapelgröße
+            max_wait_ms: Maximale Wartezeit ab der ersten Anfrage eines Stapels
+            max_inflight: Anzahl gleichzeitig laufender Stapel
+            name: Name für Threads und Metriken
+        """
+        self.run_batch = run_batch
+        self.max_items = max_items
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self.failed_batches = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix=f"{name}-batch")
+        self._thread = threading.Thread(target=self._collect, name=f"{name}-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, key: Hashable, item: Any) -> Future:
+        """
+        Reiht ein Element ein.
+
+        Returns:
+            Ein Future mit dem Ergebnis für key oder None, falls der Stapel keines geliefert hat;
+            ist der Stapelaufruf fehlgeschlagen, trägt das Future dessen Exception
+
+        Raises:
+            RuntimeError: Wenn der Batcher bereits geschlossen ist
+        """
+        future = Future()
+        with self._lock:
+            # Nach dem Stopp-Signal würde niemand die Anfrage mehr abholen
+            if self._closed:
+                raise RuntimeError(f"MicroBatcher {self.name} ist geschlossen")
+            self._queue.put((key, item, future))
+        return future
+
+    def _collect(self):
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                return
+            batch = [entry]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while len(batch) < self.max_items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+            self._pool.submit(self._dispatch, batch)
+            if stop:
+                return
+
+    def _dispatch(self, batch):
+        metrics.BATCH_SIZE.observe(len(batch), stage=self.name)
+        try:
+            results = self.run_batch([item for _, item, _ in batch])
+        except Exception as exc:
+            with self._lock:
+                self.failed_batches += 1
+            metrics.BATCH_FAILURES.inc(stage=self.name)
+            for _, _, future in batch:
+                future.set_exception(exc)
+            return
+        for key, _, future in batch:
+            future.set_result(results.get(key))
+
+    def close(self):
+        """Verarbeitet noch eingereihte Anfragen und beendet den Batcher; weitere submit()-Aufrufe schlagen fehl."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+        self._pool.shutdown(wait=True)
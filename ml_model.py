@@ -0,0 +1,224 @@
+"""
+Lokales Scoring-Modell für die ML-Bewertung.
+
+Merkmale werden aus der Transaktion und dem Nutzerprofil abgeleitet und mit
+einer kompakten logistischen Regression in NumPy bewertet. Die Gewichte können
+aus einer .npz-Datei geladen werden; ganze Stapel von Transaktionen werden in
+einem einzigen vektorisierten Aufruf bewertet.
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from rule_engine import minute_of_day
+
+
+MODEL_VERSION = "fraud-detection-v4.1-numpy"
+
+FEATURE_NAMES = [
+    "log_amount_ratio",
+    "amount_unusually_high",
+    "new_receiver",
+    "is_realtime",
+    "unusual_time",
+    "risk_score",
+    "previous_flags",
+    "new_account",
+    # Aus den Zeitfenstern der VelocityEngine; ohne Fensterwerte 0
+    "burst_count_1m",
+    "distinct_receivers_1h",
+    "prior_volume_ratio_24h"
+]
+
+# Handgesetzte Startgewichte, bis ein trainiertes Modell geladen wird
+DEFAULT_WEIGHTS = np.array([0.8, 1.2, 1.5, 0.6, 1.0, 2.0, 0.3, 0.8, 0.9, 0.7, 0.4])
+DEFAULT_BIAS = -4.0
+DEFAULT_THRESHOLD = 0.5
+
+# Ab diesem Vielfachen des Durchschnittsbetrags gilt ein Betrag als ungewöhnlich hoch
+UNUSUAL_AMOUNT_FACTOR = 3.0
+# Konten, die jünger als diese Anzahl Tage sind, gelten als neu
+NEW_ACCOUNT_DAYS = 90
+
+
+class FraudScoringModel:
+    """Logistische Regression zur Bewertung der Betrugswahrscheinlichkeit."""
+
+    def __init__(
+            self,
+            weights: Optional[np.ndarray] = None,
+            bias: float = DEFAULT_BIAS,
+            threshold: float = DEFAULT_THRESHOLD,
+            version: str = MODEL_VERSION,
+            profile_loader: Optional[Callable[[str], Dict[str, Any]]] = None
+    ):
+        """
+        Args:
+            weights: Gewichte in der Reihenfolge von FEATURE_NAMES
+            bias: Achsenabschnitt der logistischen Regression
+            threshold: Schwellwert, ab dem eine Transaktion als Betrug gilt
+            version: Versionskennung, die in jedem Ergebnis zurückgegeben wird
+            profile_loader: Liefert das Nutzerprofil eines Absenderkontos
+        """
+        self.weights = np.asarray(weights if weights is not None else DEFAULT_WEIGHTS, dtype=np.float64)
+        if self.weights.shape != (len(FEATURE_NAMES),):
+            raise ValueError(
+                f"Erwartet {len(FEATURE_NAMES)} Gewichte, erhalten: {self.weights.shape}"
+            )
+        self.bias = float(bias)
+        self.threshold = float(threshold)
+        self.version = version
+        self.profile_loader = profile_loader
+
+    @classmethod
+    def load(cls, path: str, profile_loader: Optional[Callable[[str], Dict[str, Any]]] = None):
+        """Lädt ein Modell aus einer .npz-Datei."""
+        with np.load(path, allow_pickle=False) as data:
+            feature_names = [str(name) for name in data["feature_names"]]
+            if feature_names != FEATURE_NAMES[:len(feature_names)]:
+                raise ValueError(f"Inkompatible Merkmale im Modell: {feature_names}")
+            # Ältere Modelle kennen später ergänzte Merkmale nicht; sie gehen mit Gewicht 0 ein
+            weights = np.zeros(len(FEATURE_NAMES))
+            weights[:len(feature_names)] = data["weights"]
+            return cls(
+                weights=weights,
+                bias=float(data["bias"]),
+                threshold=float(data["threshold"]),
+                version=str(data["version"]),
+                profile_loader=profile_loader
+            )
+
+    def save(self, path: str):
+        """Speichert das Modell als .npz-Datei."""
+        np.savez(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            threshold=self.threshold,
+            version=self.version,
+            feature_names=np.array(FEATURE_NAMES)
+        )
+
+    def extract_features(
+            self,
+            transactions: Sequence[Dict[str, Any]],
+            profiles: Sequence[Dict[str, Any]],
+            velocities: Optional[Sequence[Dict[str, float]]] = None
+    ) -> np.ndarray:
+        """
+        Erzeugt die Merkmalsmatrix für einen Stapel von Transaktionen.
+
+        Args:
+            transactions: Die zu bewertenden Transaktionen
+            profiles: Das Nutzerprofil des Absenders je Transaktion
+            velocities: Optional die Fensterwerte der VelocityEngine je Transaktion
+
+        Returns:
+            Eine Matrix der Form (Transaktionen x Merkmale)
+        """
+        count = len(transactions)
+        amount = np.fromiter((float(t["amount"]) for t in transactions), dtype=np.float64, count=count)
+        average = np.fromiter(
+            (float(p.get("average_transaction_amount") or 0.0) for p in profiles), dtype=np.float64, count=count
+        )
+        new_receiver = np.fromiter(
+            (t["receiver_account"] not in (p.get("typical_receivers") or ())
+             for t, p in zip(transactions, profiles)),
+            dtype=bool, count=count
+        )
+        is_realtime = np.fromiter((bool(t.get("is_realtime", False)) for t in transactions), dtype=bool, count=count)
+        minutes = np.fromiter(
+            (minute_of_day(t.get("timestamp", "")) for t in transactions), dtype=np.int32, count=count
+        )
+        risk_score = np.fromiter((float(p.get("risk_score") or 0.0) for p in profiles), dtype=np.float64, count=count)
+        previous_flags = np.fromiter(
+            (float(p.get("previous_flags") or 0) for p in profiles), dtype=np.float64, count=count
+        )
+        account_age = np.fromiter(
+            (float(p.get("account_age_days", NEW_ACCOUNT_DAYS)) for p in profiles), dtype=np.float64, count=count
+        )
+
+        features = np.empty((count, len(FEATURE_NAMES)), dtype=np.float64)
+        features[:, 0] = np.log1p(amount) - np.log1p(average)
+        features[:, 1] = amount > UNUSUAL_AMOUNT_FACTOR * np.maximum(average, 1.0)
+        features[:, 2] = new_receiver
+        features[:, 3] = is_realtime
+        features[:, 4] = (minutes >= 0) & ((minutes >= 23 * 60) | (minutes < 6 * 60))
+        features[:, 5] = risk_score
+        features[:, 6] = previous_flags
+        features[:, 7] = account_age < NEW_ACCOUNT_DAYS
+
+        if velocities is None:
+            features[:, 8:] = 0.0
+        else:
+            velocity = np.array(
+                [(v.get("count_1m", 0), v.get("distinct_receivers_1h", 0), v.get("sum_24h", 0)) for v in velocities],
+                dtype=np.float64
+            ).reshape(count, 3)
+            # Die Fensterwerte enthalten die aktuelle Transaktion; bewertet werden ihre Vorgänger
+            features[:, 8] = np.log1p(np.maximum(velocity[:, 0] - 1, 0))
+            features[:, 9] = np.log1p(np.maximum(velocity[:, 1] - 1, 0))
+            features[:, 10] = np.maximum(np.log1p(np.maximum(velocity[:, 2] - amount, 0)) - np.log1p(average), 0)
+        return features
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Berechnet die Betrugswahrscheinlichkeit für eine Merkmalsmatrix."""
+        return 1.0 / (1.0 + np.exp(-(features @ self.weights + self.bias)))
+
+    def score_batch(
+            self,
+            transactions: Sequence[Dict[str, Any]],
+            profiles: Optional[Sequence[Dict[str, Any]]] = None,
+            velocities: Optional[Sequence[Dict[str, float]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Bewertet einen Stapel von Transaktionen.
+
+        Args:
+            transactions: Die zu bewertenden Transaktionen
+            profiles: Optional bereits geladene Nutzerprofile je Transaktion
+            velocities: Optional die Fensterwerte der VelocityEngine je Transaktion
+
+        Returns:
+            Eine Liste von ML-Bewertungen in der Reihenfolge der Eingabe
+        """
+        if not transactions:
+            return []
+
+        if profiles is None:
+            profiles_by_sender: Dict[str, Dict[str, Any]] = {}
+            for transaction in transactions:
+                sender = transaction["sender_account"]
+                if sender not in profiles_by_sender:
+                    profiles_by_sender[sender] = self.profile_loader(sender) if self.profile_loader else {}
+            profiles = [profiles_by_sender[t["sender_account"]] for t in transactions]
+
+        features = self.extract_features(transactions, profiles, velocities)
+        probabilities = self.predict_proba(features)
+
+        results = []
+        for row, probability in zip(features, probabilities):
+            results.append({
+                "probability": round(float(probability), 4),
+                "threshold": self.threshold,
+                "is_fraud": bool(probability >= self.threshold),
+                "features": {
+                    "amount_unusually_high": bool(row[1]),
+                    "new_receiver": bool(row[2]),
+                    "is_realtime": bool(row[3]),
+                    "unusual_time": bool(row[4])
+                },
+                "model_version": self.version
+            })
+        return results
+
+    def score(
+            self,
+            transaction: Dict[str, Any],
+            profile: Optional[Dict[str, Any]] = None,
+            velocity: Optional[Dict[str, float]] = None
+    ) -> Dict[str, Any]:
+        """Bewertet eine einzelne Transaktion."""
+        return self.score_batch(
+            [transaction], None if profile is None else [profile], None if velocity is None else [velocity]
+        )[0]
@@ -0,0 +1,197 @@
+"""
+Streaming-Pipeline für JSONL-Transaktionen.
+
+Transaktionen werden zeilenweise aus stdin, einer Datei oder allen
+*.jsonl-Dateien eines Verzeichnisses gelesen, gegen das Transaction-Schema
+geprüft, durch das Betrugserkennungssystem geschleust und als JSONL
+geschrieben. Alle Stufen sind Generatoren; die Puffer der Pipeline hängen nur
+von Fenstergröße und Nebenläufigkeit ab, nicht von der Größe der Eingabe.
+
+Der Kontozustand des Systems (Historie, Profile, Zeitfenster) wächst dagegen
+mit der Eingabe. Der CLI-Betrieb legt die Historie deshalb per
+use_streaming_state() auf die Platte und begrenzt die Zeitfenster; im Speicher
+bleibt ein fester Anteil je Konto, nicht je Transaktion.
+"""
+import json
+import os
+import sys
+import typing
+from typing import Any, Dict, IO, Iterable, Iterator, Optional, Tuple
+
+
+def iter_lines(source: str) -> Iterator[Tuple[str, int, str]]:
+    """
+    Liest Zeilen aus stdin ("-"), einer Datei oder einem Verzeichnis mit *.jsonl-Dateien.
+
+    Yields:
+        Tupel (Quelle, Zeilennummer, Zeile)
+    """
+    if source == "-":
+        for number, line in enumerate(sys.stdin, start=1):
+            yield "<stdin>", number, line
+        return
+
+    if os.path.isdir(source):
+        paths = sorted(
+            os.path.join(source, name) for name in os.listdir(source) if name.endswith(".jsonl")
+        )
+    else:
+        paths = [source]
+
+    for path in paths:
+        with open(path, encoding="utf-8") as handle:
+            for number, line in enumerate(handle, start=1):
+                yield path, number, line
+
+
+def _matches(value: Any, expected: Any) -> bool:
+    """Prüft einen Wert gegen einen (einfachen) Typ-Hinweis."""
+    if typing.get_origin(expected) is typing.Union:
+        return any(_matches(value, option) for option in typing.get_args(expected))
+    if expected is type(None):
+        return value is None
+    if expected is float:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if expected is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, expected)
+
+
+def validate_record(record: Any, schema: type) -> Dict[str, Any]:
+    """
+    Prüft einen Datensatz gegen ein TypedDict-Schema.
+
+    Args:
+        record: Der geparste Datensatz
+        schema: Die TypedDict-Klasse (z.B. Transaction)
+
+    Returns:
+        Der Datensatz, reduziert auf die Felder des Schemas
+
+    Raises:
+        ValueError: Wenn Felder fehlen oder einen falschen Typ haben
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Datensatz ist kein JSON-Objekt")
+
+    hints = typing.get_type_hints(schema)
+    missing = [field for field in hints if field not in record]
+    if missing:
+        raise ValueError(f"Fehlende Felder: {', '.join(missing)}")
+    for field, expected in hints.items():
+        if not _matches(record[field], expected):
+            raise ValueError(f"Ungültiger Typ für {field}: {type(record[field]).__name__}")
+    return {field: record[field] for field in hints}
+
+
+def read_transactions(source: str, schema: type, rejects: Optional[IO[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Liest und validiert Transaktionen als Generator.
+
+    Ungültige Zeilen werden übersprungen und, falls angegeben, als JSONL nach rejects geschrieben.
+    """
+    for origin, number, line in iter_lines(source):
+        if not line.strip():
+            continue
+        try:
+            yield validate_record(json.loads(line), schema)
+        except ValueError as exc:
+            if rejects is not None:
+                rejects.write(json.dumps(
+                    {"source": origin, "line": number, "error": str(exc)}, ensure_ascii=False
+                ) + "\n")
+
+
+def process_stream(
+        system,
+        transactions: Iterable[Dict[str, Any]],
+        ordered: bool = True,
+        max_concurrency: int = 8,
+        window: int = 1024
+) -> Iterator[Dict[str, Any]]:
+    """
+    Schleust Transaktionen durch das System.
+
+    Ein einziger Aufruf verarbeitet den ganzen Strom, sodass die Nebenläufigkeit nie auf null fällt.
+    Bei geordneter Ausgabe trägt jede Transaktion ihre Sequenznummer; fertige Ergebnisse warten in
+    einem Umordnungspuffer, bis alle Vorgänger geschrieben sind. Ist das Fenster voll (eine langsame
+    Transaktion hält es auf), liest das System keine weitere Eingabe, bis sie fertig ist.
+
+    Args:
+        system: Ein FraudDetectionSystem oder ShardedWorkerPool
+        transactions: Validierte Transaktionen
+        ordered: Ergebnisse in Eingabereihenfolge liefern
+        max_concurrency: Maximale Anzahl gleichzeitig verarbeiteter Transaktionen
+        window: Maximale Anzahl gelesener, noch nicht geschriebener Transaktionen bei geordneter Ausgabe
+
+    Yields:
+        Die Ergebnis-Dictionaries
+    """
+    if not ordered:
+        yield from system.process_transactions(
+            transactions, max_concurrency=max_concurrency, batch_size=max(1, min(window, 256))
+        )
+        return
+
+    # Kleine Lesevorgänge, damit schon bei teilweise gefülltem Fenster weitergelesen wird
+    batch_size = max(1, min(window // 4, 256))
+
+    admitted = 0
+    emitted = 0
+
+    def numbered():
+        nonlocal admitted
+        for sequence, transaction in enumerate(transactions):
+            admitted = sequence + 1
+            yield sequence, transaction
+
+    def admit():
+        # Ein ganzer Lesevorgang muss noch ins Fenster passen
+        return admitted - emitted + batch_size <= max(window, batch_size)
+
+    finished: Dict[int, Dict[str, Any]] = {}
+    for sequence, result in system.process_tagged(
+            numbered(), max_concurrency=max_concurrency, batch_size=batch_size, admit=admit
+    ):
+        finished[sequence] = result
+        while emitted in finished:
+            yield finished.pop(emitted)
+            emitted += 1
+
+
+def run_pipeline(
+        system,
+        schema: type,
+        source: str = "-",
+        output: Optional[IO[str]] = None,
+        rejects: Optional[IO[str]] = None,
+        ordered: bool = True,
+        max_concurrency: int = 8,
+        window: int = 1024
+) -> Dict[str, int]:
+    """
+    Liest, prüft, bewertet und schreibt einen Transaktionsstrom.
+
+    Args:
+        system: Ein FraudDetectionSystem
+        schema: Das TypedDict-Schema der Eingabe
+        source: "-" für stdin, Pfad zu einer JSONL-Datei oder einem Verzeichnis
+        output: Ziel für die Entscheidungen (Standard: stdout)
+        rejects: Optionales Ziel für ungültige Zeilen
+        ordered: Ergebnisse in Eingabereihenfolge schreiben
+        max_concurrency: Maximale Anzahl gleichzeitig verarbeiteter Transaktionen
+        window: Größe des Umordnungsfensters bei geordneter Ausgabe
+
+    Returns:
+        Zähler für geschriebene Ergebnisse und Fehler
+    """
+    output = output or sys.stdout
+    counts = {"processed": 0, "errors": 0}
+    transactions = read_transactions(source, schema, rejects)
+    for result in process_stream(system, transactions, ordered, max_concurrency, window):
+        output.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+        counts["processed"] += 1
+        if "error" in result:
+            counts["errors"] += 1
+    output.flush()
+    return counts
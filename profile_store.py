@@ -0,0 +1,307 @@
+"""
+Inkrementell gepflegter Profilspeicher je Konto.
+
+Statt die Aggregate eines Nutzerprofils bei jeder Abfrage aus der Historie neu
+zu berechnen, werden sie mit jeder verarbeiteten Transaktion in O(1)
+fortgeschrieben: laufender Mittelwert und Varianz (Welford), exponentiell
+abklingende Transaktionsfrequenz und je Konto ein begrenzter Space-Saving-Sketch
+der häufigsten Empfänger und Empfängerländer.
+
+Alle Werte liegen slot-basiert in zusammenhängenden NumPy-Arrays; ein Konto
+belegt eine Zeile. Snapshots werden als .npz-Datei geschrieben und geladen.
+"""
+import datetime
+import math
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+# Abklingzeit der Frequenz: ein Monat, damit der Wert "Transaktionen pro Monat" entspricht
+FREQUENCY_DECAY_SECONDS = 30 * 24 * 3600.0
+
+
+def epoch_seconds(timestamp: str) -> float:
+    """Wandelt einen ISO-Zeitstempel in Sekunden seit der Epoche um."""
+    try:
+        parsed = datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return math.nan
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+class _Interner:
+    """Bildet Zeichenketten auf fortlaufende Ganzzahlen ab."""
+
+    def __init__(self, values: Optional[List[str]] = None):
+        self.values: List[str] = list(values or [])
+        self.ids: Dict[str, int] = {value: i for i, value in enumerate(self.values)}
+
+    def intern(self, value: str) -> int:
+        index = self.ids.get(value)
+        if index is None:
+            index = len(self.values)
+            self.ids[value] = index
+            self.values.append(value)
+        return index
+
+
+def _sketch_update(ids: np.ndarray, counts: np.ndarray, item: int):
+    """Space-Saving-Update einer Sketch-Zeile mit fester Breite."""
+    matches = np.flatnonzero(ids == item)
+    if matches.size:
+        counts[matches[0]] += 1
+        return
+    empty = np.flatnonzero(ids < 0)
+    slot = empty[0] if empty.size else int(np.argmin(counts))
+    # Bei Verdrängung übernimmt der neue Eintrag die Zählung des alten (Überschätzungsschranke)
+    counts[slot] = (counts[slot] if not empty.size else 0) + 1
+    ids[slot] = item
+
+
+def _sketch_items(ids: np.ndarray, counts: np.ndarray, interner: _Interner) -> List[str]:
+    """Liefert die Einträge einer Sketch-Zeile absteigend nach Häufigkeit."""
+    order = np.argsort(-counts, kind="stable")
+    return [interner.values[ids[i]] for i in order if ids[i] >= 0]
+
+
+class ProfileStore:
+    """Slot-basierter Speicher der Profilaggregate aller Konten."""
+
+    # Arrays mit einer Zeile je Slot und ihr Wert für einen leeren Slot
+    _SLOT_ARRAYS = {
+        "_count": 0, "_mean": 0.0, "_m2": 0.0, "_frequency": 0.0, "_last_seen": np.nan,
+        "_receiver_ids": -1, "_receiver_counts": 0.0, "_country_ids": -1, "_country_counts": 0.0
+    }
+
+    def __init__(self, receiver_slots: int = 8, country_slots: int = 4, initial_capacity: int = 1024):
+        """
+        Args:
+            receiver_slots: Anzahl gemerkter Empfänger je Konto
+            country_slots: Anzahl gemerkter Empfängerländer je Konto
+            initial_capacity: Anfängliche Anzahl Slots (wächst bei Bedarf)
+        """
+        self.receiver_slots = receiver_slots
+        self.country_slots = country_slots
+        self._lock = threading.Lock()
+        self._accounts = _Interner()
+        self._receivers = _Interner()
+        self._countries = _Interner()
+        self._clock = -math.inf  # jüngster beobachteter Zeitstempel
+        self._allocate(initial_capacity)
+
+    def _allocate(self, capacity: int):
+        self._count = np.zeros(capacity, dtype=np.int64)
+        self._mean = np.zeros(capacity, dtype=np.float64)
+        self._m2 = np.zeros(capacity, dtype=np.float64)
+        self._frequency = np.zeros(capacity, dtype=np.float64)
+        self._last_seen = np.full(capacity, np.nan, dtype=np.float64)
+        self._receiver_ids = np.full((capacity, self.receiver_slots), -1, dtype=np.int32)
+        self._receiver_counts = np.zeros((capacity, self.receiver_slots), dtype=np.float32)
+        self._country_ids = np.full((capacity, self.country_slots), -1, dtype=np.int32)
+        self._country_counts = np.zeros((capacity, self.country_slots), dtype=np.float32)
+
+    def _grow(self):
+        """Verdoppelt die Anzahl Slots."""
+        old = {name: getattr(self, name) for name in self._SLOT_ARRAYS}
+        self._allocate(len(self._count) * 2)
+        for name, values in old.items():
+            getattr(self, name)[:len(values)] = values
+
+    def __len__(self):
+        return len(self._accounts.values)
+
+    def __contains__(self, account_id: str):
+        return account_id in self._accounts.ids
+
+    def update(self, transaction: Dict[str, Any]):
+        """Schreibt die Aggregate des Absenderkontos mit einer Transaktion fort (O(1))."""
+        amount = float(transaction["amount"])
+        timestamp = epoch_seconds(transaction.get("timestamp", ""))
+        receiver = transaction["receiver_account"]
+
+        with self._lock:
+            slot = self._accounts.intern(transaction["sender_account"])
+            if slot >= len(self._count):
+                self._grow()
+
+            # Laufender Mittelwert und Varianz (Welford)
+            self._count[slot] += 1
+            delta = amount - self._mean[slot]
+            self._mean[slot] += delta / self._count[slot]
+            self._m2[slot] += delta * (amount - self._mean[slot])
+
+            # Exponentiell abklingende Frequenz
+            if not math.isnan(timestamp):
+                last_seen = self._last_seen[slot]
+                if not math.isnan(last_seen) and timestamp > last_seen:
+                    self._frequency[slot] *= math.exp(-(timestamp - last_seen) / FREQUENCY_DECAY_SECONDS)
+                self._last_seen[slot] = timestamp if math.isnan(last_seen) else max(last_seen, timestamp)
+                self._clock = max(self._clock, timestamp)
+            self._frequency[slot] += 1.0
+
+            _sketch_update(self._receiver_ids[slot], self._receiver_counts[slot], self._receivers.intern(receiver))
+            _sketch_update(
+                self._country_ids[slot], self._country_counts[slot], self._countries.intern(receiver[:2].upper())
+            )
+
+    def get_profile(self, account_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Liefert die Profilaggregate eines Kontos.
+
+        Returns:
+            Ein Dictionary mit den Aggregaten oder None, wenn das Konto unbekannt ist
+        """
+        with self._lock:
+            slot = self._accounts.ids.get(account_id)
+            if slot is None:
+                return None
+
+            count = int(self._count[slot])
+            frequency = float(self._frequency[slot])
+            last_seen = self._last_seen[slot]
+            if not math.isnan(last_seen) and self._clock > last_seen:
+                frequency *= math.exp(-(self._clock - last_seen) / FREQUENCY_DECAY_SECONDS)
+
+            return {
+                "account_id": account_id,
+                "transaction_count": count,
+                "average_transaction_amount": round(float(self._mean[slot]), 2),
+                "amount_std": round(math.sqrt(self._m2[slot] / (count - 1)), 2) if count > 1 else 0.0,
+                "transaction_frequency": round(frequency, 2),
+                "typical_receivers": _sketch_items(
+                    self._receiver_ids[slot], self._receiver_counts[slot], self._receivers
+                ),
+                "typical_countries": _sketch_items(
+                    self._country_ids[slot], self._country_counts[slot], self._countries
+                )
+            }
+
+    def accounts(self) -> List[str]:
+        """Alle Konten mit Profilaggregaten."""
+        with self._lock:
+            return list(self._accounts.values)
+
+    def export_accounts(self, accounts: Iterable[str]) -> List[Dict[str, Any]]:
+        """
+        Liefert den vollständigen Zustand einzelner Konten, z.B. zur Übergabe an einen anderen Shard.
+
+        Sketch-Einträge werden als (Wert, Zählung) exportiert, da die Ganzzahl-IDs nur je Speicher gelten.
+        """
+        states = []
+        with self._lock:
+            for account in accounts:
+                slot = self._accounts.ids.get(account)
+                if slot is None:
+                    continue
+                states.append({
+                    "account": account,
+                    "count": int(self._count[slot]),
+                    "mean": float(self._mean[slot]),
+                    "m2": float(self._m2[slot]),
+                    "frequency": float(self._frequency[slot]),
+                    "last_seen": float(self._last_seen[slot]),
+                    "receivers": [
+                        (self._receivers.values[item], float(count))
+                        for item, count in zip(self._receiver_ids[slot], self._receiver_counts[slot]) if item >= 0
+                    ],
+                    "countries": [
+                        (self._countries.values[item], float(count))
+                        for item, count in zip(self._country_ids[slot], self._country_counts[slot]) if item >= 0
+                    ]
+                })
+        return states
+
+    def import_accounts(self, states: Iterable[Dict[str, Any]]):
+        """Übernimmt mit export_accounts() exportierte Konten; vorhandene Aggregate werden ersetzt."""
+        with self._lock:
+            for state in states:
+                slot = self._accounts.intern(state["account"])
+                while slot >= len(self._count):
+                    self._grow()
+                self._count[slot] = state["count"]
+                self._mean[slot] = state["mean"]
+                self._m2[slot] = state["m2"]
+                self._frequency[slot] = state["frequency"]
+                self._last_seen[slot] = state["last_seen"]
+                if not math.isnan(state["last_seen"]):
+                    self._clock = max(self._clock, state["last_seen"])
+                for ids, counts, interner, items in (
+                        (self._receiver_ids, self._receiver_counts, self._receivers, state["receivers"]),
+                        (self._country_ids, self._country_counts, self._countries, state["countries"])
+                ):
+                    ids[slot] = -1
+                    counts[slot] = 0
+                    for i, (value, count) in enumerate(items[:ids.shape[1]]):
+                        ids[slot, i] = interner.intern(value)
+                        counts[slot, i] = count
+
+    def remove_accounts(self, accounts: Iterable[str]):
+        """Entfernt Konten samt Aggregaten, z.B. nach der Übergabe an einen anderen Shard."""
+        with self._lock:
+            for account in accounts:
+                slot = self._accounts.ids.pop(account, None)
+                if slot is None:
+                    continue
+                # Den letzten Slot in die Lücke verschieben, damit die Slots dicht bleiben
+                last = len(self._accounts.values) - 1
+                moved = self._accounts.values.pop()
+                for name, empty in self._SLOT_ARRAYS.items():
+                    values = getattr(self, name)
+                    values[slot] = values[last]
+                    values[last] = empty
+                if slot != last:
+                    self._accounts.values[slot] = moved
+                    self._accounts.ids[moved] = slot
+
+    def snapshot(self, path: str):
+        """Schreibt den aktuellen Zustand als .npz-Datei."""
+        with self._lock:
+            size = len(self._accounts.values)
+            np.savez(
+                path,
+                receiver_slots=self.receiver_slots,
+                country_slots=self.country_slots,
+                clock=self._clock,
+                accounts=np.array(self._accounts.values, dtype=str),
+                receivers=np.array(self._receivers.values, dtype=str),
+                countries=np.array(self._countries.values, dtype=str),
+                count=self._count[:size],
+                mean=self._mean[:size],
+                m2=self._m2[:size],
+                frequency=self._frequency[:size],
+                last_seen=self._last_seen[:size],
+                receiver_ids=self._receiver_ids[:size],
+                receiver_counts=self._receiver_counts[:size],
+                country_ids=self._country_ids[:size],
+                country_counts=self._country_counts[:size]
+            )
+
+    @classmethod
+    def restore(cls, path: str) -> "ProfileStore":
+        """Lädt einen mit snapshot() geschriebenen Zustand."""
+        with np.load(path, allow_pickle=False) as data:
+            accounts = [str(value) for value in data["accounts"]]
+            store = cls(
+                receiver_slots=int(data["receiver_slots"]),
+                country_slots=int(data["country_slots"]),
+                initial_capacity=max(len(accounts), 1)
+            )
+            store._accounts = _Interner(accounts)
+            store._receivers = _Interner([str(value) for value in data["receivers"]])
+            store._countries = _Interner([str(value) for value in data["countries"]])
+            store._clock = float(data["clock"])
+            size = len(accounts)
+            store._count[:size] = data["count"]
+            store._mean[:size] = data["mean"]
+            store._m2[:size] = data["m2"]
+            store._frequency[:size] = data["frequency"]
+            store._last_seen[:size] = data["last_seen"]
+            store._receiver_ids[:size] = data["receiver_ids"]
+            store._receiver_counts[:size] = data["receiver_counts"]
+            store._country_ids[:size] = data["country_ids"]
+            store._country_counts[:size] = data["country_counts"]
+        return store
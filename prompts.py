@@ -0,0 +1,282 @@
+"""
+Prompt-Aufbau für die LLM-Stufen des Betrugserkennungssystems.
+
+Jeder Prompt besteht aus einem statischen Präfix (Anweisungen und
+Antwortformat der Stufe) und einem variablen Suffix (Transaktion und
+Vorbewertungen). Das Präfix ist für alle Transaktionen byteidentisch, damit
+anbieterseitiges Prompt-Caching greift; variable Inhalte stehen ausschließlich
+am Ende. Die Transaktion wird einmal kompakt serialisiert und von allen Stufen
+gemeinsam verwendet.
+"""
+import json
+from typing import Any, Dict, Optional
+
+from metrics import count_tokens
+
+
+PROMPT_STAGES = ("ml", "rule", "coordinator", "explanation", "decision")
+
+# Trennt das statische Präfix vom variablen Teil
+SECTION_SEPARATOR = "\n---\n"
+
+
+def compact_json(value: Any) -> str:
+    """Serialisiert value ohne Leerraum (Schlüsselreihenfolge bleibt erhalten)."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+ML_SCHEMA = {
+    "probability": 0.75,
+    "threshold": 0.5,
+    "is_fraud": True,
+    "features": {"amount_unusually_high": True, "new_receiver": True, "is_realtime": True, "unusual_time": False},
+    "model_version": "fraud-detection-v3.2"
+}
+RULE_SCHEMA = {"is_flagged": True, "rules_triggered": ["large_amount", "realtime_transfer"], "version": "rule-engine-v2.1"}
+DECISION_SCHEMA = {"decision": "approved", "confidence": 0.85, "reasoning": "Kurze Begründung"}
+
+RULE_LIST = (
+    "large_amount: Betrag > 5000 EUR\n"
+    "realtime_transfer: Echtzeit-Überweisung\n"
+    "unusual_time: zwischen 23:00 und 6:00 Uhr\n"
+    "new_receiver: neue Empfänger-Kontonummer\n"
+    "suspicious_description: ungewöhnliche Beschreibung\n"
+)
+
+STAGE_INSTRUCTIONS = {
+    "ml": (
+        "Bewerte die Transaktion am Ende mit ML-Methoden auf ihre Betrugswahrscheinlichkeit.\n"
+        f"Antworte nur mit JSON in diesem Format:\n{compact_json(ML_SCHEMA)}"
+    ),
+    "rule": (
+        "Prüfe die Transaktion am Ende gegen das Regelwerk:\n"
+        + RULE_LIST
+        + f"Antworte nur mit JSON in diesem Format:\n{compact_json(RULE_SCHEMA)}"
+    ),
+    "coordinator": (
+        "Wähle anhand der ML- und Regelbewertung am Ende den nächsten Schritt:\n"
+        "generate_explanation: Verdacht, keine Echtzeit-Überweisung\n"
+        "decision_agent: Verdacht bei Echtzeit-Überweisung\n"
+        "approve_transaction: kein Verdacht\n"
+        "Antworte nur mit einem der drei Befehle ohne weitere Erklärung."
+    ),
+    "explanation": (
+        "Erkläre dem Fraud-Manager klar und präzise, warum die Transaktion am Ende verdächtig erscheint.\n"
+        "Beziehe dich konkret auf die ML- und Regelbewertung und stelle Zusammenhänge her."
+    ),
+    "decision": (
+        "Triff eine automatische Entscheidung für die Echtzeit-Überweisung am Ende anhand der ML- und Regelbewertung.\n"
+        "decision ist \"approved\" oder \"declined\".\n"
+        f"Antworte nur mit JSON in diesem Format:\n{compact_json(DECISION_SCHEMA)}"
+    )
+}
+
+
+# Gebündelte Bewertung mehrerer Transaktionen in einem Prompt (siehe MicroBatcher)
+BATCH_INSTRUCTIONS = {
+    "ml": (
+        "Bewerte jede Transaktion der Liste am Ende mit ML-Methoden auf ihre Betrugswahrscheinlichkeit.\n"
+        "Antworte nur mit einem JSON-Array, je Transaktion ein Objekt in diesem Format:\n"
+        + compact_json(dict(transaction_id="t1", **ML_SCHEMA))
+    ),
+    "rule": (
+        "Prüfe jede Transaktion der Liste am Ende gegen das Regelwerk:\n"
+        + RULE_LIST
+        + "Antworte nur mit einem JSON-Array, je Transaktion ein Objekt in diesem Format:\n"
+        + compact_json(dict(transaction_id="t1", **RULE_SCHEMA))
+    )
+}
+
+
+def build_prompt(
+        stage: str,
+        transaction_json: Optional[str] = None,
+        ml_assessment_result: Optional[str] = None,
+        rule_assessment_result: Optional[str] = None
+) -> str:
+    """
+    Setzt den Prompt einer Stufe zusammen.
+
+    Args:
+        stage: Eine der PROMPT_STAGES
+        transaction_json: Die mit compact_json serialisierte Transaktion
+        ml_assessment_result: Die ML-Bewertung als kompaktes JSON
+        rule_assessment_result: Die Regelbewertung als kompaktes JSON
+
+    Returns:
+        Statisches Präfix der Stufe, gefolgt von den übergebenen variablen Abschnitten
+    """
+    sections = []
+    if transaction_json is not None:
+        sections.append(f"Transaktion: {transaction_json}")
+    if ml_assessment_result is not None:
+        sections.append(f"ML-Bewertung: {ml_assessment_result}")
+    if rule_assessment_result is not None:
+        sections.append(f"Regelbewertung: {rule_assessment_result}")
+    return STAGE_INSTRUCTIONS[stage] + SECTION_SEPARATOR + "\n".join(sections)
+
+
+# Rückfragen des Fraud-Managers; die Platzhalter füllt crewai beim kickoff(inputs=...)
+QUERY_TEMPLATE = (
+    "Beantworte die Frage des Fraud-Managers am Ende ausführlich.\n"
+    "Verwende deine Tools, um relevante Informationen aus der Datenbank abzurufen."
+    + SECTION_SEPARATOR
+    + "Transaktion: {transaction_id}\n"
+    "Absenderkonto: {sender_account}\n"
+    "Empfängerkonto: {receiver_account}\n"
+    "Frage: {question}"
+)
+
+
+def render_inputs(template: str, inputs: Dict[str, Any]) -> str:
+    """Setzt die Platzhalter {name} eines Task-Templates ein (wie crewai beim kickoff)."""
+    for name, value in inputs.items():
+        template = template.replace("{" + name + "}", str(value))
+    return template
+
+
+# Leitet im gebündelten Prompt die Liste der Transaktionen ein
+BATCH_MARKER = "Transaktionen:\n"
+
+
+def build_batch_prompt(stage: str, transaction_jsons) -> str:
+    """Prompt für die gebündelte Bewertung; eine kompakt serialisierte Transaktion je Zeile."""
+    return BATCH_INSTRUCTIONS[stage] + SECTION_SEPARATOR + BATCH_MARKER + "\n".join(transaction_jsons)
+
+
+def build_retry_prompt(prompt: str, reason: str) -> str:
+    """Hängt an einen Prompt den Hinweis auf eine ungültige Antwort an (das Präfix bleibt unverändert)."""
+    return (
+        f"{prompt}\nDeine vorige Antwort war ungültig ({reason}). "
+        "Antworte nur mit dem JSON-Objekt im geforderten Format."
+    )
+
+
+# Bisheriger Aufbau (Transaktion eingerückt mitten im Prompt), nur für token_report
+_LEGACY_TEMPLATES = {
+    "ml": """
+            Bewerte die folgende Transaktion mit ML-Methoden:
+            {transaction}
+
+            Gib deine Antwort im folgenden Format zurück:
+            {{
+                "probability": 0.75,
+                "threshold": 0.5,
+                "is_fraud": true,
+                "features": {{
+                    "amount_unusually_high": true,
+                    "new_receiver": true,
+                    "is_realtime": true,
+                    "unusual_time": false
+                }},
+                "model_version": "fraud-detection-v3.2"
+            }}
+            """,
+    "rule": """
+            Prüfe die folgende Transaktion gegen das Regelwerk:
+            {transaction}
+
+            Prüfe folgende Regeln:
+            1. Betrag > 5000 EUR -> "large_amount"
+            2. Echtzeit-Überweisung -> "realtime_transfer"
+            3. Transaktion zwischen 23:00 und 6:00 Uhr -> "unusual_time"
+            4. Neue Empfänger-Kontonummer -> "new_receiver"
+            5. Ungewöhnliche Beschreibung -> "suspicious_description"
+
+            Gib deine Antwort im folgenden Format zurück:
+            {{
+                "is_flagged": true,
+                "rules_triggered": ["large_amount", "realtime_transfer"],
+                "version": "rule-engine-v2.1"
+            }}
+            """,
+    "coordinator": """
+            Koordiniere den weiteren Prozessverlauf basierend auf den Bewertungen.
+            Verwende die Ergebnisse der ML-Bewertung und regelbasierten Bewertung, um zu entscheiden,
+            welcher der folgenden Schritte als nächstes durchgeführt werden soll:
+
+            1. "generate_explanation" - Bei Verdacht, aber nicht bei Echtzeit-Überweisungen
+            2. "decision_agent" - Bei Echtzeit-Überweisungen und Verdacht
+            3. "approve_transaction" - Bei keinem Verdacht
+
+            Antworte nur mit einem der drei Befehle ohne weitere Erklärung.
+
+            Dazu solltest du auf die Ergebnisse der vorherigen Bewertungen zugreifen:
+            - ml_assessment_result: Das Ergebnis der ML-Bewertung
+            - rule_assessment_result: Das Ergebnis der regelbasierten Bewertung
+            """,
+    "explanation": """
+            Erkläre, warum die folgende Transaktion verdächtig erscheint:
+            {transaction}
+
+            Nutze dazu die Ergebnisse der ML-Bewertung und regelbasierten Bewertung:
+            - ml_assessment_result: Das Ergebnis der ML-Bewertung
+            - rule_assessment_result: Das Ergebnis der regelbasierten Bewertung
+
+            Formuliere eine klare, präzise und verständliche Erklärung für den Fraud-Manager.
+            Beziehe dich dabei konkret auf die Bewertungsergebnisse und stelle Zusammenhänge her.
+            """,
+    "decision": """
+            Treffe eine automatische Entscheidung für diese Echtzeit-Überweisung:
+            {transaction}
+
+            Nutze dazu die Ergebnisse der ML-Bewertung und regelbasierten Bewertung:
+            - ml_assessment_result: Das Ergebnis der ML-Bewertung
+            - rule_assessment_result: Das Ergebnis der regelbasierten Bewertung
+
+            Gib deine Antwort im folgenden Format zurück:
+            {{
+                "decision": "approved",
+                "confidence": 0.85,
+                "reasoning": "Kurze Begründung deiner Entscheidung"
+            }}
+
+            Für decision darfst du nur "approved" oder "declined" verwenden.
+            """
+}
+
+# Stufen, deren Prompt die Vorbewertungen enthält (bisher zusätzlich als Task-Kontext übergeben)
+_CONTEXT_STAGES = ("coordinator", "explanation", "decision")
+
+
+def token_report(
+        transaction: Dict[str, Any],
+        ml_assessment: Optional[Dict[str, Any]] = None,
+        rule_assessment: Optional[Dict[str, Any]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Vergleicht die Tokenzahl je Stufe zwischen bisherigem und kompaktem Prompt-Aufbau.
+
+    Beim bisherigen Aufbau werden die Vorbewertungen als eingerücktes JSON mitgezählt,
+    wie sie als Task-Kontext an das LLM gingen.
+
+    Returns:
+        Je Stufe und insgesamt: {"before": ..., "after": ..., "saved": Anteil}
+    """
+    ml_assessment = ml_assessment or {}
+    rule_assessment = rule_assessment or {}
+    transaction_json = compact_json(transaction)
+    report = {}
+    for stage in PROMPT_STAGES:
+        legacy = _LEGACY_TEMPLATES[stage].format(transaction=json.dumps(transaction, indent=2))
+        with_context = stage in _CONTEXT_STAGES
+        if with_context:
+            legacy += json.dumps(
+                {"ml_assessment_result": json.dumps(ml_assessment), "rule_assessment_result": json.dumps(rule_assessment)},
+                indent=2
+            )
+        compact = build_prompt(
+            stage,
+            transaction_json if stage != "coordinator" else None,
+            compact_json(ml_assessment) if with_context else None,
+            compact_json(rule_assessment) if with_context else None
+        )
+        report[stage] = {"before": count_tokens(legacy), "after": count_tokens(compact)}
+
+    report["total"] = {
+        "before": sum(entry["before"] for entry in report.values()),
+        "after": sum(entry["after"] for entry in report.values())
+    }
+    for entry in report.values():
+        entry["saved"] = round(1.0 - entry["after"] / entry["before"], 3) if entry["before"] else 0.0
+    return report
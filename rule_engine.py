@@ -0,0 +1,210 @@
+"""
+Native Regel-Engine für die regelbasierte Betrugsbewertung.
+
+Die Regeln werden deklarativ beschrieben, einmalig in vektorisierte Prüfungen
+übersetzt und anschließend spaltenweise über einen ganzen Stapel von
+Transaktionen ausgewertet. Das Ergebnis entspricht exakt dem Format, das
+bisher der rule_assessment_agent geliefert hat.
+"""
+import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+RULE_ENGINE_VERSION = "rule-engine-v3.1-native"
+
+# Deklaratives Regelwerk (entspricht den bisherigen Regeln im Prompt)
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {"name": "large_amount", "field": "amount", "op": "gt", "value": 5000.0},
+    {"name": "realtime_transfer", "field": "is_realtime", "op": "is_true"},
+    {"name": "unusual_time", "field": "minute_of_day", "op": "time_window", "value": ("23:00", "06:00")},
+    {"name": "new_receiver", "field": "receiver_known", "op": "is_false"},
+    {
+        "name": "suspicious_description",
+        "field": "description",
+        "op": "contains_any",
+        "value": [
+            "dringend", "sofort", "eilig", "gewinn", "lotterie", "erbschaft",
+            "bitcoin", "krypto", "gutschein", "geschenkkarte", "inkasso",
+            "urgent", "lottery", "crypto", "gift card"
+        ]
+    },
+    # Serien über die Zeitfenster der VelocityEngine (zählen die aktuelle Transaktion mit)
+    {"name": "burst_1m", "field": "count_1m", "op": "ge", "value": 5},
+    {"name": "receiver_fanout_1h", "field": "distinct_receivers_1h", "op": "ge", "value": 5},
+    {"name": "high_volume_24h", "field": "sum_24h", "op": "gt", "value": 20000.0}
+]
+
+# Regeln, die beim deterministischen Routing nicht als Verdacht zählen
+ROUTING_IGNORED_RULES = ("realtime_transfer",)
+
+# Spalten aus den Fensterwerten der VelocityEngine; ohne Fensterwerte sind sie 0
+VELOCITY_COLUMNS = ["count_1m", "distinct_receivers_1h", "sum_24h"]
+
+
+def minute_of_day(timestamp: str) -> int:
+    """Liefert die Uhrzeit eines ISO-Zeitstempels als Minute des Tages."""
+    try:
+        parsed = datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        return parsed.hour * 60 + parsed.minute
+    except (AttributeError, ValueError):
+        return -1
+
+
+def _parse_clock(value: str) -> int:
+    """Wandelt eine Uhrzeit im Format HH:MM in die Minute des Tages um."""
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _compile_rule(rule: Dict[str, Any]) -> Callable[[Dict[str, np.ndarray]], np.ndarray]:
+    """Übersetzt eine deklarative Regel in eine vektorisierte Prüffunktion."""
+    field = rule["field"]
+    op = rule["op"]
+    value = rule.get("value")
+
+    if op == "gt":
+        return lambda columns: columns[field] > value
+    if op == "ge":
+        return lambda columns: columns[field] >= value
+    if op == "lt":
+        return lambda columns: columns[field] < value
+    if op == "le":
+        return lambda columns: columns[field] <= value
+    if op == "eq":
+        return lambda columns: columns[field] == value
+    if op == "is_true":
+        return lambda columns: columns[field].astype(bool)
+    if op == "is_false":
+        return lambda columns: ~columns[field].astype(bool)
+    if op == "time_window":
+        start, end = _parse_clock(value[0]), _parse_clock(value[1])
+
+        def check_window(columns):
+            minutes = columns[field]
+            valid = minutes >= 0
+            if start <= end:
+                return valid & (minutes >= start) & (minutes < end)
+            # Zeitfenster über Mitternacht
+            return valid & ((minutes >= start) | (minutes < end))
+        return check_window
+    if op == "contains_any":
+        keywords = [keyword.lower() for keyword in value]
+
+        def check_keywords(columns):
+            texts = columns[field]
+            mask = np.zeros(len(texts), dtype=bool)
+            for keyword in keywords:
+                mask |= np.char.find(texts, keyword) >= 0
+            return mask
+        return check_keywords
+
+    raise ValueError(f"Unbekannter Regeloperator: {op}")
+
+
+class RuleEngine:
+    """Kompilierte, vektorisierte Auswertung des Regelwerks."""
+
+    def __init__(
+            self,
+            rules: Optional[Sequence[Dict[str, Any]]] = None,
+            known_receivers: Optional[Callable[[str], Iterable[str]]] = None,
+            version: str = RULE_ENGINE_VERSION
+    ):
+        """
+        Args:
+            rules: Deklarative Regeldefinitionen (Standard: DEFAULT_RULES)
+            known_receivers: Liefert die bekannten Empfänger eines Absenderkontos
+            version: Versionskennung, die in jedem Ergebnis zurückgegeben wird
+        """
+        self.rules = list(rules if rules is not None else DEFAULT_RULES)
+        self.rule_names = [rule["name"] for rule in self.rules]
+        self.known_receivers = known_receivers
+        self.version = version
+        self._checks = [_compile_rule(rule) for rule in self.rules]
+
+    def extract_columns(
+            self,
+            transactions: Sequence[Dict[str, Any]],
+            velocities: Optional[Sequence[Dict[str, float]]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Überführt einen Stapel Transaktionen in spaltenweise NumPy-Arrays.
+
+        Args:
+            transactions: Die Transaktionen
+            velocities: Optional die Fensterwerte der VelocityEngine je Transaktion
+        """
+        receivers_by_sender: Dict[str, set] = {}
+        receiver_known = np.zeros(len(transactions), dtype=bool)
+        for i, transaction in enumerate(transactions):
+            sender = transaction["sender_account"]
+            if sender not in receivers_by_sender:
+                receivers_by_sender[sender] = (
+                    set(self.known_receivers(sender)) if self.known_receivers else set()
+                )
+            receiver_known[i] = transaction["receiver_account"] in receivers_by_sender[sender]
+
+        columns = {
+            name: np.fromiter(
+                (float(v.get(name) or 0.0) for v in velocities), dtype=np.float64, count=len(transactions)
+            ) if velocities is not None else np.zeros(len(transactions), dtype=np.float64)
+            for name in VELOCITY_COLUMNS
+        }
+        columns.update({
+            "amount": np.fromiter(
+                (float(t["amount"]) for t in transactions), dtype=np.float64, count=len(transactions)
+            ),
+            "is_realtime": np.fromiter(
+                (bool(t.get("is_realtime", False)) for t in transactions), dtype=bool, count=len(transactions)
+            ),
+            "minute_of_day": np.fromiter(
+                (minute_of_day(t.get("timestamp", "")) for t in transactions), dtype=np.int32,
+                count=len(transactions)
+            ),
+            "receiver_known": receiver_known,
+            "description": np.array(
+                [(t.get("description") or "").lower() for t in transactions], dtype=str
+            )
+        })
+        return columns
+
+    def evaluate_matrix(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """Wertet alle Regeln aus und liefert eine Matrix (Regeln x Transaktionen)."""
+        return np.vstack([check(columns) for check in self._checks]) if self._checks else np.zeros(
+            (0, len(columns["amount"])), dtype=bool
+        )
+
+    def evaluate_batch(
+            self,
+            transactions: Sequence[Dict[str, Any]],
+            velocities: Optional[Sequence[Dict[str, float]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Prüft einen Stapel von Transaktionen gegen das Regelwerk.
+
+        Args:
+            transactions: Die zu prüfenden Transaktionen
+            velocities: Optional die Fensterwerte der VelocityEngine je Transaktion
+
+        Returns:
+            Eine Liste von Regelbewertungen in der Reihenfolge der Eingabe
+        """
+        if not transactions:
+            return []
+
+        hits = self.evaluate_matrix(self.extract_columns(transactions, velocities))
+        results = []
+        for column in hits.T:
+            triggered = [name for name, hit in zip(self.rule_names, column) if hit]
+            results.append({
+                "is_flagged": bool(triggered),
+                "rules_triggered": triggered,
+                "version": self.version
+            })
+        return results
+
+    def evaluate(self, transaction: Dict[str, Any], velocity: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """Prüft eine einzelne Transaktion gegen das Regelwerk."""
+        return self.evaluate_batch([transaction], None if velocity is None else [velocity])[0]
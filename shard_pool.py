@@ -0,0 +1,432 @@
+"""
+Mehrprozess-Betrieb mit nach Absenderkonto partitionierten Workern.
+
+Jeder Worker-Prozess besitzt ein eigenes FraudDetectionSystem und damit den
+gesamten kontobezogenen Zustand (Historie, Profilaggregate, Caches) seiner
+Konten; zwischen den Prozessen wird nichts geteilt. Konsistentes Hashing auf
+sender_account bestimmt den Shard einer Transaktion, sodass alle Transaktionen
+eines Kontos im selben Prozess landen. Der Dispatcher schickt Stapel je Shard
+über eine Queue, ein Sammel-Thread verteilt die Antworten.
+
+Beim Hinzufügen eines Workers wird der Dispatcher angehalten, bis alle
+offenen Stapel beantwortet sind; danach geben die bisherigen Worker Historie
+und Profile der Konten, die nun dem neuen Shard gehören, an diesen ab und
+verwerfen sie, sobald der neue Shard sie übernommen hat. Bis dahin bleibt
+der alte Ring gültig; scheitert der Umzug vorher, wird der neue Worker
+wieder beendet und die bisherigen Worker behalten ihre Konten. Dank
+konsistentem Hashing zieht dabei nur etwa 1/n der Konten um.
+"""
+import bisect
+import hashlib
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Konsistentes Hashing mit virtuellen Knoten."""
+
+    def __init__(self, nodes: Iterable[int] = (), replicas: int = 64):
+        """
+        Args:
+            nodes: Anfängliche Knoten (Shard-Nummern)
+            replicas: Virtuelle Knoten je Shard; mehr glättet die Verteilung
+        """
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: List[int] = []
+        self._nodes: List[int] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[int]:
+        return list(self._nodes)
+
+    def add(self, node: int):
+        for replica in range(self.replicas):
+            point = _hash(f"{node}:{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+        self._nodes.append(node)
+
+    def remove(self, node: int):
+        keep = [i for i, owner in enumerate(self._owners) if owner != node]
+        self._points = [self._points[i] for i in keep]
+        self._owners = [self._owners[i] for i in keep]
+        self._nodes.remove(node)
+
+    def node_for(self, key: str) -> int:
+        """Liefert den Shard, dem key gehört."""
+        if not self._points:
+            raise LookupError("Der Hash-Ring enthält keine Knoten")
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+def _worker_main(shard: int, system_factory, requests, responses):
+    """Hauptschleife eines Worker-Prozesses."""
+    system = system_factory(shard)
+    try:
+        while True:
+            message = requests.get()
+            kind = message[0]
+            if kind == "process":
+                _, call_id, items, max_concurrency = message
+                responses.put(("results", shard, call_id, _process_items(system, items, max_concurrency)))
+            elif kind == "export":
+                # Nur Konten, die nach dem neuen Ring dem hinzukommenden Shard gehören
+                _, rebalance_id, nodes, replicas, target = message
+                ring = HashRing(nodes, replicas)
+                state = system.export_accounts(lambda account: ring.node_for(account) == target)
+                responses.put(("control", shard, rebalance_id, state))
+            elif kind == "release":
+                system.remove_accounts(message[2])
+                responses.put(("control", shard, message[1], None))
+            elif kind == "import":
+                system.import_accounts(message[2])
+                responses.put(("control", shard, message[1], None))
+            else:
+                return
+    finally:
+        system.close()
+        # Der Worker besitzt alles, was system_factory erzeugt hat
+        if getattr(system, "audit_log", None) is not None:
+            system.audit_log.close()
+
+
+def _process_items(system, items, max_concurrency):
+    """Bewertet einen Stapel und liefert (Sequenznummer, Ergebnis ohne "transaction")."""
+    answered = []
+    try:
+        # Die Sequenznummer ist die Markierung; so bleibt auch ein mehrfach enthaltenes Dictionary eindeutig
+        for sequence, result in system.process_tagged(items, max_concurrency=max_concurrency, batch_size=len(items)):
+            # Die Transaktion kennt der Dispatcher bereits; sie wird nicht zurückgeschickt. Kopie statt pop(),
+            # da dasselbe Dictionary noch im Audit-Log auf das Schreiben wartet
+            answered.append((sequence, {key: value for key, value in result.items() if key != "transaction"}))
+    except Exception as exc:
+        done = {sequence for sequence, _ in answered}
+        answered.extend(
+            (sequence, {"error": f"Verarbeitung fehlgeschlagen: {exc}"})
+            for sequence, _ in items if sequence not in done
+        )
+    return answered
+
+
+class ShardedWorkerPool:
+    """
+    Verteilt Transaktionen per konsistentem Hashing auf Worker-Prozesse.
+
+    Bietet dieselbe process_transactions()-Schnittstelle wie FraudDetectionSystem und kann
+    daher direkt an run_pipeline() übergeben werden.
+    """
+
+    def __init__(
+            self,
+            system_factory: Callable[[int], Any],
+            workers: Optional[int] = None,
+            replicas: int = 64,
+            max_inflight: int = 4096,
+            start_method: str = "spawn",
+            control_timeout: float = 300.0
+    ):
+        """
+        Args:
+            system_factory: Erzeugt im Worker-Prozess das System für eine Shard-Nummer; muss picklebar sein
+                (Funktion auf Modulebene oder functools.partial davon)
+            workers: Anzahl Worker-Prozesse (Standard: Anzahl CPU-Kerne)
+            replicas: Virtuelle Knoten je Worker im Hash-Ring
+            max_inflight: Maximale Anzahl gleichzeitig offener Transaktionen je Aufruf (Backpressure)
+            start_method: Startmethode der Prozesse; "spawn", da Worker auch bei laufendem Sammel-Thread
+                gestartet werden
+            control_timeout: Maximale Wartezeit in Sekunden auf Export, Import und Freigabe beim Rebalancing
+        """
+        self.system_factory = system_factory
+        self.max_inflight = max_inflight
+        self.control_timeout = control_timeout
+        self._context = multiprocessing.get_context(start_method)
+        self._responses = self._context.Queue()
+        self._ring = HashRing(replicas=replicas)
+        self._workers: Dict[int, Any] = {}
+        self._requests: Dict[int, Any] = {}
+        self._control: Dict[int, "queue.Queue"] = {}
+        self._calls: Dict[int, "queue.Queue"] = {}
+        self._call_ids = itertools.count()
+        self._next_shard = 0
+
+        # Dispatch und Rebalancing schließen sich aus; offene Transaktionen werden gezählt
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._inflight = 0
+        self._rebalancing = False
+        self._counters = {
+            "dispatched": 0, "batches": 0, "rebalances": 0, "accounts_moved": 0,
+            "rebalances_failed": 0, "releases_unconfirmed": 0
+        }
+        self._dispatched_per_shard: Dict[int, int] = {}
+
+        for _ in range(workers or multiprocessing.cpu_count()):
+            self._ring.add(self._start_worker())
+        self._collector = threading.Thread(target=self._collect, name="shard-collector", daemon=True)
+        self._collector.start()
+
+    def _start_worker(self) -> int:
+        shard = self._next_shard
+        self._next_shard += 1
+        requests = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(shard, self.system_factory, requests, self._responses),
+            name=f"fraud-shard-{shard}",
+            daemon=True
+        )
+        process.start()
+        self._workers[shard] = process
+        self._requests[shard] = requests
+        self._control[shard] = queue.Queue()
+        self._dispatched_per_shard[shard] = 0
+        return shard
+
+    def _collect(self):
+        """Verteilt Antworten der Worker an die wartenden Aufrufe bzw. an das Rebalancing."""
+        while True:
+            message = self._responses.get()
+            kind, shard, call_id, payload = message
+            if kind == "stop":
+                return
+            if kind == "control":
+                control = self._control.get(shard)
+                if control is not None:
+                    # Antworten eines zurückgerollten Workers werden verworfen
+                    control.put((call_id, payload))
+                continue
+            answers = self._calls.get(call_id)
+            if answers is not None:
+                # Antworten für abgebrochene Aufrufe (verworfener Generator) werden verworfen
+                answers.put(payload)
+            with self._idle:
+                self._inflight -= len(payload)
+                if not self._inflight:
+                    self._idle.notify_all()
+
+    def shard_for(self, account: str) -> int:
+        """Liefert den Shard, dem ein Absenderkonto aktuell gehört."""
+        with self._lock:
+            return self._ring.node_for(account)
+
+    def _dispatch(self, call_id: int, transactions: List[Any], sequences: List[int], max_concurrency: int):
+        """Partitioniert einen Stapel nach Shard und schickt je Shard eine Nachricht."""
+        with self._idle:
+            while self._rebalancing:
+                self._idle.wait()
+            batches: Dict[int, list] = {}
+            for sequence, transaction in zip(sequences, transactions):
+                shard = self._ring.node_for(transaction["sender_account"])
+                batches.setdefault(shard, []).append((sequence, transaction))
+            for shard, items in batches.items():
+                self._requests[shard].put(("process", call_id, items, max_concurrency))
+                self._dispatched_per_shard[shard] += len(items)
+            self._inflight += len(transactions)
+            self._counters["dispatched"] += len(transactions)
+            self._counters["batches"] += len(batches)
+
+    def _receive(self, answers: "queue.Queue", originals: Dict[int, Any], block: bool) -> Iterator[tuple]:
+        """Liefert (Markierung, Ergebnis mit der ursprünglichen Transaktion) einer Antwort."""
+        while True:
+            try:
+                payload = answers.get(timeout=1.0) if block else answers.get_nowait()
+            except queue.Empty:
+                if not block:
+                    return
+                dead = [shard for shard, process in self._workers.items() if not process.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Worker-Prozess beendet: Shard {', '.join(map(str, dead))}")
+                continue
+            for sequence, result in payload:
+                tag, transaction = originals.pop(sequence)
+                yield tag, {"transaction": transaction, **result}
+            if block:
+                return
+
+    def process_transactions(
+            self,
+            transactions: Iterable[Any],
+            max_concurrency: int = 8,
+            batch_size: int = 256
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Verarbeitet Transaktionen verteilt auf die Worker.
+
+        Args:
+            transactions: Beliebiges Iterable von Transaktionen
+            max_concurrency: Gleichzeitig verarbeitete Transaktionen je Worker
+            batch_size: Anzahl Transaktionen, die gemeinsam partitioniert und verschickt werden
+
+        Yields:
+            Ein Ergebnis-Dictionary je Transaktion in Fertigstellungsreihenfolge
+        """
+        items = ((None, transaction) for transaction in transactions)
+        for _, result in self.process_tagged(items, max_concurrency, batch_size):
+            yield result
+
+    def process_tagged(
+            self,
+            items: Iterable[tuple],
+            max_concurrency: int = 8,
+            batch_size: int = 256,
+            admit: Optional[Callable[[], bool]] = None
+    ) -> Iterator[tuple]:
+        """
+        Wie process_transactions, mit einer Markierung je Transaktion (wie FraudDetectionSystem.process_tagged).
+
+        Args:
+            items: Paare (Markierung, Transaktion)
+            max_concurrency: Gleichzeitig verarbeitete Transaktionen je Worker
+            batch_size: Anzahl Transaktionen, die gemeinsam partitioniert und verschickt werden
+            admit: Optional; liefert False, solange keine weitere Eingabe gelesen werden soll
+
+        Yields:
+            Paare (Markierung, Ergebnis-Dictionary) in Fertigstellungsreihenfolge
+        """
+        call_id = next(self._call_ids)
+        answers: "queue.Queue" = queue.Queue()
+        self._calls[call_id] = answers
+        originals: Dict[int, Any] = {}
+        sequences = itertools.count()
+        chunk: List[Any] = []
+
+        def send():
+            numbers = [next(sequences) for _ in chunk]
+            originals.update(zip(numbers, chunk))
+            self._dispatch(call_id, [transaction for _, transaction in chunk], numbers, max_concurrency)
+            chunk.clear()
+
+        try:
+            for item in items:
+                chunk.append(item)
+                if len(chunk) < batch_size:
+                    continue
+                send()
+                yield from self._receive(answers, originals, block=False)
+                # Vor dem nächsten Stapel: Backpressure und ggf. volles Fenster des Aufrufers
+                while len(originals) >= self.max_inflight or (admit is not None and not admit()):
+                    if not originals:
+                        raise RuntimeError("admit() hält die Eingabe an, obwohl keine Transaktion mehr offen ist")
+                    yield from self._receive(answers, originals, block=True)
+            if chunk:
+                send()
+            while originals:
+                yield from self._receive(answers, originals, block=True)
+        finally:
+            del self._calls[call_id]
+
+    def _await_control(self, shard: int, rebalance_id: int, deadline: float) -> Any:
+        """
+        Wartet auf die Antwort eines Workers zu einem Rebalancing.
+
+        Verspätete Antworten früherer, abgebrochener Rebalancings werden übersprungen.
+
+        Raises:
+            TimeoutError: Wenn bis deadline (time.monotonic()) keine Antwort eintrifft
+        """
+        while True:
+            try:
+                answer_id, payload = self._control[shard].get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError(f"Keine Antwort von Shard {shard} beim Rebalancing") from None
+            if answer_id == rebalance_id:
+                return payload
+
+    def _stop_worker(self, shard: int):
+        """Beendet einen Worker, der nie in den Ring aufgenommen wurde (Rollback von add_worker)."""
+        self._requests[shard].put(("stop",))
+        process = self._workers.pop(shard)
+        process.join(timeout=self.control_timeout)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+        del self._requests[shard]
+        del self._control[shard]
+        del self._dispatched_per_shard[shard]
+
+    def add_worker(self) -> int:
+        """
+        Startet einen weiteren Worker und zieht die Konten um, die ihm nach dem Hash-Ring gehören.
+
+        Blockiert neue Stapel, bis alle offenen beantwortet und die Konten übergeben sind. Der alte Ring
+        gilt, bis der neue Worker den Import bestätigt hat; bis dahin ändert der Umzug an den bisherigen
+        Workern nichts (Export liest nur). Schlägt Export oder Import fehl, wird der neue Worker beendet.
+        Danach geben die bisherigen Worker die Konten frei; die Freigabe steht in ihrer Queue vor jeder
+        späteren Nachricht und wird daher auch ausgeführt, wenn ihre Bestätigung ausbleibt.
+
+        Returns:
+            Die Shard-Nummer des neuen Workers
+
+        Raises:
+            TimeoutError: Wenn Export oder Import nicht innerhalb von control_timeout bestätigt werden;
+                Ring und Konten sind dann unverändert
+        """
+        with self._idle:
+            self._rebalancing = True
+            try:
+                while self._inflight:
+                    self._idle.wait()
+                rebalance_id = next(self._call_ids)
+                previous = self._ring.nodes
+                shard = self._start_worker()
+                try:
+                    deadline = time.monotonic() + self.control_timeout
+                    nodes = previous + [shard]
+                    for other in previous:
+                        self._requests[other].put(("export", rebalance_id, nodes, self._ring.replicas, shard))
+                    exported = [self._await_control(other, rebalance_id, deadline) for other in previous]
+                    # Teilzustände der bisherigen Worker je Schlüssel (accounts, history, ...) zusammenführen
+                    state = {key: [item for part in exported for item in part[key]] for key in exported[0]}
+                    self._requests[shard].put(("import", rebalance_id, state))
+                    self._await_control(shard, rebalance_id, time.monotonic() + self.control_timeout)
+                except BaseException:
+                    self._stop_worker(shard)
+                    self._counters["rebalances_failed"] += 1
+                    raise
+                # Ab hier gehören die Konten dem neuen Worker
+                self._ring.add(shard)
+                self._counters["rebalances"] += 1
+                self._counters["accounts_moved"] += len(set(state["accounts"]))
+                for other, part in zip(previous, exported):
+                    self._requests[other].put(("release", rebalance_id, part["accounts"]))
+                deadline = time.monotonic() + self.control_timeout
+                for other in previous:
+                    try:
+                        self._await_control(other, rebalance_id, deadline)
+                    except TimeoutError:
+                        self._counters["releases_unconfirmed"] += 1
+            finally:
+                self._rebalancing = False
+                self._idle.notify_all()
+        return shard
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                self._counters,
+                workers=len(self._workers),
+                inflight=self._inflight,
+                dispatched_per_shard=dict(self._dispatched_per_shard)
+            )
+
+    def close(self):
+        """Beendet alle Worker nach Abarbeitung ihrer Queues sowie den Sammel-Thread."""
+        for requests in self._requests.values():
+            requests.put(("stop",))
+        for process in self._workers.values():
+            process.join()
+        self._responses.put(("stop", None, None, None))
+        self._collector.join()
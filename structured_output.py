@@ -0,0 +1,230 @@
+"""
+Auswertung strukturierter LLM-Antworten.
+
+Ein toleranter Scanner findet JSON-Objekte in einem einzigen Durchlauf über
+die Antwort, auch wenn sie in Fließtext oder Codeblöcke eingebettet,
+abgeschnitten oder mit kleinen Syntaxfehlern (nachgestellte Kommas,
+Python-Literale, einfache Anführungszeichen) versehen sind. Jedes gefundene
+Objekt wird gegen das Schema der Stufe geprüft und normalisiert; das erste
+gültige Objekt gewinnt.
+"""
+import json
+import re
+from typing import Any, Dict, Iterator, Tuple
+
+
+class StructuredOutputError(ValueError):
+    """Die Antwort enthält kein gültiges Objekt für das Schema der Stufe."""
+
+
+def iter_json_objects(text: str) -> Iterator[str]:
+    """
+    Liefert alle Objekte oberster Ebene ({...}) aus text in einem Durchlauf.
+
+    Zeichenketten werden beachtet, sodass Klammern in Texten nicht zählen. Ein am Ende
+    abgeschnittenes Objekt wird mit den fehlenden Anführungszeichen und Klammern geschlossen.
+    """
+    depth = 0
+    start = -1
+    quote = None
+    escaped = False
+    closers = []
+    for i, char in enumerate(text):
+        if quote is not None:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+            continue
+        if depth and char in "\"'":
+            quote = char
+        elif char in "{[":
+            if depth == 0:
+                if char == "[":
+                    continue
+                start = i
+            depth += 1
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]" and depth:
+            depth -= 1
+            closers.pop()
+            if depth == 0:
+                yield text[start:i + 1]
+
+    if depth:
+        yield text[start:] + (quote or "") + "".join(reversed(closers))
+
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_PYTHON_LITERAL = re.compile(r"\b(True|False|None)\b")
+
+
+def loads_tolerant(candidate: str) -> Any:
+    """
+    Parst candidate als JSON und korrigiert bei Bedarf häufige Fehler von LLM-Ausgaben.
+
+    Raises:
+        ValueError: Wenn auch die korrigierte Fassung kein gültiges JSON ist
+    """
+    try:
+        return json.loads(candidate)
+    except ValueError:
+        pass
+
+    repaired = _TRAILING_COMMA.sub(r"\1", candidate)
+    repaired = _PYTHON_LITERAL.sub(lambda match: _PYTHON_LITERALS[match.group(1)], repaired)
+    if '"' not in repaired:
+        repaired = repaired.replace("'", '"')
+    return json.loads(repaired)
+
+
+def _as_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    raise ValueError(f"kein Wahrheitswert: {value!r}")
+
+
+def _as_number(value: Any) -> float:
+    if isinstance(value, bool):
+        raise ValueError(f"keine Zahl: {value!r}")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return float(value.strip().rstrip("%")) / (100.0 if value.strip().endswith("%") else 1.0)
+    raise ValueError(f"keine Zahl: {value!r}")
+
+
+def _as_probability(value: Any) -> float:
+    number = _as_number(value)
+    if not 0.0 <= number <= 1.0:
+        raise ValueError(f"nicht zwischen 0 und 1: {number}")
+    return number
+
+
+def _as_text(value: Any) -> str:
+    if not isinstance(value, str):
+        raise ValueError(f"kein Text: {value!r}")
+    return value
+
+
+def _as_text_list(value: Any) -> list:
+    if isinstance(value, str):
+        value = [value] if value else []
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"keine Liste von Texten: {value!r}")
+    return value
+
+
+def _as_decision(value: Any) -> str:
+    decision = _as_text(value).strip().lower()
+    if decision not in ("approved", "declined"):
+        raise ValueError(f"unbekannte Entscheidung: {value!r}")
+    return decision
+
+
+def _as_mapping(value: Any) -> dict:
+    if not isinstance(value, dict):
+        raise ValueError(f"kein Objekt: {value!r}")
+    return value
+
+
+# Schema je Stufe: Feld -> (Konvertierung, Pflichtfeld)
+SCHEMAS: Dict[str, Dict[str, Tuple[Any, bool]]] = {
+    "ml": {
+        "probability": (_as_probability, True),
+        "is_fraud": (_as_bool, True),
+        "threshold": (_as_probability, False),
+        "features": (_as_mapping, False),
+        "model_version": (_as_text, False)
+    },
+    "rule": {
+        "is_flagged": (_as_bool, True),
+        "rules_triggered": (_as_text_list, True),
+        "version": (_as_text, False)
+    },
+    "decision": {
+        "decision": (_as_decision, True),
+        "confidence": (_as_probability, True),
+        "reasoning": (_as_text, True)
+    }
+}
+
+
+def validate(value: Any, stage: str) -> Dict[str, Any]:
+    """
+    Prüft ein geparstes Objekt gegen das Schema der Stufe und normalisiert die Feldtypen.
+
+    Unbekannte Felder bleiben erhalten.
+
+    Raises:
+        ValueError: Bei fehlenden Pflichtfeldern oder ungültigen Werten
+    """
+    if not isinstance(value, dict):
+        raise ValueError("Antwort ist kein JSON-Objekt")
+    result = dict(value)
+    for field, (convert, required) in SCHEMAS[stage].items():
+        if field not in value or value[field] is None:
+            if required:
+                raise ValueError(f"Pflichtfeld fehlt: {field}")
+            continue
+        try:
+            result[field] = convert(value[field])
+        except ValueError as exc:
+            raise ValueError(f"Ungültiger Wert für {field}: {exc}")
+    return result
+
+
+def parse_structured(text: Any, stage: str) -> Dict[str, Any]:
+    """
+    Liefert das erste Objekt in text, das dem Schema der Stufe entspricht.
+
+    Args:
+        text: Die Rohausgabe eines Agenten
+        stage: "ml", "rule" oder "decision"
+
+    Raises:
+        StructuredOutputError: Mit dem Grund der letzten Ablehnung, wenn kein Objekt gültig ist
+    """
+    reason = "Kein JSON-Objekt in der Antwort"
+    for candidate in iter_json_objects(str(text or "")):
+        try:
+            return validate(loads_tolerant(candidate), stage)
+        except ValueError as exc:
+            reason = str(exc)
+    raise StructuredOutputError(reason)
+
+
+def parse_batch(text: Any, stage: str, key: str = "transaction_id") -> Dict[str, Dict[str, Any]]:
+    """
+    Wertet eine gebündelte Antwort aus (Array oder in ein Objekt eingebettete Liste von Objekten).
+
+    Objekte ohne Schlüssel oder mit ungültigem Inhalt werden übersprungen; für sie muss
+    der Aufrufer einzeln nachfragen.
+
+    Returns:
+        Schlüssel (z.B. transaction_id) -> geprüfte und normalisierte Bewertung
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    for candidate in iter_json_objects(str(text or "")):
+        try:
+            value = loads_tolerant(candidate)
+        except ValueError:
+            continue
+        if isinstance(value, dict) and key not in value:
+            # z.B. {"results": [...]}
+            nested = [item for items in value.values() if isinstance(items, list) for item in items]
+        else:
+            nested = [value]
+        for item in nested:
+            if not isinstance(item, dict) or not isinstance(item.get(key), str):
+                continue
+            try:
+                results[item[key]] = validate({name: v for name, v in item.items() if name != key}, stage)
+            except ValueError:
+                continue
+    return results
@@ -0,0 +1,13 @@
+import pytest
+
+from tests.support import reset_account_state
+
+
+@pytest.fixture
+def main_module(monkeypatch):
+    """Das Modul main mit leerer Historie, leeren Profilen und leeren Zeitfenstern."""
+    pytest.importorskip("crewai")
+    import main
+
+    reset_account_state(main, monkeypatch)
+    return main
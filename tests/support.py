@@ -0,0 +1,46 @@
+"""
+Hilfsfunktionen der Tests.
+
+Alles hier ist auf Modulebene definiert, damit es auch an Worker-Prozesse
+(Startmethode "spawn") übergeben werden kann.
+"""
+import json
+
+from benchmark import generate_transactions
+from history_store import TransactionHistoryStore
+from profile_store import ProfileStore
+from velocity import VelocityEngine
+
+
+DECISION_ANSWER = json.dumps({"decision": "approved", "confidence": 0.9, "reasoning": "Testantwort"})
+
+
+def stub_task_runner(agent, task):
+    """Ersatz für die Crew-Ausführung; Erklärungen akzeptieren beliebigen Text, Entscheidungen brauchen JSON."""
+    return DECISION_ANSWER
+
+
+def transactions(count, accounts=50, seed=7):
+    """Synthetische Transaktionen in chronologischer Erzeugungsreihenfolge."""
+    return list(generate_transactions(count, seed=seed, accounts=accounts))
+
+
+def decision_view(result):
+    """Die entscheidungsrelevanten Teile eines Ergebnisses, ohne Laufzeiten."""
+    return {
+        "transaction_id": result["transaction"]["transaction_id"],
+        "ml_assessment": result.get("ml_assessment"),
+        "rule_assessment": result.get("rule_assessment"),
+        "triage": result.get("triage"),
+        "velocity": result.get("velocity"),
+        "final_decision": result.get("final_decision"),
+        "decision_path": result.get("decision_path"),
+        "error": result.get("error")
+    }
+
+
+def reset_account_state(main, monkeypatch):
+    """Ersetzt Historie, Profile und Zeitfenster von main durch leere Speicher."""
+    monkeypatch.setattr(main, "history_store", TransactionHistoryStore())
+    monkeypatch.setattr(main, "profile_store", ProfileStore())
+    monkeypatch.setattr(main, "velocity_engine", VelocityEngine())
@@ -0,0 +1,61 @@
+import sqlite3
+
+from assessment_cache import AssessmentCache, assessment_digest, canonical_key
+from tests.support import stub_task_runner, transactions
+
+
+def _rows(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT COUNT(*) FROM assessment_cache").fetchone()[0]
+
+
+def test_persisted_rows_are_capped(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = AssessmentCache(max_entries=10, path=path, max_persisted=50, purge_interval=20)
+    for i in range(500):
+        cache.put("ml", ("key", i), {"value": i})
+    assert _rows(path) <= 50 + 20
+    # Die zuletzt geschriebenen Einträge bleiben erhalten
+    cache.close()
+    reopened = AssessmentCache(max_entries=10, path=path, max_persisted=50)
+    assert reopened.get("ml", ("key", 499)) == {"value": 499}
+    assert reopened.get("ml", ("key", 0)) is None
+    assert _rows(path) <= 50
+    reopened.close()
+
+
+def test_expired_rows_are_purged_while_running(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = AssessmentCache(ttl_seconds=-1.0, path=path, purge_interval=10)
+    for i in range(25):
+        cache.put("ml", ("key", i), {"value": i})
+    assert _rows(path) == 5
+    cache.close()
+
+
+def test_explanations_are_cached_per_assessment(main_module):
+    calls = []
+
+    def runner(agent, task):
+        calls.append(task.description)
+        return stub_task_runner(agent, task)
+
+    system = main_module.FraudDetectionSystem(task_runner=runner)
+    transaction = transactions(1)[0]
+    first = ('{"probability":0.9}', '{"rules_triggered":["new_receiver"]}')
+    second = ('{"probability":0.4}', '{"rules_triggered":["new_receiver"]}')
+    try:
+        def explain(assessments):
+            build = lambda: (system.explanation_agent, system._build_explanation_task(transaction, *assessments))
+            return system._run_branch(transaction, "generate_explanation", build, assessments)
+
+        explain(first)
+        explain(first)
+        assert len(calls) == 1
+        explain(second)
+        assert len(calls) == 2
+        assert system.cache.get(
+            "explanation", canonical_key(transaction) + (assessment_digest(*second),)
+        ) is not None
+    finally:
+        system.close()
@@ -0,0 +1,119 @@
+import os
+import time
+
+import pytest
+
+import audit_log as audit_log_module
+from audit_log import AuditLog
+
+
+def write(log, count, start=0):
+    """Schreibt Einträge einzeln, damit jede Gruppe nur einen Eintrag enthält und Segmente oft rotieren."""
+    for i in range(start, start + count):
+        log.record("assessment", f"t{i % 20}", {"index": i, "padding": "x" * 50}).result(timeout=30)
+
+
+def wait_until_sealed(log):
+    deadline = time.monotonic() + 30
+    while log.stats()["segments_pending"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert log.stats()["segments_pending"] == 0
+
+
+def indexes(records):
+    return [record["record"]["index"] for record in records]
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_rotation_keeps_sealed_segments_searchable(tmp_path, compress):
+    log = AuditLog(str(tmp_path), segment_max_bytes=2000, flush_interval_ms=1, compress=compress)
+    write(log, 200)
+    stats = log.stats()
+    assert stats["segments_sealed"] >= 5
+    wait_until_sealed(log)
+    # Im Speicher steht nur noch der Index des aktiven Segments
+    assert log.stats()["indexed_transactions"] <= 20
+    assert indexes(log.lookup("t3")) == list(range(3, 200, 20))
+    log.close()
+
+    names = os.listdir(tmp_path)
+    assert any(name.endswith(".idx.npy") for name in names)
+    assert any(name.endswith(".jsonl.gz") for name in names) == compress
+
+    reopened = AuditLog(str(tmp_path), segment_max_bytes=2000, flush_interval_ms=1, compress=compress)
+    try:
+        write(reopened, 20, start=200)
+        records = reopened.lookup("t3")
+        assert indexes(records) == list(range(3, 220, 20))
+        assert [record["seq"] for record in records] == sorted(record["seq"] for record in records)
+        assert reopened.lookup("unknown") == []
+    finally:
+        reopened.close()
+
+
+def test_recovery_truncates_a_torn_tail(tmp_path):
+    log = AuditLog(str(tmp_path), flush_interval_ms=1)
+    write(log, 10)
+    log.close()
+    active = os.path.join(tmp_path, "segment-000001.jsonl")
+    with open(active, "ab") as handle:
+        handle.write(b'{"seq":11,"kind":"assess')
+
+    reopened = AuditLog(str(tmp_path), flush_interval_ms=1)
+    try:
+        write(reopened, 1, start=10)
+        assert indexes(reopened.lookup("t10")) == [10]
+        assert indexes(reopened.lookup("t0")) == [0]
+        assert reopened.lookup("t10")[0]["seq"] == 11
+    finally:
+        reopened.close()
+    with open(active, "rb") as handle:
+        assert all(line.endswith(b"}\n") for line in handle)
+
+
+def test_failed_commit_leaves_no_partial_records(tmp_path, monkeypatch):
+    log = AuditLog(str(tmp_path), flush_interval_ms=1)
+    write(log, 5)
+    size = os.path.getsize(os.path.join(tmp_path, "segment-000001.jsonl"))
+
+    fsync = os.fsync
+    failures = []
+
+    def failing_fsync(fd):
+        if not failures:
+            failures.append(fd)
+            raise OSError("disk full")
+        fsync(fd)
+
+    monkeypatch.setattr(audit_log_module.os, "fsync", failing_fsync)
+    future = log.record("assessment", "lost", {"index": -1})
+    with pytest.raises(OSError):
+        future.result(timeout=30)
+    assert os.path.getsize(os.path.join(tmp_path, "segment-000001.jsonl")) == size
+    assert log.stats()["failed_commits"] == 1
+
+    # Spätere Gruppen landen direkt hinter den zuletzt bestätigten Einträgen
+    write(log, 5, start=5)
+    log.close()
+    reopened = AuditLog(str(tmp_path))
+    try:
+        assert reopened.lookup("lost") == []
+        assert indexes(reopened.lookup("t9")) == [9]
+        assert reopened.lookup("t9")[0]["seq"] == 10
+    finally:
+        reopened.close()
+
+
+def test_missing_segment_index_is_rebuilt(tmp_path):
+    log = AuditLog(str(tmp_path), segment_max_bytes=2000, flush_interval_ms=1)
+    write(log, 100)
+    log.close()
+    for name in os.listdir(tmp_path):
+        if name.endswith(".idx.npy"):
+            os.remove(os.path.join(tmp_path, name))
+
+    reopened = AuditLog(str(tmp_path), segment_max_bytes=2000)
+    try:
+        assert indexes(reopened.lookup("t7")) == list(range(7, 100, 20))
+    finally:
+        reopened.close()
@@ -0,0 +1,68 @@
+import json
+import queue
+
+import pytest
+
+from backtest import _collect, expand_grid, run_backtest
+from tests.support import transactions
+
+
+GRID = {"threshold": [0.3, 0.6], "large_amount": [3000.0, 10000.0], "burst_1m": [3, 8]}
+
+
+def test_worker_count_does_not_change_the_results(tmp_path):
+    source = tmp_path / "history.jsonl"
+    with open(source, "w", encoding="utf-8") as handle:
+        for transaction in sorted(transactions(600, accounts=40), key=lambda item: item["timestamp"]):
+            transaction["is_fraud"] = transaction["amount"] > 4000 or transaction["is_realtime"]
+            handle.write(json.dumps(transaction) + "\n")
+
+    single = run_backtest(str(source), grid=GRID, workers=1, chunk_rows=64)
+    sharded = run_backtest(str(source), grid=GRID, workers=2, chunk_rows=64)
+
+    assert single["rows"] == sharded["rows"] == 600
+    assert single["positives"] == sharded["positives"] > 0
+    assert single["triage"] == sharded["triage"]
+    assert single["configurations"] == sharded["configurations"]
+    assert len(single["configurations"]) == 8
+
+
+@pytest.mark.parametrize("key", ["realtime_transfer", "new_receiver", "unknown_rule"])
+def test_grid_rejects_parameters_without_effect(key):
+    with pytest.raises(ValueError, match=key):
+        expand_grid({"threshold": [0.5], key: [1]})
+    assert expand_grid({"threshold": [0.3, 0.6], "unusual_time": [["22:00", "06:00"]]}) == [
+        {"threshold": 0.3, "unusual_time": ["22:00", "06:00"]},
+        {"threshold": 0.6, "unusual_time": ["22:00", "06:00"]}
+    ]
+
+
+class _Process:
+    def __init__(self, name, exitcode):
+        self.name = name
+        self.exitcode = exitcode
+
+
+class _Outbox:
+    """Liefert die Ergebnisse erst nach einer Zeitüberschreitung, wie bei einem langsamen Leser."""
+
+    def __init__(self, parts):
+        self.parts = list(parts)
+        self.timed_out = False
+
+    def get(self, timeout=None):
+        if not self.timed_out:
+            self.timed_out = True
+            raise queue.Empty
+        if not self.parts:
+            raise queue.Empty
+        return self.parts.pop(0)
+
+
+def test_collect_accepts_workers_that_exited_after_their_result():
+    assert _collect(_Outbox([{"rows": 1}]), [_Process("backtest-0", 0)]) == [{"rows": 1}]
+
+
+def test_collect_fails_for_a_crashed_worker():
+    with pytest.raises(RuntimeError, match="backtest-1"):
+        _collect(_Outbox([{"rows": 1}]), [_Process("backtest-0", 0), _Process("backtest-1", 1)])
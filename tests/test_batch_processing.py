@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from tests.support import decision_view, reset_account_state, stub_task_runner, transactions
+
+
+def _single(main, data, triage=None):
+    system = main.FraudDetectionSystem(task_runner=stub_task_runner, triage=triage)
+    try:
+        return {result["transaction"]["transaction_id"]: decision_view(result) for result in map(
+            system.process_transaction, data
+        )}
+    finally:
+        system.close()
+
+
+def _batch(main, data, triage=None, **options):
+    system = main.FraudDetectionSystem(task_runner=stub_task_runner, triage=triage)
+    try:
+        return {
+            result["transaction"]["transaction_id"]: decision_view(result)
+            for result in system.process_transactions(data, **options)
+        }
+    finally:
+        system.close()
+
+
+def _async_batch(main, data, triage=None, **options):
+    system = main.FraudDetectionSystem(task_runner=stub_task_runner, triage=triage)
+
+    async def collect():
+        return [result async for result in system.aprocess_transactions(data, **options)]
+
+    try:
+        return {
+            result["transaction"]["transaction_id"]: decision_view(result) for result in asyncio.run(collect())
+        }
+    finally:
+        system.close()
+
+
+@pytest.mark.parametrize("triage", [None, True])
+@pytest.mark.parametrize("options", [
+    {"max_concurrency": 8, "batch_size": 64},
+    {"max_concurrency": 3, "batch_size": 7},
+    {"max_concurrency": 16, "batch_size": 256}
+])
+def test_batch_path_decides_like_the_single_path(main_module, monkeypatch, options, triage):
+    data = transactions(300, accounts=20)
+    expected = _single(main_module, data, triage)
+
+    reset_account_state(main_module, monkeypatch)
+    assert _batch(main_module, data, triage, **options) == expected
+
+    reset_account_state(main_module, monkeypatch)
+    assert _async_batch(main_module, data, triage, **options) == expected
+
+
+def test_triage_is_opt_in_and_triaged_results_carry_no_assessments(main_module, monkeypatch):
+    data = transactions(200, accounts=20)
+    assert all(result["decision_path"] != "triage" for result in _single(main_module, data).values())
+
+    reset_account_state(main_module, monkeypatch)
+    single = _single(main_module, data, triage=True)
+    reset_account_state(main_module, monkeypatch)
+    batch = _batch(main_module, data, triage=True)
+    triaged = [key for key, result in single.items() if result["decision_path"] == "triage"]
+    assert triaged
+    for key in triaged:
+        for results in (single, batch):
+            assert results[key]["ml_assessment"] == {} and results[key]["rule_assessment"] == {}
+
+
+def test_batch_path_keeps_the_complete_history_per_account(main_module):
+    data = transactions(120, accounts=5)
+    system = main_module.FraudDetectionSystem(task_runner=stub_task_runner)
+    try:
+        assert len(list(system.process_transactions(data, max_concurrency=8, batch_size=16))) == len(data)
+    finally:
+        system.close()
+    for account in {transaction["sender_account"] for transaction in data}:
+        stored = main_module.history_store.query(account, limit=len(data))["transactions"]
+        # Nach Zeitstempel, bei gleichem Zeitstempel in Eingabereihenfolge
+        expected = [
+            t["transaction_id"]
+            for t in sorted((t for t in data if t["sender_account"] == account), key=lambda t: t["timestamp"])
+        ]
+        assert [t["transaction_id"] for t in reversed(stored)] == expected
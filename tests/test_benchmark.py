@@ -0,0 +1,13 @@
+import pytest
+
+from benchmark import run_benchmark
+
+
+def test_single_and_batch_runs_start_from_the_same_state():
+    pytest.importorskip("crewai")
+    report = run_benchmark(
+        transactions=200, mode="both", latency_ms=0.0, jitter_ms=0.0, max_concurrency=8, triage=True
+    )
+    assert report["single"]["decision_paths"] == report["batch"]["decision_paths"]
+    assert report["single"]["triage"] == report["batch"]["triage"]
+    assert report["single"]["triage"]["approve"]["count"] > 0
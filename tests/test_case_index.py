@@ -0,0 +1,67 @@
+import threading
+
+import numpy as np
+import pytest
+
+from case_index import CASE_FEATURES, CaseIndex, stored_case_id
+
+
+def cases(count, seed=0, prefix="c"):
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        yield {
+            "case_id": f"{prefix}{i}",
+            "features": dict(zip(CASE_FEATURES, rng.random(len(CASE_FEATURES)).tolist())),
+            "outcome": "confirmed_fraud" if i % 2 else "false_positive"
+        }
+
+
+@pytest.mark.parametrize("persistent", [False, True])
+def test_search_never_builds_the_index_itself(tmp_path, monkeypatch, persistent):
+    index = CaseIndex(path=str(tmp_path) if persistent else None, exact_threshold=100)
+    started, release = threading.Event(), threading.Event()
+    build_ivf = index.build_ivf
+
+    def slow_build_ivf(*args, **kwargs):
+        started.set()
+        release.wait(30)
+        build_ivf(*args, **kwargs)
+
+    monkeypatch.setattr(index, "build_ivf", slow_build_ivf)
+    index.add_many(cases(150))
+    assert started.wait(10)
+
+    # Während der Aufbau läuft, antwortet die exakte Suche sofort
+    query = next(cases(1, seed=1))["features"]
+    assert [hit["case_id"] for hit in index.search(query, k=3)]
+    assert index._centroids is None
+
+    release.set()
+    index.wait_for_index(30)
+    assert index._centroids is not None and index._indexed == 150
+
+    # Neuzugänge bis zum nächsten Aufbau werden über den nicht indizierten Rest gefunden
+    index.add("newest", {"amount_unusually_high": True}, "confirmed_fraud")
+    assert index.search({"amount_unusually_high": True}, k=1)[0]["case_id"] == "newest"
+
+
+def test_reopened_large_index_is_rebuilt_in_the_background(tmp_path):
+    CaseIndex(path=str(tmp_path)).add_many(cases(150))
+    index = CaseIndex(path=str(tmp_path), exact_threshold=100)
+    index.wait_for_index(30)
+    assert index._indexed == 150
+
+
+def test_long_case_ids_are_hashed_instead_of_truncated():
+    index = CaseIndex()
+    first, second = "x" * 32 + "-first", "x" * 32 + "-second"
+    index.add(first, {"new_receiver": True}, "confirmed_fraud")
+    index.add(second, {"unusual_time": True}, "false_positive")
+    index.add("short", {"is_realtime": True}, "false_positive")
+
+    assert stored_case_id("short") == "short"
+    assert stored_case_id(first) != stored_case_id(second)
+    assert len(stored_case_id(first).encode("utf-8")) <= 32
+    assert index.search({"new_receiver": True}, k=1)[0]["case_id"] == stored_case_id(first)
+    assert index.search({"unusual_time": True}, k=1)[0]["case_id"] == stored_case_id(second)
+    assert index.search({"is_realtime": True}, k=1)[0]["case_id"] == "short"
@@ -0,0 +1,137 @@
+import random
+
+import pytest
+
+from history_store import TransactionHistoryStore
+
+
+def _transactions(count, accounts=3, seed=1):
+    rng = random.Random(seed)
+    return [
+        {
+            "transaction_id": f"t{i}",
+            "sender_account": f"DE{rng.randrange(accounts):020d}",
+            "receiver_account": f"FR{rng.randrange(10):025d}",
+            "amount": round(rng.uniform(1, 500), 2),
+            "timestamp": f"2024-01-{1 + i // 96:02d}T{(i // 4) % 24:02d}:{(i % 4) * 15:02d}:00Z",
+            "description": f"Zahlung {i}",
+            "is_realtime": bool(i % 2)
+        }
+        for i in range(count)
+    ]
+
+
+def _expected(transactions, account, start=None, end=None):
+    rows = [
+        t for t in transactions
+        if t["sender_account"] == account and (start is None or t["timestamp"] >= start)
+        and (end is None or t["timestamp"] <= end)
+    ]
+    # Neueste zuerst; bei gleichem Zeitstempel die später angehängte zuerst (stabile Sortierung)
+    return [t["transaction_id"] for t in sorted(reversed(rows), key=lambda t: t["timestamp"], reverse=True)]
+
+
+def _query_all(store, account, **options):
+    ids, cursor = [], None
+    while True:
+        page = store.query(account, limit=7, cursor=cursor, **options)
+        ids.extend(t["transaction_id"] for t in page["transactions"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+@pytest.fixture(params=["memory", "path"])
+def store_factory(request, tmp_path):
+    path = str(tmp_path / "history") if request.param == "path" else None
+    stores = []
+
+    def create():
+        stores.append(TransactionHistoryStore(path=path))
+        return stores[-1]
+
+    yield create
+    for store in stores:
+        store.close()
+
+
+def test_time_range_query_with_out_of_order_appends(store_factory):
+    data = _transactions(400)
+    shuffled = data[:]
+    random.Random(2).shuffle(shuffled)
+    store = store_factory()
+    # Teils einzeln, teils gestapelt anhängen
+    for transaction in shuffled[:150]:
+        store.append(transaction)
+    store.append_many(shuffled[150:])
+
+    start, end = "2024-01-02T06:00:00Z", "2024-01-03T18:00:00Z"
+    for account in {t["sender_account"] for t in data}:
+        stored = {t["transaction_id"]: t for t in data}
+        assert _query_all(store, account) == _expected(data, account)
+        assert _query_all(store, account, start=start, end=end) == _expected(data, account, start, end)
+        first = store.query(account, limit=1)["transactions"][0]
+        assert first["amount"] == stored[first["transaction_id"]]["amount"]
+
+
+def test_reopened_store_keeps_the_sorted_chains(tmp_path):
+    path = str(tmp_path / "history")
+    data = _transactions(200)
+    shuffled = data[:]
+    random.Random(3).shuffle(shuffled)
+    store = TransactionHistoryStore(path=path)
+    store.append_many(shuffled[:120])
+    for transaction in shuffled[120:]:
+        store.append(transaction)
+    store.close()
+
+    reopened = TransactionHistoryStore(path=path)
+    for account in {t["sender_account"] for t in data}:
+        assert _query_all(reopened, account) == _expected(data, account)
+    exported = reopened.export_accounts(sorted({t["sender_account"] for t in data}))
+    assert len(exported) == len(data)
+    reopened.close()
+
+
+def test_cursor_must_point_into_the_accounts_history(store_factory):
+    data = _transactions(60)
+    store = store_factory()
+    store.append_many(data)
+    accounts = sorted({t["sender_account"] for t in data})
+    page = store.query(accounts[0], limit=2)
+    assert store.query(accounts[0], limit=2, cursor=page["next_cursor"])["transactions"]
+
+    foreign = next(i for i, t in enumerate(data) if t["sender_account"] == accounts[1])
+    for cursor in (-1, len(data), foreign):
+        with pytest.raises(ValueError):
+            store.query(accounts[0], cursor=cursor)
+    with pytest.raises(ValueError):
+        store.query("unbekannt", cursor=0)
+
+
+def test_removed_accounts_stay_removed_after_reopening(tmp_path):
+    path = str(tmp_path / "history")
+    data = _transactions(120)
+    accounts = sorted({t["sender_account"] for t in data})
+    removed, kept = accounts[0], accounts[1:]
+    store = TransactionHistoryStore(path=path)
+    store.append_many(data)
+    cursor = store.query(removed, limit=2)["next_cursor"]
+    store.remove_accounts([removed])
+    with pytest.raises(ValueError):
+        store.query(removed, cursor=cursor)
+    store.close()
+
+    reopened = TransactionHistoryStore(path=path)
+    assert reopened.query(removed)["transactions"] == []
+    assert removed not in reopened.senders()
+    for account in kept:
+        assert _query_all(reopened, account) == _expected(data, account)
+
+    # Ein erneuter Import beginnt eine neue Kette, die auch nach dem Öffnen gilt
+    returned = [dict(t, transaction_id=f"r{i}") for i, t in enumerate(data) if t["sender_account"] == removed]
+    reopened.append_many(returned[:3])
+    reopened.close()
+    reopened = TransactionHistoryStore(path=path)
+    assert _query_all(reopened, removed) == _expected(returned[:3], removed)
+    reopened.close()
@@ -0,0 +1,47 @@
+import pytest
+
+from latency_budget import FallbackPolicy, LatencyBudget
+from tests.support import stub_task_runner, transactions
+
+
+def test_zero_budget_is_expired_not_unbounded():
+    budget = LatencyBudget(0)
+    assert budget.budget_ms == 0.0
+    assert budget.remaining() == 0.0
+    assert budget.expired()
+    assert budget.report()["budget_ms"] == 0.0
+
+
+def test_missing_budget_is_unbounded():
+    budget = LatencyBudget()
+    assert budget.remaining() is None
+    assert not budget.expired()
+
+
+@pytest.mark.parametrize("rule", ["burst_1m", "receiver_fanout_1h", "high_volume_24h"])
+def test_fallback_declines_velocity_rules(rule):
+    decision = FallbackPolicy().decide({"probability": 0.1}, {"rules_triggered": [rule]})
+    assert decision["decision"] == "declined"
+    assert rule in decision["reasoning"]
+
+
+def test_zero_realtime_budget_falls_back_immediately(main_module):
+    # Hoher Betrag: die Regel large_amount leitet die Echtzeit-Überweisung an den decision_agent
+    transaction = dict(transactions(1)[0], is_realtime=True, amount=50000.0)
+    calls = []
+
+    def counting_runner(agent, task):
+        calls.append(system.agent_stages.get(id(agent)))
+        return stub_task_runner(agent, task)
+
+    system = main_module.FraudDetectionSystem(task_runner=counting_runner, realtime_budget_ms=0)
+    try:
+        result = system.process_transaction(transaction)
+    finally:
+        system.close()
+    assert result["decision_path"] == "fallback"
+    assert result["latency"]["budget_ms"] == 0.0
+    assert result["latency"]["timed_out_stages"] == ["decision_agent"]
+    assert "large_amount" in result["rule_assessment"]["rules_triggered"]
+    assert result["final_decision"] == "declined"
+    assert calls == []
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import metrics
+from metrics import MetricsRegistry
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry(enabled=True)
+
+
+def test_disabled_registry_records_nothing(registry):
+    counter = registry.counter("calls_total", "Aufrufe")
+    histogram = registry.histogram("duration_seconds", "Dauer")
+    registry.disable()
+    counter.inc(stage="ml")
+    histogram.observe(0.2, stage="ml")
+    with histogram.time(stage="ml"):
+        pass
+    assert counter.values == {} and histogram.values == {}
+    assert registry.snapshot()["calls_total"]["samples"] == []
+
+    registry.enable()
+    counter.inc(2, stage="ml")
+    assert counter.values == {(("stage", "ml"),): 2.0}
+
+
+def test_disabled_tool_instrumentation_only_calls_the_tool(monkeypatch):
+    monkeypatch.setattr(metrics.registry, "enabled", False)
+
+    @metrics.instrument_tool
+    def lookup(account):
+        return f"Historie von {account}"
+
+    assert lookup("A") == "Historie von A"
+    assert (("tool", "lookup"),) not in metrics.TOOL_CALLS.values
+
+    monkeypatch.setattr(metrics.registry, "enabled", True)
+    try:
+        assert lookup("B") == "Historie von B"
+        assert metrics.TOOL_CALLS.values[(("tool", "lookup"),)] == 1.0
+        assert metrics.TOOL_RESPONSE_CHARS.values[(("tool", "lookup"),)] == len("Historie von B")
+    finally:
+        for metric in (metrics.TOOL_CALLS, metrics.TOOL_DURATION, metrics.TOOL_RESPONSE_CHARS,
+                       metrics.TOOL_RESPONSE_TOKENS):
+            metric.values.pop((("tool", "lookup"),), None)
+
+
+def test_prometheus_text_export(registry, tmp_path):
+    counter = registry.counter("calls_total", "Aufrufe je Stufe")
+    histogram = registry.histogram("duration_seconds", "Dauer", buckets=(1.0, 0.1))
+    counter.inc(stage='ml "neu"')
+    histogram.observe(0.05, stage="ml")
+    histogram.observe(2.0, stage="ml")
+
+    assert registry.to_prometheus() == (
+        "# HELP calls_total Aufrufe je Stufe\n"
+        "# TYPE calls_total counter\n"
+        'calls_total{stage="ml \\"neu\\""} 1.0\n'
+        "# HELP duration_seconds Dauer\n"
+        "# TYPE duration_seconds histogram\n"
+        'duration_seconds_bucket{stage="ml",le="0.1"} 1\n'
+        'duration_seconds_bucket{stage="ml",le="1.0"} 1\n'
+        'duration_seconds_bucket{stage="ml",le="+Inf"} 2\n'
+        'duration_seconds_sum{stage="ml"} 2.05\n'
+        'duration_seconds_count{stage="ml"} 2\n'
+    )
+
+    registry.write(str(tmp_path / "metrics.prom"))
+    assert (tmp_path / "metrics.prom").read_text(encoding="utf-8") == registry.to_prometheus()
+    registry.write(str(tmp_path / "metrics.json"))
+    snapshot = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert snapshot["duration_seconds"]["samples"][0]["buckets"] == {"0.1": 1, "1.0": 1}
+
+    registry.reset()
+    assert registry.to_prometheus().count("\n") == 4
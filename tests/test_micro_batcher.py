@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from benchmark import StubLLM
+from micro_batcher import MicroBatcher
+from tests.support import transactions
+
+
+def test_items_are_batched_by_count_and_matched_by_key():
+    batches = []
+
+    def run_batch(items):
+        batches.append(list(items))
+        # Für "skip" fehlt das Ergebnis; der Aufrufer fragt dann einzeln nach
+        return {item: item.upper() for item in items if item != "skip"}
+
+    batcher = MicroBatcher(run_batch, max_items=3, max_wait_ms=10000)
+    futures = {item: batcher.submit(item, item) for item in ("a", "skip", "c")}
+    assert {item: future.result(5) for item, future in futures.items()} == {"a": "A", "skip": None, "c": "C"}
+    batcher.close()
+    assert batches == [["a", "skip", "c"]]
+
+
+def test_partial_batch_is_sent_after_the_wait():
+    batcher = MicroBatcher(lambda items: {item: item for item in items}, max_items=100, max_wait_ms=20)
+    try:
+        assert batcher.submit("a", "a").result(5) == "a"
+    finally:
+        batcher.close()
+
+
+def test_submit_after_close_raises():
+    batcher = MicroBatcher(lambda items: {}, max_wait_ms=1)
+    batcher.close()
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit("a", "a")
+
+
+def test_failed_batch_is_counted_and_reaches_every_caller():
+    def run_batch(items):
+        raise ConnectionError("LLM nicht erreichbar")
+
+    batcher = MicroBatcher(run_batch, max_items=2, max_wait_ms=10000)
+    futures = [batcher.submit(key, key) for key in ("a", "b")]
+    for future in futures:
+        with pytest.raises(ConnectionError):
+            future.result(5)
+    batcher.close()
+    assert batcher.failed_batches == 1
+
+
+def test_single_transactions_bypass_the_batcher(main_module):
+    stub = StubLLM(latency_ms=0.0, jitter_ms=0.0)
+    system = main_module.FraudDetectionSystem(
+        ml_backend="llm", rule_backend="llm", task_runner=stub, micro_batch_size=2, micro_batch_wait_ms=60000
+    )
+    stub.bind(system)
+    submitted = []
+    for batcher in system._batchers.values():
+        original = batcher.submit
+        batcher.submit = lambda key, item, original=original: submitted.append(key) or original(key, item)
+
+    data = transactions(4, accounts=4)
+    try:
+        # Ohne Bypass warteten beide Stufen die volle Minute auf eine zweite Transaktion
+        started = time.monotonic()
+        assert "error" not in system.process_transaction(data[0])
+        assert len(list(system.process_transactions(data[1:2], max_concurrency=1))) == 1
+        assert time.monotonic() - started < 30
+        assert submitted == []
+
+        # Zwei gleichzeitige Transaktionen füllen je Stufe einen Stapel
+        assert len(list(system.process_transactions(data[2:], max_concurrency=2))) == 2
+    finally:
+        system.close()
+    assert sorted(submitted) == sorted(transaction["transaction_id"] for transaction in data[2:] for _ in range(2))
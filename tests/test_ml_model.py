@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from ml_model import FEATURE_NAMES, FraudScoringModel
+from tests.support import transactions
+
+
+PROFILE = {
+    "average_transaction_amount": 450.0,
+    "typical_receivers": [],
+    "risk_score": 0.2,
+    "previous_flags": 1,
+    "account_age_days": 30
+}
+
+
+def _save_older_model(path, feature_count):
+    """Speichert ein Modell im Format einer Version, die nur die ersten feature_count Merkmale kannte."""
+    np.savez(
+        path,
+        weights=np.linspace(0.5, 1.5, feature_count),
+        bias=-3.0,
+        threshold=0.4,
+        version="fraud-detection-v3-numpy",
+        feature_names=np.array(FEATURE_NAMES[:feature_count])
+    )
+
+
+def test_older_model_scores_the_same_in_batch_and_single(tmp_path):
+    path = str(tmp_path / "model-v3.npz")
+    _save_older_model(path, 8)
+    model = FraudScoringModel.load(path, profile_loader=lambda account: PROFILE)
+    assert model.version == "fraud-detection-v3-numpy"
+    assert model.threshold == 0.4
+    # Später ergänzte Merkmale (Zeitfenster) gehen mit Gewicht 0 ein
+    assert model.weights[8:].tolist() == [0.0] * (len(FEATURE_NAMES) - 8)
+    assert model.weights[:8].tolist() == np.linspace(0.5, 1.5, 8).tolist()
+
+    data = transactions(40)
+    velocities = [
+        {"count_1m": i % 6, "distinct_receivers_1h": i % 4, "sum_24h": 800.0 * i} for i in range(len(data))
+    ]
+    batch = model.score_batch(data, velocities=velocities)
+    assert batch == [model.score(transaction, velocity=velocity) for transaction, velocity in zip(data, velocities)]
+    # Ohne Gewicht ändern die Fensterwerte die Bewertung des älteren Modells nicht
+    assert batch == model.score_batch(data)
+    assert len({result["probability"] for result in batch}) > 1
+
+
+def test_round_trip_and_incompatible_features(tmp_path):
+    path = str(tmp_path / "model.npz")
+    model = FraudScoringModel(weights=np.arange(len(FEATURE_NAMES)) / 10.0, bias=-2.0, threshold=0.6)
+    model.save(path)
+    loaded = FraudScoringModel.load(path)
+    assert loaded.weights.tolist() == model.weights.tolist()
+    assert (loaded.bias, loaded.threshold, loaded.version) == (model.bias, model.threshold, model.version)
+
+    np.savez(
+        str(tmp_path / "foreign.npz"), weights=np.ones(2), bias=0.0, threshold=0.5, version="x",
+        feature_names=np.array(["amount", "country"])
+    )
+    with pytest.raises(ValueError):
+        FraudScoringModel.load(str(tmp_path / "foreign.npz"))
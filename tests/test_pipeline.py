@@ -0,0 +1,89 @@
+import io
+import json
+
+from pipeline import process_stream, run_pipeline
+from tests.support import stub_task_runner, transactions
+
+
+class ReversingSystem:
+    """Liefert jeden gelesenen Stapel rückwärts und mit kopierter Transaktion; die erste Transaktion erst zum Schluss."""
+
+    def __init__(self):
+        self.calls = 0
+        self.read = 0
+        self.read_while_slow = 0
+
+    def process_tagged(self, items, max_concurrency=8, batch_size=256, admit=None):
+        self.calls += 1
+        items = iter(items)
+        slow = None
+        exhausted = False
+        while not exhausted:
+            assert admit is None or admit()
+            chunk = []
+            for item in items:
+                chunk.append(item)
+                self.read += 1
+                if len(chunk) >= batch_size:
+                    break
+            else:
+                exhausted = True
+            if slow is not None:
+                self.read_while_slow = self.read
+            for tag, transaction in reversed(chunk):
+                if tag == 0:
+                    slow = (tag, transaction)
+                    continue
+                yield tag, {"transaction": dict(transaction)}
+            if slow is not None and (admit is not None and not admit() or exhausted):
+                yield slow[0], {"transaction": dict(slow[1])}
+                slow = None
+
+
+def test_ordered_stream_uses_one_call_and_a_bounded_window():
+    system = ReversingSystem()
+    data = [{"transaction_id": f"t{i}", "sender_account": f"A{i % 7}"} for i in range(100)]
+    window = 16
+    output = []
+    for result in process_stream(system, data, ordered=True, window=window):
+        output.append(result["transaction"]["transaction_id"])
+        # Gelesen, aber noch nicht geschrieben: höchstens ein Fenster
+        assert system.read - len(output) <= window
+
+    assert output == [transaction["transaction_id"] for transaction in data]
+    assert system.calls == 1
+    # Die Eingabe wurde weitergelesen, während die langsame erste Transaktion noch offen war
+    assert system.read_while_slow > window // 4
+
+
+def test_ordered_stream_answers_repeated_transaction_objects():
+    system = ReversingSystem()
+    transaction = {"transaction_id": "same", "sender_account": "A"}
+    output = list(process_stream(system, [transaction, transaction, transaction], ordered=True, window=4))
+    assert len(output) == 3
+
+
+def test_run_pipeline_writes_results_in_input_order(main_module, tmp_path):
+    data = transactions(120, accounts=15)
+    source = tmp_path / "input.jsonl"
+    with open(source, "w", encoding="utf-8") as handle:
+        for transaction in data[:60]:
+            handle.write(json.dumps(transaction) + "\n")
+        handle.write('{"transaction_id": "broken"}\n')
+        for transaction in data[60:]:
+            handle.write(json.dumps(transaction) + "\n")
+
+    system = main_module.FraudDetectionSystem(task_runner=stub_task_runner)
+    output, rejects = io.StringIO(), io.StringIO()
+    try:
+        counts = run_pipeline(
+            system, main_module.Transaction, source=str(source), output=output, rejects=rejects,
+            max_concurrency=4, window=8
+        )
+    finally:
+        system.close()
+
+    assert counts == {"processed": 120, "errors": 0}
+    written = [json.loads(line)["transaction"]["transaction_id"] for line in output.getvalue().splitlines()]
+    assert written == [transaction["transaction_id"] for transaction in data]
+    assert json.loads(rejects.getvalue())["line"] == 61
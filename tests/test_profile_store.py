@@ -0,0 +1,42 @@
+from profile_store import ProfileStore
+from tests.support import transactions
+
+
+def filled_store():
+    store = ProfileStore(initial_capacity=4)
+    for transaction in transactions(300, accounts=25):
+        store.update(transaction)
+    return store
+
+
+def test_export_import_and_remove_round_trip():
+    source, target = filled_store(), ProfileStore()
+    accounts = sorted(source.accounts())
+    moved, kept = accounts[:10], accounts[10:]
+    expected = {account: source.get_profile(account) for account in accounts}
+
+    target.import_accounts(source.export_accounts(moved))
+    source.remove_accounts(moved)
+
+    assert sorted(target.accounts()) == moved
+    assert sorted(source.accounts()) == kept
+    assert all(target.get_profile(account) == expected[account] for account in moved)
+    # Die verbliebenen Konten behalten ihre Aggregate, obwohl Slots verschoben wurden
+    assert all(source.get_profile(account) == expected[account] for account in kept)
+    assert all(source.get_profile(account) is None for account in moved)
+
+
+def test_snapshot_and_restore(tmp_path):
+    store = filled_store()
+    store.snapshot(str(tmp_path / "profiles.npz"))
+    restored = ProfileStore.restore(str(tmp_path / "profiles.npz"))
+
+    assert restored.accounts() == store.accounts()
+    assert all(restored.get_profile(account) == store.get_profile(account) for account in store.accounts())
+
+    # Der wiederhergestellte Speicher schreibt die Aggregate wie das Original fort
+    more = transactions(50, accounts=25, seed=8)
+    for transaction in more:
+        store.update(transaction)
+        restored.update(transaction)
+    assert all(restored.get_profile(account) == store.get_profile(account) for account in store.accounts())
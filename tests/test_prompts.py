@@ -0,0 +1,44 @@
+from benchmark import StubLLM
+from prompts import PROMPT_STAGES, SECTION_SEPARATOR, STAGE_INSTRUCTIONS, build_prompt, compact_json
+from tests.support import transactions
+
+
+def _prefix(prompt):
+    return prompt.split(SECTION_SEPARATOR, 1)[0].encode("utf-8")
+
+
+def test_prefix_is_the_static_instruction_of_the_stage():
+    for stage in PROMPT_STAGES:
+        prompts = [
+            build_prompt(stage, compact_json(transaction), compact_json({"probability": i / 10}), compact_json({}))
+            for i, transaction in enumerate(transactions(5))
+        ]
+        assert {_prefix(prompt) for prompt in prompts} == {STAGE_INSTRUCTIONS[stage].encode("utf-8")}
+        # Variable Inhalte stehen ausschließlich hinter dem Trenner
+        assert all(prompt.count(SECTION_SEPARATOR) == 1 for prompt in prompts)
+
+
+def test_system_prompts_share_one_prefix_per_stage(main_module):
+    stub = StubLLM(latency_ms=0.0, jitter_ms=0.0)
+    prompts = {}
+
+    def recording_runner(agent, task):
+        prompts.setdefault(stub.stages.get(id(agent), "query"), []).append(task.description)
+        return stub(agent, task)
+
+    system = main_module.FraudDetectionSystem(
+        ml_backend="llm", rule_backend="llm", routing="llm", task_runner=recording_runner
+    )
+    stub.bind(system)
+    try:
+        for transaction in transactions(60, accounts=20):
+            system.process_transaction(transaction)
+    finally:
+        system.close()
+
+    assert set(prompts) == set(PROMPT_STAGES)
+    for stage, descriptions in prompts.items():
+        assert len(descriptions) > 1
+        assert {_prefix(description) for description in descriptions} == {STAGE_INSTRUCTIONS[stage].encode("utf-8")}
+        # Die vollständigen Prompts unterscheiden sich dagegen
+        assert len(set(descriptions)) > 1
@@ -0,0 +1,85 @@
+import pytest
+
+from rule_engine import DEFAULT_RULES, RULE_ENGINE_VERSION, RuleEngine, minute_of_day
+
+
+def transaction(amount=100.0, receiver="KNOWN", timestamp="2024-03-01T12:00:00Z", realtime=False, description=""):
+    return {
+        "transaction_id": "t",
+        "sender_account": "A",
+        "receiver_account": receiver,
+        "amount": amount,
+        "timestamp": timestamp,
+        "is_realtime": realtime,
+        "description": description
+    }
+
+
+@pytest.fixture
+def engine():
+    return RuleEngine(known_receivers=lambda account: ["KNOWN"])
+
+
+def test_declared_rules_are_evaluated_in_order(engine):
+    assert engine.rule_names == [rule["name"] for rule in DEFAULT_RULES]
+    result = engine.evaluate(transaction(
+        amount=6000.0, receiver="NEW", timestamp="2024-03-01T23:30:00Z", realtime=True,
+        description="DRINGEND: Gewinn abholen"
+    ))
+    assert result == {
+        "is_flagged": True,
+        "rules_triggered": [
+            "large_amount", "realtime_transfer", "unusual_time", "new_receiver", "suspicious_description"
+        ],
+        "version": RULE_ENGINE_VERSION
+    }
+
+
+@pytest.mark.parametrize("case, velocity, triggered", [
+    (transaction(), None, []),
+    # Grenzen: large_amount erst über 5000, unusual_time von 23:00 (inklusive) bis 06:00 (exklusive)
+    (transaction(amount=5000.0), None, []),
+    (transaction(amount=5000.01), None, ["large_amount"]),
+    (transaction(timestamp="2024-03-01T22:59:00Z"), None, []),
+    (transaction(timestamp="2024-03-01T23:00:00Z"), None, ["unusual_time"]),
+    (transaction(timestamp="2024-03-01T05:59:00Z"), None, ["unusual_time"]),
+    (transaction(timestamp="2024-03-01T06:00:00Z"), None, []),
+    (transaction(timestamp="kein Zeitstempel"), None, []),
+    (transaction(description="Crypto exchange"), None, ["suspicious_description"]),
+    # Zeitfenster: burst_1m und receiver_fanout_1h ab 5, high_volume_24h erst über 20000
+    (transaction(), {"count_1m": 4, "distinct_receivers_1h": 4, "sum_24h": 20000.0}, []),
+    (transaction(), {"count_1m": 5}, ["burst_1m"]),
+    (transaction(), {"distinct_receivers_1h": 5}, ["receiver_fanout_1h"]),
+    (transaction(), {"sum_24h": 20000.5}, ["high_volume_24h"]),
+])
+def test_hand_computed_cases(engine, case, velocity, triggered):
+    result = engine.evaluate(case, velocity=velocity)
+    assert result["rules_triggered"] == triggered
+    assert result["is_flagged"] == bool(triggered)
+
+
+def test_batch_matches_single_evaluation(engine):
+    cases = [
+        transaction(amount=amount, receiver=receiver, timestamp=f"2024-03-01T{hour:02d}:15:00Z", realtime=realtime)
+        for amount in (10.0, 7000.0)
+        for receiver in ("KNOWN", "NEW")
+        for hour in (3, 12)
+        for realtime in (False, True)
+    ]
+    velocities = [
+        {"count_1m": i % 7, "distinct_receivers_1h": i % 6, "sum_24h": 1500.0 * i} for i in range(len(cases))
+    ]
+    batch = engine.evaluate_batch(cases, velocities)
+    assert batch == [engine.evaluate(case, velocity) for case, velocity in zip(cases, velocities)]
+    assert engine.evaluate_batch([]) == []
+    assert engine.evaluate_matrix(engine.extract_columns(cases, velocities)).shape == (len(DEFAULT_RULES), len(cases))
+
+
+def test_custom_rules_and_unknown_operator():
+    engine = RuleEngine(rules=[{"name": "small", "field": "amount", "op": "le", "value": 10.0}], version="v-test")
+    assert engine.evaluate(transaction(amount=10.0)) == {
+        "is_flagged": True, "rules_triggered": ["small"], "version": "v-test"
+    }
+    with pytest.raises(ValueError):
+        RuleEngine(rules=[{"name": "x", "field": "amount", "op": "between"}])
+    assert minute_of_day("2024-03-01T01:02:00Z") == 62
@@ -0,0 +1,164 @@
+import functools
+import threading
+import time
+
+import pytest
+
+from audit_log import AuditLog
+from pipeline import process_stream
+from shard_pool import HashRing, ShardedWorkerPool, _process_items
+from tests.support import stub_task_runner, transactions
+
+
+SEED_ACCOUNT = "DE55500105173984217489"  # Simulierte Historie, die jeder Worker beim Import von main lädt
+
+
+def test_hash_ring_moves_keys_only_to_the_new_node():
+    keys = [f"DE{i:020d}" for i in range(2000)]
+    before = HashRing([0, 1, 2])
+    after = HashRing([0, 1, 2, 3])
+    moved = [key for key in keys if before.node_for(key) != after.node_for(key)]
+    assert moved
+    assert all(after.node_for(key) == 3 for key in moved)
+    assert len(moved) < len(keys) / 2
+
+
+class StallingImportSystem:
+    """System ohne LLM und Speicher; merkt sich nur seine Konten und hängt beim Import."""
+
+    def __init__(self, shard):
+        self.shard = shard
+        self.accounts = set()
+
+    def process_tagged(self, items, max_concurrency=8, batch_size=256):
+        for tag, transaction in items:
+            self.accounts.add(transaction["sender_account"])
+            yield tag, {"shard": self.shard}
+
+    def export_accounts(self, predicate):
+        return {"accounts": sorted(account for account in self.accounts if predicate(account))}
+
+    def import_accounts(self, state):
+        time.sleep(60)
+
+    def remove_accounts(self, accounts):
+        self.accounts.difference_update(accounts)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pool():
+    pytest.importorskip("crewai")
+    import main
+
+    pool = ShardedWorkerPool(
+        functools.partial(main._build_shard_system, task_runner=stub_task_runner), workers=2, control_timeout=60
+    )
+    yield pool
+    pool.close()
+
+
+def test_add_worker_moves_only_rehashed_accounts(pool):
+    data = transactions(300, accounts=50)
+    assert len(list(pool.process_transactions(data, batch_size=64))) == len(data)
+    accounts = {transaction["sender_account"] for transaction in data} | {SEED_ACCOUNT}
+
+    expected = 0
+    for nodes in ([0, 1, 2], [0, 1, 2, 3]):
+        new_shard = pool.add_worker()
+        assert new_shard == nodes[-1]
+        ring = HashRing(nodes, pool._ring.replicas)
+        expected += sum(1 for account in accounts if ring.node_for(account) == new_shard)
+        assert pool.stats()["accounts_moved"] == expected
+
+    # Nach dem Umzug verarbeitet der neue Eigentümer die Konten weiter
+    more = transactions(100, accounts=50, seed=8)
+    assert all("error" not in result for result in pool.process_transactions(more))
+
+
+def test_abandoned_call_does_not_stop_the_collector(pool):
+    results = pool.process_transactions(transactions(400), batch_size=16, max_concurrency=2)
+    next(results)
+    results.close()
+
+    finished = []
+    worker = threading.Thread(
+        target=lambda: finished.append(len(list(pool.process_transactions(transactions(50))))), daemon=True
+    )
+    worker.start()
+    worker.join(timeout=120)
+    assert finished == [50]
+
+
+def test_sharded_audit_records_keep_the_transaction(main_module, tmp_path):
+    audit_log = AuditLog(str(tmp_path / "audit"))
+    system = main_module.FraudDetectionSystem(task_runner=stub_task_runner, audit_log=audit_log)
+    data = transactions(50)
+    try:
+        answered = _process_items(system, list(enumerate(data)), max_concurrency=4)
+        audit_log.flush()
+        assert len(answered) == len(data)
+        assert all("transaction" not in result for _, result in answered)
+        for transaction in data:
+            records = audit_log.lookup(transaction["transaction_id"])
+            assert records[0]["record"]["transaction"] == transaction
+    finally:
+        system.close()
+        audit_log.close()
+
+
+def test_remove_accounts_drops_all_account_state(main_module):
+    system = main_module.FraudDetectionSystem(task_runner=stub_task_runner)
+    data = transactions(200, accounts=20)
+    try:
+        for transaction in data:
+            system.process_transaction(transaction)
+        accounts = sorted({transaction["sender_account"] for transaction in data})
+        moved, kept = accounts[:5], accounts[5:]
+        state = system.export_accounts(lambda account: account in moved)
+        assert sorted(state["accounts"]) == moved
+
+        before = system.export_accounts(lambda account: account in kept)
+
+        system.remove_accounts(moved)
+        assert system.export_accounts(lambda account: account in moved)["accounts"] == []
+        assert all(main_module.profile_store.get_profile(account) is None for account in moved)
+        assert all(main_module.history_store.query(account)["transactions"] == [] for account in moved)
+        # Die verbliebenen Konten behalten ihren Zustand trotz verschobener Slots
+        after = system.export_accounts(lambda account: account in kept)
+        for key in ("history", "profiles", "velocity"):
+            assert sorted(after[key], key=str) == sorted(before[key], key=str)
+    finally:
+        system.close()
+
+
+def test_ordered_stream_through_the_pool(pool):
+    data = transactions(300, accounts=40)
+    output = [result["transaction"]["transaction_id"] for result in process_stream(pool, data, window=32)]
+    assert output == [transaction["transaction_id"] for transaction in data]
+
+
+def test_duplicate_transaction_objects_in_a_chunk(pool):
+    transaction = transactions(1)[0]
+    results = list(pool.process_transactions([transaction, transaction, transaction], batch_size=3))
+    assert len(results) == 3
+    assert all(result["transaction"] is transaction for result in results)
+
+
+def test_failed_import_keeps_the_old_ring():
+    pool = ShardedWorkerPool(StallingImportSystem, workers=2, control_timeout=1.0)
+    try:
+        data = transactions(100, accounts=30)
+        assert len(list(pool.process_transactions(data))) == len(data)
+        with pytest.raises(TimeoutError):
+            pool.add_worker()
+        assert pool._ring.nodes == [0, 1]
+        stats = pool.stats()
+        assert (stats["workers"], stats["rebalances"], stats["rebalances_failed"]) == (2, 0, 1)
+        # Die bisherigen Worker besitzen ihre Konten weiter und verarbeiten sie
+        shards = {result["shard"] for result in pool.process_transactions(data)}
+        assert shards == {0, 1}
+    finally:
+        pool.close()
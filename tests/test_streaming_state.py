@@ -0,0 +1,44 @@
+import os
+
+from tests.support import stub_task_runner, transactions
+
+
+SEED = {
+    "sender_account": "DE00000000000000000001",
+    "transaction_id": "seed-1",
+    "amount": 10.0,
+    "timestamp": "2023-12-01T15:30:00Z",
+    "receiver_account": "DE00000000000000000002",
+    "description": "Startwert"
+}
+
+
+def test_streaming_state_keeps_the_history_on_disk(main_module, tmp_path):
+    main_module.history_store.append(SEED)
+    main_module.use_streaming_state(str(tmp_path), max_velocity_accounts=10)
+    assert main_module.history_store.path == str(tmp_path / "history")
+    assert main_module.history_store.query(SEED["sender_account"])["transactions"][0]["transaction_id"] == "seed-1"
+
+    system = main_module.FraudDetectionSystem(task_runner=stub_task_runner)
+    data = transactions(100, accounts=30)
+    try:
+        results = list(system.process_transactions(data))
+    finally:
+        system.close()
+    assert all("error" not in result for result in results)
+
+    # Die Zeilen stehen in den Spaltendateien, die Zeitfenster behalten höchstens max_velocity_accounts Konten
+    rows = os.path.getsize(tmp_path / "history" / "amount.bin") // 8
+    assert rows == len(data) + 1
+    assert len(main_module.velocity_engine) == 10
+    main_module.history_store.close()
+
+
+def test_reused_state_dir_keeps_its_history(main_module, tmp_path):
+    main_module.use_streaming_state(str(tmp_path))
+    main_module.history_store.append(SEED)
+    main_module.history_store.close()
+
+    main_module.use_streaming_state(str(tmp_path))
+    assert len(main_module.history_store) == 1
+    main_module.history_store.close()
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from structured_output import (
+    StructuredOutputError, iter_json_objects, loads_tolerant, parse_batch, parse_structured, validate
+)
+
+
+def test_scanner_finds_objects_in_prose_and_respects_strings():
+    text = 'Ergebnis: {"a": "x}y", "b": [1, {"c": 2}]} und dann {"d": 1} [1, 2]'
+    assert list(iter_json_objects(text)) == ['{"a": "x}y", "b": [1, {"c": 2}]}', '{"d": 1}']
+    # Maskierte Anführungszeichen beenden die Zeichenkette nicht
+    assert list(iter_json_objects(r'{"a": "sagt \"}\" dann"}')) == [r'{"a": "sagt \"}\" dann"}']
+
+
+def test_scanner_closes_a_truncated_object():
+    assert list(iter_json_objects('{"a": 1} {"b": [1, {"c": "abgeschn')) == [
+        '{"a": 1}', '{"b": [1, {"c": "abgeschn"}]}'
+    ]
+    assert loads_tolerant(list(iter_json_objects('{"decision": "declined", "reasoning": "Hoher Be'))[0]) == {
+        "decision": "declined", "reasoning": "Hoher Be"
+    }
+
+
+def test_tolerant_loading_repairs_common_mistakes():
+    assert loads_tolerant('{"a": [1, 2,], }') == {"a": [1, 2]}
+    assert loads_tolerant("{'decision': 'approved', 'flag': True, 'note': None}") == {
+        "decision": "approved", "flag": True, "note": None
+    }
+    with pytest.raises(ValueError):
+        loads_tolerant("{decision: approved}")
+
+
+def test_schema_normalizes_field_types_and_keeps_unknown_fields():
+    assert validate({"probability": "85%", "is_fraud": " TRUE ", "extra": 1}, "ml") == {
+        "probability": 0.85, "is_fraud": True, "extra": 1
+    }
+    assert validate({"is_flagged": "false", "rules_triggered": "large_amount"}, "rule") == {
+        "is_flagged": False, "rules_triggered": ["large_amount"]
+    }
+    text = '```json\n{"decision": "Approved ", "confidence": "0.7", "reasoning": "ok"}\n```'
+    assert parse_structured(text, "decision") == {"decision": "approved", "confidence": 0.7, "reasoning": "ok"}
+
+
+@pytest.mark.parametrize("probability", [1.2, -0.1, "150%"])
+def test_out_of_range_probabilities_are_rejected(probability):
+    with pytest.raises(StructuredOutputError, match="probability"):
+        parse_structured(json.dumps({"probability": probability, "is_fraud": True}), "ml")
+
+
+def test_first_valid_object_wins():
+    text = 'Zuerst {"decision": "vielleicht"} dann {"decision": "declined", "confidence": 0.9, "reasoning": "x"}'
+    assert parse_structured(text, "decision")["decision"] == "declined"
+    with pytest.raises(StructuredOutputError, match="confidence"):
+        parse_structured('{"decision": "declined", "reasoning": "x"}', "decision")
+    with pytest.raises(StructuredOutputError):
+        parse_structured(None, "decision")
+
+
+def test_parse_batch_keeps_valid_items_and_skips_the_rest():
+    text = """Hier die Bewertungen:
+    [
+        {"transaction_id": "t1", "probability": "0.8", "is_fraud": "true"},
+        {"transaction_id": "t2", "probability": 1.7, "is_fraud": true},
+        {"probability": 0.1, "is_fraud": false},
+        {"transaction_id": "t3", "probability": 0.2, "is_fraud": false,}
+    ]"""
+    assert parse_batch(text, "ml") == {
+        "t1": {"probability": 0.8, "is_fraud": True},
+        "t3": {"probability": 0.2, "is_fraud": False}
+    }
+
+
+def test_parse_batch_reads_lists_nested_in_an_object():
+    text = '{"results": [{"transaction_id": "t1", "is_flagged": false, "rules_triggered": []}]}'
+    assert parse_batch(text, "rule") == {"t1": {"is_flagged": False, "rules_triggered": []}}
+    assert parse_batch(None, "rule") == {}
+    assert parse_batch("keine Antwort", "rule") == {}
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from tests.support import stub_task_runner, transactions
+from tool_session import ToolSession
+
+
+@pytest.fixture
+def session():
+    session = ToolSession()
+    yield session
+    session.close()
+
+
+def test_prefetch_and_calls_share_one_computation(session):
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(10)
+        return "answer"
+
+    session.prefetch("key", compute)
+    session.prefetch("key", compute)
+    release.set()
+    assert session.get_or_call("key", compute) == "answer"
+    assert session.get_or_call("key", compute) == "answer"
+    assert len(calls) == 1
+    assert session.stats()["prefetched"] == 1
+
+
+def test_failures_are_not_cached(session):
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("Datenbank nicht erreichbar")
+        return "answer"
+
+    with pytest.raises(ConnectionError):
+        session.get_or_call("key", flaky)
+    assert session.get_or_call("key", flaky) == "answer"
+    assert len(attempts) == 2
+
+
+def test_failed_prefetch_falls_back_to_a_direct_call(session):
+    def broken():
+        raise ConnectionError("Datenbank nicht erreichbar")
+
+    session.prefetch("key", broken)
+    assert session.get_or_call("key", lambda: "answer") == "answer"
+    assert session.get_or_call("key", lambda: "other") == "other"
+
+
+def test_invalidate_drops_matching_entries(session):
+    session.get_or_call(("history", "A"), lambda: "old")
+    session.get_or_call(("profile", "B"), lambda: "kept")
+    assert session.invalidate(lambda key: key[0] == "history") == 1
+    assert session.get_or_call(("history", "A"), lambda: "new") == "new"
+    assert session.get_or_call(("profile", "B"), lambda: "other") == "kept"
+
+
+def test_session_answers_include_the_reviewed_transaction(main_module, monkeypatch):
+    transaction = transactions(1)[0]
+    sender = transaction["sender_account"]
+    answers = {}
+
+    def dialog(transaction_data, analysis_result):
+        answers["history"] = main_module._session_call(
+            main_module._history_key(sender), lambda: main_module._fetch_history(sender)
+        )
+        # Andere Threads sehen den Sitzungs-Cache nicht
+        other = threading.Thread(target=lambda: answers.update(outside=main_module._tool_session.get()))
+        other.start()
+        other.join()
+        return "aborted"
+
+    system = main_module.FraudDetectionSystem(task_runner=stub_task_runner)
+    monkeypatch.setattr(system, "_dialog", dialog)
+    try:
+        assert system.interactive_fraud_manager_session(transaction) == "aborted"
+    finally:
+        system.close()
+
+    assert transaction["transaction_id"] in answers["history"]
+    assert answers["outside"] is None
+    assert main_module._tool_session.get() is None
@@ -0,0 +1,66 @@
+import pytest
+
+from triage import TIER_APPROVE, TIER_ESCALATE, TIER_FLAG, TriageCascade
+
+
+PROFILE = {"average_transaction_amount": 400.0, "typical_receivers": ["KNOWN"]}
+
+
+def transaction(amount, receiver="KNOWN", hour=12, realtime=False):
+    return {
+        "sender_account": "A",
+        "receiver_account": receiver,
+        "amount": amount,
+        "timestamp": f"2024-03-01T{hour:02d}:30:00Z",
+        "is_realtime": realtime
+    }
+
+
+@pytest.fixture
+def cascade():
+    return TriageCascade(profile_loader=lambda account: PROFILE)
+
+
+@pytest.mark.parametrize("case, velocity, tier", [
+    # Freigabe: bekannter Empfänger, bis 1,5 x Durchschnitt (600) und höchstens 1000 EUR, übliche Uhrzeit
+    (transaction(600.0), None, TIER_APPROVE),
+    (transaction(600.01), None, TIER_ESCALATE),
+    (transaction(100.0, hour=23), None, TIER_ESCALATE),
+    (transaction(100.0, hour=5), None, TIER_ESCALATE),
+    (transaction(100.0, hour=6), None, TIER_APPROVE),
+    (transaction(100.0, realtime=True), None, TIER_ESCALATE),
+    (transaction(100.0, receiver="NEW"), None, TIER_ESCALATE),
+    # Serien werden nie sofort freigegeben: mehr als 3 Transaktionen in der letzten Minute
+    (transaction(100.0), {"count_1m": 3}, TIER_APPROVE),
+    (transaction(100.0), {"count_1m": 4}, TIER_ESCALATE),
+    # Markierung: neuer Empfänger und mindestens max(10 x Durchschnitt, 10000 EUR)
+    (transaction(10000.0, receiver="NEW"), None, TIER_FLAG),
+    (transaction(9999.99, receiver="NEW"), None, TIER_ESCALATE),
+    (transaction(50000.0), None, TIER_ESCALATE),
+])
+def test_tiers_follow_the_thresholds(cascade, case, velocity, tier):
+    assert cascade.screen(case, velocity)["tier"] == tier
+
+
+def test_flag_reasons_and_thresholds_scale_with_the_profile():
+    cascade = TriageCascade(profile_loader=lambda account: dict(PROFILE, average_transaction_amount=2000.0))
+    assert cascade.screen(transaction(10000.0, receiver="NEW"))["tier"] == TIER_ESCALATE
+    screening = cascade.screen(transaction(20000.0, receiver="NEW", hour=2))
+    assert screening["tier"] == TIER_FLAG
+    assert screening["reasons"] == [
+        "Betrag 20000.00 EUR ist das 10.0-fache des Durchschnitts", "neuer Empfänger", "ungewöhnliche Uhrzeit"
+    ]
+    # Die absolute Obergrenze der Freigabe gilt auch bei hohem Durchschnitt
+    assert cascade.screen(transaction(1000.01))["tier"] == TIER_ESCALATE
+
+
+def test_stats_count_each_tier(cascade):
+    for case in (transaction(100.0), transaction(100.0), transaction(10000.0, receiver="NEW"), transaction(700.0)):
+        cascade.screen(case)
+    stats = cascade.stats()
+    assert stats["total"] == 4
+    assert {tier: values["count"] for tier, values in stats["tiers"].items()} == {
+        TIER_APPROVE: 2, TIER_FLAG: 1, TIER_ESCALATE: 1
+    }
+    cascade.reset_stats()
+    assert cascade.stats()["total"] == 0
@@ -0,0 +1,65 @@
+from profile_store import epoch_seconds
+from velocity import VelocityEngine
+
+
+def _tx(sender, receiver, amount, timestamp):
+    return {"sender_account": sender, "receiver_account": receiver, "amount": amount, "timestamp": timestamp}
+
+
+def test_windows_count_only_transactions_inside_the_window():
+    engine = VelocityEngine()
+    for second in range(0, 50, 10):
+        signals = engine.observe(_tx("A", f"R{second}", 100.0, f"2024-01-01T12:00:{second:02d}Z"))
+    assert signals["count_1m"] == 5
+    assert signals["sum_1m"] == 500.0
+    assert signals["distinct_receivers_1m"] >= 4
+
+    later = engine.observe(_tx("A", "R0", 1.0, "2024-01-01T12:05:00Z"))
+    assert later["count_1m"] == 1
+    assert later["count_1h"] == 6
+    # Andere Konten sind unabhängig
+    assert engine.observe(_tx("B", "R0", 1.0, "2024-01-01T12:05:00Z"))["count_1h"] == 1
+
+
+def test_export_import_and_remove_round_trip():
+    source = VelocityEngine()
+    for i in range(30):
+        source.observe(_tx(f"A{i % 3}", f"R{i}", 10.0 + i, f"2024-01-01T12:{i:02d}:00Z"))
+    state = source.export_accounts(["A1"])
+
+    target = VelocityEngine()
+    target.import_accounts(state)
+    assert target.export_accounts(["A1"]) == state
+    probe = _tx("A1", "R99", 5.0, "2024-01-01T12:40:00Z")
+    assert target.observe(dict(probe)) == source.observe(dict(probe))
+
+    source.remove_accounts(["A1"])
+    assert sorted(source.accounts()) == ["A0", "A2"]
+    assert source.observe(probe)["count_1h"] == 1
+
+
+def test_eviction_resets_the_slot():
+    engine = VelocityEngine(max_accounts=2)
+    engine.observe(_tx("A", "R", 1.0, "2024-01-02T00:00:00Z"))
+    engine.observe(_tx("B", "R", 1.0, "2024-01-03T00:00:00Z"))
+    # C verdrängt A (am längsten inaktiv) und übernimmt weder Buckets noch letzte Aktivität
+    signals = engine.observe(_tx("C", "R", 1.0, "2024-01-01T00:00:00Z"))
+    assert sorted(engine.accounts()) == ["B", "C"]
+    assert signals["count_24h"] == 1
+    assert engine._last_seen[engine._slots["C"]] == epoch_seconds("2024-01-01T00:00:00Z")
+
+
+def test_eviction_follows_the_observation_order():
+    engine = VelocityEngine(max_accounts=3)
+    for account in ("A", "B", "C"):
+        engine.observe(_tx(account, "R", 1.0, "2024-01-01T00:00:00Z"))
+    # A wird erneut beobachtet; B ist nun am längsten unbeobachtet
+    engine.observe(_tx("A", "R", 1.0, "2024-01-01T00:00:00Z"))
+    engine.observe(_tx("D", "R", 1.0, "2024-01-01T00:00:00Z"))
+    assert sorted(engine.accounts()) == ["A", "C", "D"]
+
+    # Nach dem Entfernen bleibt die Reihenfolge der übrigen Konten erhalten
+    engine.remove_accounts(["C"])
+    engine.observe(_tx("E", "R", 1.0, "2024-01-01T00:00:00Z"))
+    engine.observe(_tx("F", "R", 1.0, "2024-01-01T00:00:00Z"))
+    assert sorted(engine.accounts()) == ["D", "E", "F"]
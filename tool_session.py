@@ -0,0 +1,97 @@
+"""
+Sitzungsbezogener Cache für Tool-Ergebnisse.
+
+Eine ToolSession hält die Antworten der Datenbank-Tools für die Dauer einer
+interaktiven Sitzung. Erwartbare Abfragen (Historie und Profil von Absender
+und Empfänger, ähnliche Fälle) werden beim Öffnen der Sitzung im Hintergrund
+vorab geladen; Tool-Aufrufe mit denselben Argumenten warten dann höchstens
+auf den laufenden Abruf, statt ihn zu wiederholen. Ändern sich die Daten
+während der Sitzung, verwirft invalidate() die betroffenen Einträge.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable
+
+
+class ToolSession:
+    """Cache für Tool-Antworten innerhalb einer Sitzung, befüllbar per Hintergrund-Prefetch."""
+
+    def __init__(self, max_workers: int = 4):
+        """
+        Args:
+            max_workers: Anzahl gleichzeitiger Prefetch-Abrufe
+        """
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool-prefetch")
+        self._entries: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+
+    def prefetch(self, key: Hashable, compute: Callable[[], Any]):
+        """Startet den Abruf im Hintergrund, sofern für key noch kein Ergebnis vorliegt oder läuft."""
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = self._pool.submit(compute)
+            self.prefetched += 1
+
+    def get_or_call(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Liefert das Ergebnis für key; ein laufender Prefetch wird abgewartet, sonst wird compute aufgerufen.
+
+        Fehlgeschlagene Abrufe werden nicht gecacht.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = Future()
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.hits += 1
+
+        if owner:
+            try:
+                entry.set_result(compute())
+            except Exception as exc:
+                with self._lock:
+                    self._entries.pop(key, None)
+                entry.set_exception(exc)
+        try:
+            return entry.result()
+        except Exception:
+            if not owner:
+                # Fehlgeschlagener Prefetch: Eintrag verwerfen und direkt abrufen
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                return compute()
+            raise
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Verwirft alle Einträge, deren Schlüssel predicate erfüllt, z.B. nach dem Fortschreiben der Historie.
+
+        Returns:
+            Die Anzahl verworfener Einträge
+        """
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "prefetched": self.prefetched,
+                "entries": len(self._entries)
+            }
+
+    def close(self):
+        """Beendet den Prefetch-Pool, ohne auf laufende Abrufe zu warten."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
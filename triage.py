@@ -0,0 +1,110 @@
+"""
+Günstige Vorprüfung vor der Bewertungs- und Agenten-Pipeline.
+
+Die TriageCascade ordnet jede Transaktion anhand weniger Vergleiche mit dem
+Kontoprofil einer von drei Stufen zu: eindeutig unauffällige Transaktionen
+werden sofort freigegeben, eindeutig riskante sofort markiert, nur das
+unsichere Mittelfeld durchläuft die vollständige ML-, Regel- und
+Koordinationsstufe.
+"""
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from rule_engine import minute_of_day
+
+
+TIER_APPROVE = "approve"
+TIER_FLAG = "flag"
+TIER_ESCALATE = "escalate"
+TIERS = (TIER_APPROVE, TIER_FLAG, TIER_ESCALATE)
+
+
+class TriageCascade:
+    """Vorprüfung mit konfigurierbaren Schwellwerten und Zählern je Stufe."""
+
+    def __init__(
+            self,
+            profile_loader: Optional[Callable[[str], Dict[str, Any]]] = None,
+            approve_amount_ratio: float = 1.5,
+            approve_max_amount: float = 1000.0,
+            flag_amount_ratio: float = 10.0,
+            flag_min_amount: float = 10000.0,
+            normal_hours: Tuple[int, int] = (6, 23),
+            approve_max_burst: int = 3
+    ):
+        """
+        Args:
+            profile_loader: Liefert das Profil eines Kontos (average_transaction_amount, typical_receivers)
+            approve_amount_ratio: Freigabe nur bis zu diesem Vielfachen des durchschnittlichen Betrags
+            approve_max_amount: Absolute Obergrenze für die sofortige Freigabe
+            flag_amount_ratio: Markierung ab diesem Vielfachen des durchschnittlichen Betrags (an neue Empfänger)
+            flag_min_amount: Absolute Untergrenze für die sofortige Markierung
+            normal_hours: Übliche Uhrzeiten als (erste Stunde, Stunde des Endes), UTC
+            approve_max_burst: Freigabe nur bis zu dieser Anzahl Transaktionen des Kontos in der letzten Minute
+        """
+        self.profile_loader = profile_loader
+        self.approve_amount_ratio = approve_amount_ratio
+        self.approve_max_amount = approve_max_amount
+        self.flag_amount_ratio = flag_amount_ratio
+        self.flag_min_amount = flag_min_amount
+        self.normal_minutes = (normal_hours[0] * 60, normal_hours[1] * 60)
+        self.approve_max_burst = approve_max_burst
+        self._counts = dict.fromkeys(TIERS, 0)
+        self._lock = threading.Lock()
+
+    def screen(self, transaction: Dict[str, Any], velocity: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """
+        Ordnet eine Transaktion einer Stufe zu.
+
+        Args:
+            transaction: Die Transaktion
+            velocity: Optional die Fensterwerte der VelocityEngine; Serien werden nie sofort freigegeben
+
+        Returns:
+            Ein Dictionary mit "tier" (approve, flag oder escalate) und den Gründen der Einordnung
+        """
+        profile = self.profile_loader(transaction["sender_account"]) if self.profile_loader else {}
+        average = max(float(profile.get("average_transaction_amount") or 0.0), 1.0)
+        amount = float(transaction["amount"])
+        known_receiver = transaction["receiver_account"] in (profile.get("typical_receivers") or ())
+        minute = minute_of_day(transaction.get("timestamp", ""))
+        normal_time = self.normal_minutes[0] <= minute < self.normal_minutes[1]
+        realtime = bool(transaction.get("is_realtime"))
+        burst = (velocity or {}).get("count_1m", 0) > self.approve_max_burst
+
+        if not known_receiver and amount >= max(self.flag_amount_ratio * average, self.flag_min_amount):
+            tier = TIER_FLAG
+            reasons = [
+                f"Betrag {amount:.2f} EUR ist das {amount / average:.1f}-fache des Durchschnitts",
+                "neuer Empfänger"
+            ]
+            if not normal_time:
+                reasons.append("ungewöhnliche Uhrzeit")
+        elif (known_receiver and normal_time and not realtime and not burst
+              and amount <= min(self.approve_amount_ratio * average, self.approve_max_amount)):
+            tier = TIER_APPROVE
+            reasons = ["bekannter Empfänger, üblicher Betrag und übliche Uhrzeit"]
+        else:
+            tier = TIER_ESCALATE
+            reasons = []
+
+        with self._lock:
+            self._counts[tier] += 1
+        return {"tier": tier, "reasons": reasons}
+
+    def stats(self) -> Dict[str, Any]:
+        """Anzahl und Anteil der Transaktionen je Stufe."""
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        return {
+            "total": total,
+            "tiers": {
+                tier: {"count": count, "share": round(count / total, 4) if total else 0.0}
+                for tier, count in counts.items()
+            }
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._counts = dict.fromkeys(TIERS, 0)
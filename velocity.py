@@ -0,0 +1,257 @@
+"""
+Gleitende Zeitfenster je Konto für die Erkennung von Transaktionsserien.
+
+Für jedes Absenderkonto und jedes Fenster (Standard: 1 Minute, 1 Stunde,
+24 Stunden) liegt ein Ring fester Länge aus Zeit-Buckets mit Anzahl, Summe
+und einer 64-Bit-Maske der Empfänger. Eine Transaktion aktualisiert je
+Fenster genau einen Bucket (O(1)); abgelaufene Buckets werden beim
+Wiederverwenden ihres Ringplatzes zurückgesetzt, der Speicher je Konto ist
+also fest. Die Werte eines Fensters sind die Summe bzw. das bitweise Oder der
+Buckets, die noch im Fenster liegen; die Anzahl verschiedener Empfänger wird
+aus der Maske per Linear Counting geschätzt.
+
+Maßgeblich ist der Zeitstempel der Transaktion, nicht die Uhrzeit der
+Verarbeitung. Wie im ProfileStore liegen alle Werte slot-basiert in
+NumPy-Arrays; ein Konto belegt eine Zeile.
+"""
+import math
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from profile_store import epoch_seconds
+
+
+# (Name, Fensterlänge in Sekunden, Anzahl Buckets)
+DEFAULT_WINDOWS: Sequence[Tuple[str, int, int]] = (
+    ("1m", 60, 12),
+    ("1h", 3600, 12),
+    ("24h", 86400, 24)
+)
+
+MASK_BITS = 64
+
+
+def velocity_signal_names(windows: Sequence[Tuple[str, int, int]] = DEFAULT_WINDOWS) -> List[str]:
+    """Namen aller Signale in der Reihenfolge von observe()."""
+    return [
+        f"{signal}_{name}"
+        for name, _, _ in windows
+        for signal in ("count", "sum", "distinct_receivers")
+    ]
+
+
+def _receiver_bit(receiver: str) -> np.uint64:
+    # crc32 statt hash(): über Prozesse und Neustarts stabil (Shard-Übergabe)
+    return np.uint64(1) << np.uint64(zlib.crc32(receiver.encode("utf-8")) % MASK_BITS)
+
+
+def _estimate_distinct(mask: int) -> float:
+    """Linear Counting über eine Bitmaske."""
+    zeros = MASK_BITS - bin(mask).count("1")
+    if zeros == 0:
+        return MASK_BITS * math.log(MASK_BITS)
+    return round(MASK_BITS * math.log(MASK_BITS / zeros), 1)
+
+
+class _Window:
+    """Ring-Buckets eines Fensters für alle Konten."""
+
+    def __init__(self, seconds: int, buckets: int, capacity: int):
+        self.seconds = seconds
+        self.buckets = buckets
+        self.width = seconds / buckets
+        self.epochs = np.full((capacity, buckets), -1, dtype=np.int64)
+        self.counts = np.zeros((capacity, buckets), dtype=np.int32)
+        self.sums = np.zeros((capacity, buckets), dtype=np.float64)
+        self.masks = np.zeros((capacity, buckets), dtype=np.uint64)
+
+    def grow(self, capacity: int):
+        for name, fill in (("epochs", -1), ("counts", 0), ("sums", 0), ("masks", 0)):
+            old = getattr(self, name)
+            new = np.full((capacity, self.buckets), fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def clear(self, slot: int):
+        self.epochs[slot] = -1
+        self.counts[slot] = 0
+        self.sums[slot] = 0.0
+        self.masks[slot] = 0
+
+    def move(self, source: int, target: int):
+        """Verschiebt die Buckets eines Slots und leert den Quell-Slot."""
+        for values in (self.epochs, self.counts, self.sums, self.masks):
+            values[target] = values[source]
+        self.clear(source)
+
+    def observe(self, slot: int, timestamp: float, amount: float, bit: np.uint64) -> Tuple[int, float, float]:
+        """Zählt eine Transaktion und liefert (Anzahl, Summe, verschiedene Empfänger) im Fenster."""
+        epoch = int(timestamp // self.width)
+        index = epoch % self.buckets
+        epochs, counts, sums, masks = self.epochs[slot], self.counts[slot], self.sums[slot], self.masks[slot]
+        current = epochs[index]
+        if current < epoch:
+            # Ringplatz eines abgelaufenen Buckets wiederverwenden
+            epochs[index] = current = epoch
+            counts[index] = 0
+            sums[index] = 0.0
+            masks[index] = 0
+        if current == epoch:
+            # Verspätete Transaktionen außerhalb des Rings werden nicht mehr gezählt
+            counts[index] += 1
+            sums[index] += amount
+            masks[index] |= bit
+
+        live = (epochs > epoch - self.buckets) & (epochs <= epoch)
+        return (
+            int(counts @ live),
+            round(float(sums @ live), 2),
+            _estimate_distinct(int(np.bitwise_or.reduce(masks[live])))
+        )
+
+
+class VelocityEngine:
+    """Zeitfenster-Zähler (Anzahl, Summe, verschiedene Empfänger) je Absenderkonto."""
+
+    def __init__(
+            self,
+            windows: Sequence[Tuple[str, int, int]] = DEFAULT_WINDOWS,
+            initial_capacity: int = 1024,
+            max_accounts: Optional[int] = None
+    ):
+        """
+        Args:
+            windows: Fenster als (Name, Länge in Sekunden, Anzahl Buckets)
+            initial_capacity: Anfängliche Anzahl Slots (wächst bei Bedarf)
+            max_accounts: Obergrenze der Konten; darüber wird das am längsten nicht beobachtete Konto verdrängt (LRU)
+        """
+        self.windows = list(windows)
+        self.signal_names = velocity_signal_names(self.windows)
+        self.max_accounts = max_accounts
+        self._lock = threading.Lock()
+        # Konto -> Slot, in der Reihenfolge der letzten Beobachtung (ältestes zuerst) für die Verdrängung in O(1)
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._accounts: List[str] = []
+        self._last_seen = np.full(initial_capacity, -math.inf, dtype=np.float64)
+        self._windows = [_Window(seconds, buckets, initial_capacity) for _, seconds, buckets in self.windows]
+        self._clock = 0.0  # jüngster beobachteter Zeitstempel
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def _slot(self, account: str) -> int:
+        slot = self._slots.get(account)
+        if slot is not None:
+            self._slots.move_to_end(account)
+            return slot
+        if self.max_accounts is not None and len(self._accounts) >= self.max_accounts:
+            # Am längsten nicht beobachtetes Konto verdrängen; seine Fenster sind meist ohnehin leer
+            _, slot = self._slots.popitem(last=False)
+            self._accounts[slot] = account
+            self._last_seen[slot] = -math.inf
+            for window in self._windows:
+                window.clear(slot)
+        else:
+            slot = len(self._accounts)
+            self._accounts.append(account)
+            if slot >= len(self._last_seen):
+                capacity = len(self._last_seen) * 2
+                self._last_seen = np.concatenate(
+                    [self._last_seen, np.full(capacity - len(self._last_seen), -math.inf)]
+                )
+                for window in self._windows:
+                    window.grow(capacity)
+        self._slots[account] = slot
+        return slot
+
+    def observe(self, transaction: Dict[str, Any]) -> Dict[str, float]:
+        """
+        Zählt eine Transaktion und liefert die Fensterwerte ihres Absenders einschließlich dieser Transaktion.
+
+        Returns:
+            Ein Dictionary mit count_<Fenster>, sum_<Fenster> und distinct_receivers_<Fenster>
+        """
+        timestamp = epoch_seconds(transaction.get("timestamp", ""))
+        amount = float(transaction["amount"])
+        bit = _receiver_bit(transaction["receiver_account"])
+        signals = {}
+        with self._lock:
+            if math.isnan(timestamp):
+                # Ohne Zeitstempel zählt die Transaktion zum jüngsten bekannten Zeitpunkt
+                timestamp = self._clock
+            self._clock = max(self._clock, timestamp)
+            slot = self._slot(transaction["sender_account"])
+            self._last_seen[slot] = max(self._last_seen[slot], timestamp)
+            for (name, _, _), window in zip(self.windows, self._windows):
+                count, total, distinct = window.observe(slot, timestamp, amount, bit)
+                signals[f"count_{name}"] = count
+                signals[f"sum_{name}"] = total
+                signals[f"distinct_receivers_{name}"] = distinct
+        return signals
+
+    def observe_batch(self, transactions: Iterable[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """Zählt Transaktionen in Eingabereihenfolge; jede sieht nur sich und ihre Vorgänger."""
+        return [self.observe(transaction) for transaction in transactions]
+
+    def accounts(self) -> List[str]:
+        """Alle Konten mit Fensterzählern."""
+        with self._lock:
+            return list(self._accounts)
+
+    def export_accounts(self, accounts: Iterable[str]) -> List[Dict[str, Any]]:
+        """Liefert die Buckets einzelner Konten, z.B. zur Übergabe an einen anderen Shard."""
+        states = []
+        with self._lock:
+            for account in accounts:
+                slot = self._slots.get(account)
+                if slot is None:
+                    continue
+                states.append({
+                    "account": account,
+                    "last_seen": float(self._last_seen[slot]),
+                    "windows": [
+                        {
+                            "epochs": window.epochs[slot].tolist(),
+                            "counts": window.counts[slot].tolist(),
+                            "sums": window.sums[slot].tolist(),
+                            "masks": window.masks[slot].tolist()
+                        }
+                        for window in self._windows
+                    ]
+                })
+        return states
+
+    def remove_accounts(self, accounts: Iterable[str]):
+        """Entfernt Konten samt Buckets, z.B. nach der Übergabe an einen anderen Shard."""
+        with self._lock:
+            for account in accounts:
+                slot = self._slots.pop(account, None)
+                if slot is None:
+                    continue
+                # Den letzten Slot in die Lücke verschieben, damit die Slots dicht bleiben
+                last = len(self._accounts) - 1
+                moved = self._accounts.pop()
+                self._last_seen[slot] = self._last_seen[last]
+                self._last_seen[last] = -math.inf
+                for window in self._windows:
+                    window.move(last, slot)
+                if slot != last:
+                    self._accounts[slot] = moved
+                    self._slots[moved] = slot
+
+    def import_accounts(self, states: Iterable[Dict[str, Any]]):
+        """Übernimmt mit export_accounts() exportierte Konten; vorhandene Buckets werden ersetzt."""
+        with self._lock:
+            for state in states:
+                slot = self._slot(state["account"])
+                self._last_seen[slot] = state["last_seen"]
+                self._clock = max(self._clock, state["last_seen"])
+                for window, buckets in zip(self._windows, state["windows"]):
+                    window.epochs[slot] = buckets["epochs"]
+                    window.counts[slot] = buckets["counts"]
+                    window.sums[slot] = buckets["sums"]
+                    window.masks[slot] = np.array(buckets["masks"], dtype=np.uint64)